@@ -0,0 +1,46 @@
+import threading
+from typing import Any, Dict, List, Tuple
+
+
+class AlertBuffer:
+    """Fixed-size ring of exit alerts, each stamped with an increasing sequence number.
+
+    The monitor publishes into it once per tick; HTTP handlers read from it without
+    touching market data. Readers pass the last sequence number they saw and get only
+    what came after it, so a request costs O(new alerts).
+    """
+
+    def __init__(self, capacity=500):
+        self.capacity = capacity
+        self._ring: List[Dict[str, Any]] = [None] * capacity
+        self._next_seq = 1
+        self._latest: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def publish(self, new_alerts, current=None):
+        """Append new_alerts to the ring. `current` is every alert active in this tick
+        (repeats included) and becomes what latest() returns; defaults to new_alerts.
+        Returns the new alerts with their seq."""
+        with self._lock:
+            stamped = []
+            for alert in new_alerts:
+                alert = dict(alert, seq=self._next_seq)
+                self._ring[self._next_seq % self.capacity] = alert
+                self._next_seq += 1
+                stamped.append(alert)
+            self._latest = list(current) if current is not None else stamped
+        return stamped
+
+    def latest(self) -> List[Dict[str, Any]]:
+        """Alerts raised by the most recent tick."""
+        with self._lock:
+            return list(self._latest)
+
+    def since(self, cursor: int) -> Tuple[List[Dict[str, Any]], int, bool]:
+        """Alerts with seq > cursor, the cursor to send next time, and whether older
+        alerts the caller had not seen were already overwritten."""
+        with self._lock:
+            oldest = max(1, self._next_seq - self.capacity)
+            start = max(cursor + 1, oldest)
+            alerts = [self._ring[seq % self.capacity] for seq in range(start, self._next_seq)]
+            return alerts, self._next_seq - 1, cursor + 1 < oldest
@@ -0,0 +1,138 @@
+import asyncio
+import logging
+import time
+from collections import deque
+
+from order_manager import OrderManager, OrderStatus
+from order_monitor import MAX_IDLE_SECONDS, OrderMonitor
+from metrics import METRICS
+from order_record import load_orders
+
+OVERRUN_POLICIES = ('skip', 'coalesce')
+
+
+class AsyncOrderMonitor(OrderMonitor):
+    """asyncio engine with the same start()/stop() interface as OrderMonitor.
+
+    Symbols are split into chunks that are fetched and priced concurrently, at most
+    `max_concurrency` at a time (the blocking yfinance/pandas work runs in worker threads).
+    Ticks are scheduled on a fixed-rate clock, so time spent working is not added to the
+    interval. When a tick overruns, 'skip' waits for the next slot on the grid and
+    'coalesce' starts one catch-up tick right away; missed ticks never queue up.
+    """
+
+    def __init__(self, order_manager: OrderManager, price_update_interval, auto_remove_on_exit=False, data_source=None,
+                 calendar=None, skip_unchanged=True, market_data=None, indicators=None,
+                 max_concurrency=8, chunk_size=20, overrun='skip', latency_window=100):
+        super().__init__(order_manager, price_update_interval, auto_remove_on_exit=auto_remove_on_exit, data_source=data_source,
+                         calendar=calendar, skip_unchanged=skip_unchanged, market_data=market_data, indicators=indicators)
+        if overrun not in OVERRUN_POLICIES:
+            raise ValueError(f"Unsupported overrun policy: {overrun}. Expected one of {OVERRUN_POLICIES}")
+        self.max_concurrency = max_concurrency
+        self.chunk_size = chunk_size
+        self.overrun = overrun
+        self.tick_latencies = deque(maxlen=latency_window)
+        self.ticks = 0
+        self.skipped_ticks = 0
+        self._loop = None
+        self._wakeup = None
+
+    def stop(self):
+        """Stop the monitoring loop."""
+        self.running = False
+        if self._loop is not None and self._wakeup is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+        self.price_update_thread.join()
+        logging.info("OrderMonitor stopped.")
+
+    def update_prices_continuously(self):
+        """Thread target: run the asyncio loop until stop()."""
+        asyncio.run(self.run())
+
+    async def run(self):
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        next_tick = self._loop.time()
+        while self.running:
+            idle = self.seconds_until_open()
+            if idle:
+                # Closed market: sleep until it opens, then restart the tick grid from there
+                self.go_idle()
+                await self._sleep(min(idle, MAX_IDLE_SECONDS))
+                next_tick = self._loop.time()
+                continue
+            started = time.perf_counter()
+            try:
+                await self.run_tick()
+            except Exception as e:
+                METRICS.counter('stage_errors_total', stage='tick').inc()
+                logging.error(f"Monitor tick failed: {str(e)}")
+            self.tick_latencies.append(time.perf_counter() - started)
+            METRICS.histogram('stage_seconds', stage='tick').observe(self.tick_latencies[-1])
+            self.ticks += 1
+
+            next_tick += self.price_update_interval
+            now = self._loop.time()
+            if now > next_tick:
+                missed = int((now - next_tick) // self.price_update_interval) + 1
+                self.skipped_ticks += missed
+                if self.overrun == 'skip':
+                    next_tick += missed * self.price_update_interval
+                else:
+                    next_tick = now
+            await self._sleep(max(0, next_tick - self._loop.time()))
+
+    async def _sleep(self, seconds):
+        """Sleep, but wake up right away on stop()."""
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout=seconds)
+        except asyncio.TimeoutError:
+            pass
+
+    async def run_tick(self):
+        """One monitor pass: concurrent fetch/pricing per chunk, then one batched rule pass and write."""
+        orders = load_orders(await asyncio.to_thread(self.order_manager.list_orders, OrderStatus.HOLDING))
+        self.indicators.prune((order.symbol for order in orders), owner=self)
+        self.track_held(orders)
+        if not orders:
+            # Still published, so latest() drops the alerts of orders that were just closed
+            return await asyncio.to_thread(self.commit_exit_results, [], [], [], [], [])
+        self.market_data.require_period(max(order.period for order in orders))
+
+        by_symbol = {}
+        for order in orders:
+            by_symbol.setdefault(order.symbol, []).append(order)
+        symbols = list(by_symbol)
+        chunks = [symbols[i:i + self.chunk_size] for i in range(0, len(symbols), self.chunk_size)]
+
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def price_chunk(chunk):
+            async with semaphore:
+                chunk_orders = [order for symbol in chunk for order in by_symbol[symbol]]
+                return await asyncio.to_thread(self._fetch_and_price, chunk, chunk_orders)
+
+        priced, prices, mas = [], [], []
+        for chunk_priced, chunk_prices, chunk_mas in await asyncio.gather(*(price_chunk(chunk) for chunk in chunks)):
+            priced += chunk_priced
+            prices += chunk_prices
+            mas += chunk_mas
+        return await asyncio.to_thread(self.apply_exit_rules, priced, prices, mas)
+
+    def _fetch_and_price(self, symbols, orders):
+        self.market_data.prefetch(symbols)
+        return self.price_orders(self.select_updated(orders))
+
+    def latency_stats(self):
+        """Per-tick latency summary in seconds over the last `latency_window` ticks."""
+        latencies = sorted(self.tick_latencies)
+        if not latencies:
+            return {'ticks': self.ticks, 'skipped_ticks': self.skipped_ticks}
+        return {
+            'ticks': self.ticks,
+            'skipped_ticks': self.skipped_ticks,
+            'last': self.tick_latencies[-1],
+            'mean': sum(latencies) / len(latencies),
+            'p95': latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+            'max': latencies[-1],
+        }
@@ -0,0 +1,238 @@
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from exit_rules import EXIT_NONE, EXIT_REASONS, evaluate_exits
+from order_monitor import compute_ma_series
+
+# Default grid for sweep_parameters(); any key can be overridden
+SWEEP_GRID = {
+    'maType': ('SMA', 'EMA', 'HMA'),
+    'period': (5, 8, 14, 20, 50),
+    'initialSL': ('trailing', 'static'),
+    'initialSLPct': (0.5, 1, 2, 3),
+    'takeProfitPct': (0.5, 1, 2, 5),
+    'secondarySLPct': (0, 0.25, 0.5, 1),
+}
+SL_TP_KEYS = ('initialSL', 'initialSLPct', 'takeProfitPct', 'secondarySLPct')
+
+# Orders with more bars than this are replayed in slices so the (orders x bars) arrays stay small
+MAX_CELLS = 2_000_000
+
+
+def load_ohlcv(path) -> pd.DataFrame:
+    """Read bars saved as CSV or Parquet (.parquet needs pyarrow or fastparquet).
+
+    The first column, or a Datetime/Date column, becomes the index, as in frames from yfinance.
+    """
+    path = Path(path)
+    if path.suffix in ('.parquet', '.pq'):
+        frame = pd.read_parquet(path)
+    else:
+        frame = pd.read_csv(path)
+    if not isinstance(frame.index, pd.DatetimeIndex):
+        column = next((column for column in ('Datetime', 'Date') if column in frame.columns), frame.columns[0])
+        frame = frame.set_index(column)
+    if not isinstance(frame.index, pd.DatetimeIndex):
+        # Offsets change across DST in a saved yfinance frame, so those are read as UTC
+        has_offset = frame.index.astype(str).str.contains(r'[+-]\d\d:\d\d$').any()
+        frame.index = pd.to_datetime(frame.index, utc=bool(has_offset))
+    return frame.sort_index()
+
+
+def load_bars(paths) -> dict:
+    """{symbol: bars} for a list of files, or every CSV/Parquet file in a directory.
+    The symbol is the file name without its extension."""
+    if isinstance(paths, (str, Path)) and Path(paths).is_dir():
+        paths = sorted(path for path in Path(paths).iterdir() if path.suffix in ('.csv', '.parquet', '.pq'))
+    elif isinstance(paths, (str, Path)):
+        paths = [paths]
+    return {Path(path).stem: load_ohlcv(path) for path in paths}
+
+
+def replay_exits(close, ma, entry_index, entry_price, take_profit_pct, secondary_sl_pct, initial_sl_pct, trailing):
+    """Run the exit rules over every bar for many orders on one symbol at once.
+
+    close and ma are one value per bar; the other arguments are one value per order. Each
+    order is live from its entry bar on, and its highestMA is the running maximum of the MA
+    since entry, as OrderMonitor builds it tick by tick.
+
+    Returns (exit_index, exit_code, highest_ma) per order; exit_index is -1 and exit_code
+    EXIT_NONE for orders that never exit, and highest_ma is taken at the exit (or last) bar.
+    """
+    close = np.asarray(close, dtype=np.float64)
+    ma = np.asarray(ma, dtype=np.float64)
+    def column(values, dtype=np.float64):
+        return np.asarray(values, dtype=dtype)[:, None]
+
+    entry_index = np.asarray(entry_index, dtype=np.int64)
+
+    bars = np.arange(len(close))
+    live = bars[None, :] >= entry_index[:, None]
+    # fmax skips the NaN warm-up of the MA, just like the comparisons in the rules do
+    highest_ma = np.fmax.accumulate(np.where(live, ma[None, :], np.nan), axis=1)
+    highest_ma = np.nan_to_num(highest_ma, nan=0.0)
+
+    _, _, exit_code = evaluate_exits(
+        column(entry_price), column(take_profit_pct), column(secondary_sl_pct), column(initial_sl_pct),
+        column(trailing, bool), highest_ma, ma[None, :], close[None, :],
+    )
+    exit_code = np.where(live & ~np.isnan(ma)[None, :], exit_code, EXIT_NONE)
+
+    exited = exit_code != EXIT_NONE
+    first_exit = exited.argmax(axis=1)
+    has_exit = exited.any(axis=1)
+    rows = np.arange(len(entry_index))
+    at = np.where(has_exit, first_exit, len(close) - 1)
+    return np.where(has_exit, first_exit, -1), exit_code[rows, at].astype(np.int8), highest_ma[rows, at]
+
+
+def _entry_index(index: pd.DatetimeIndex, entry_datetime):
+    if entry_datetime is None:
+        return 0
+    entry = pd.Timestamp(entry_datetime)
+    if index.tz is not None and entry.tz is None:
+        entry = entry.tz_localize(index.tz)
+    elif index.tz is None and entry.tz is not None:
+        entry = entry.tz_convert(None)
+    return int(index.searchsorted(entry))
+
+
+def replay_orders(bars: dict, orders) -> pd.DataFrame:
+    """Replay order records (the same dicts OrderManager stores) over historical bars.
+
+    entryPrice defaults to the close of the entry bar and entryDatetime to the first bar.
+    Orders sharing a (symbol, maType, period) share one MA series. Returns one row per order
+    with when and why it would have exited; orders that never exit are marked at the last
+    bar with exitReason None.
+    """
+    rows = []
+    groups = {}
+    for position, order in enumerate(orders):
+        groups.setdefault((order['symbol'], order['maType'], int(order['period'])), []).append(position)
+
+    for (symbol, ma_type, period), positions in groups.items():
+        ohlcv = bars[symbol]
+        close = ohlcv['Close'].to_numpy(dtype=np.float64)
+        ma = compute_ma_series(ohlcv, ma_type, period).to_numpy(dtype=np.float64)
+        group = [orders[position] for position in positions]
+        entry_index = np.array([_entry_index(ohlcv.index, order.get('entryDatetime')) for order in group])
+        entry_price = np.array([
+            order['entryPrice'] if order.get('entryPrice') else close[min(i, len(close) - 1)]
+            for order, i in zip(group, entry_index)
+        ], dtype=np.float64)
+
+        step = max(1, MAX_CELLS // max(1, len(close)))
+        for start in range(0, len(group), step):
+            chunk = slice(start, start + step)
+            exit_index, exit_code, highest_ma = replay_exits(
+                close, ma, entry_index[chunk], entry_price[chunk],
+                [order['takeProfitPct'] for order in group[chunk]],
+                [order['secondarySLPct'] for order in group[chunk]],
+                [order['initialSLPct'] for order in group[chunk]],
+                [order['initialSL'] == "trailing" for order in group[chunk]],
+            )
+            for j, order in enumerate(group[chunk]):
+                i = start + j
+                at = exit_index[j] if exit_index[j] >= 0 else len(close) - 1
+                price = close[at]
+                rows.append({
+                    'order': positions[i],
+                    'symbol': symbol,
+                    'maType': ma_type,
+                    'period': period,
+                    'initialSL': order['initialSL'],
+                    'initialSLPct': order['initialSLPct'],
+                    'takeProfitPct': order['takeProfitPct'],
+                    'secondarySLPct': order['secondarySLPct'],
+                    'entryDatetime': ohlcv.index[min(entry_index[i], len(close) - 1)],
+                    'entryPrice': entry_price[i],
+                    'exitDatetime': ohlcv.index[at],
+                    'exitPrice': price,
+                    'exitReason': EXIT_REASONS[int(exit_code[j])],
+                    'highestMA': highest_ma[j],
+                    'bars': int(at - entry_index[i]),
+                    'returnPct': (price - entry_price[i]) / entry_price[i] * 100 if entry_price[i] else 0.0,
+                })
+
+    return pd.DataFrame(rows).set_index('order').sort_index() if rows else pd.DataFrame()
+
+
+def max_drawdown_until(close, entry_index):
+    """Largest peak-to-trough drop of close (in %) from the entry bar up to each later bar."""
+    held = close[entry_index:]
+    peak = np.maximum.accumulate(held)
+    return np.maximum.accumulate((peak - held) / peak * 100)
+
+
+_sweep_bars = None
+
+
+def _set_sweep_bars(ohlcv):
+    """Pool initializer: ship the bars to each worker once rather than with every job."""
+    global _sweep_bars
+    _sweep_bars = ohlcv
+
+
+def _sweep_ma(ohlcv, ma_type, period, sl_tp, entry_index, entry_price):
+    """All SL/TP combinations for one MA series, as broadcast arrays over (combination, bar)."""
+    if ohlcv is None:
+        ohlcv = _sweep_bars
+    close = ohlcv['Close'].to_numpy(dtype=np.float64)
+    ma = compute_ma_series(ohlcv, ma_type, period).to_numpy(dtype=np.float64)
+    initial_sl, initial_sl_pct, take_profit_pct, secondary_sl_pct = (np.array(values) for values in zip(*sl_tp))
+    drawdown = max_drawdown_until(close, entry_index)
+
+    exit_index = np.empty(len(sl_tp), dtype=np.int64)
+    exit_code = np.empty(len(sl_tp), dtype=np.int8)
+    step = max(1, MAX_CELLS // max(1, len(close)))
+    for start in range(0, len(sl_tp), step):
+        chunk = slice(start, start + step)
+        exit_index[chunk], exit_code[chunk], _ = replay_exits(
+            close, ma, np.full(len(initial_sl[chunk]), entry_index), np.full(len(initial_sl[chunk]), entry_price),
+            take_profit_pct[chunk], secondary_sl_pct[chunk], initial_sl_pct[chunk], initial_sl[chunk] == "trailing",
+        )
+    at = np.where(exit_index >= 0, exit_index, len(close) - 1)
+    return pd.DataFrame({
+        'maType': ma_type,
+        'period': period,
+        'initialSL': initial_sl,
+        'initialSLPct': initial_sl_pct,
+        'takeProfitPct': take_profit_pct,
+        'secondarySLPct': secondary_sl_pct,
+        'exitReason': [EXIT_REASONS[int(code)] for code in exit_code],
+        'exitDatetime': ohlcv.index[at],
+        'bars': at - entry_index,
+        'returnPct': (close[at] - entry_price) / entry_price * 100,
+        'maxDrawdownPct': drawdown[at - entry_index],
+    })
+
+
+def sweep_parameters(ohlcv: pd.DataFrame, grid=None, entry_datetime=None, entry_price=None, workers=None) -> pd.DataFrame:
+    """Evaluate every combination of the grid for one position on one symbol.
+
+    Each (maType, period) MA series is computed once and all SL/TP combinations are run
+    against it in one broadcast pass; the (maType, period) jobs are spread over `workers`
+    processes (all cores by default, 1 runs inline). Returns one row per configuration,
+    ranked by return and then by the smaller drawdown.
+    """
+    grid = {**SWEEP_GRID, **(grid or {})}
+    entry_index = min(_entry_index(ohlcv.index, entry_datetime), len(ohlcv) - 1)
+    if not entry_price:
+        entry_price = float(ohlcv['Close'].iloc[entry_index])
+    sl_tp = list(itertools.product(*(grid[key] for key in SL_TP_KEYS)))
+    jobs = [(ma_type, int(period), sl_tp, entry_index, entry_price)
+            for ma_type, period in itertools.product(grid['maType'], grid['period'])]
+
+    workers = min(workers or os.cpu_count() or 1, len(jobs))
+    if workers <= 1:
+        tables = [_sweep_ma(ohlcv, *job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_set_sweep_bars, initargs=(ohlcv,)) as executor:
+            tables = list(executor.map(_sweep_ma, itertools.repeat(None), *zip(*jobs)))
+    results = pd.concat(tables, ignore_index=True)
+    return results.sort_values(['returnPct', 'maxDrawdownPct'], ascending=[False, True], ignore_index=True)
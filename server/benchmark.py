@@ -0,0 +1,186 @@
+"""Offline benchmarks for the order store, the MA computation and the monitor tick.
+
+Runs against FakeDataSource and synthetic bars, so results do not depend on the network
+and can be compared between commits:
+
+    python benchmark.py --output before.json
+    python benchmark.py --output after.json --compare before.json
+"""
+import argparse
+import json
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from indicators import IndicatorEngine
+from market_data import FakeDataSource, synthetic_ohlcv
+from order_fixtures import make_order
+from order_manager import STORAGE_BACKENDS, OrderManager
+from order_status import OrderStatus
+from order_monitor import OrderMonitor, get_curr_ma
+
+ORDER_COUNTS = (10, 1_000, 10_000)
+MA_TYPES = ('SMA', 'EMA', 'HMA')
+MA_PERIODS = (8, 14, 50, 200)
+# MA period of the orders in the storage and tick benchmarks
+BENCH_PERIOD = 14
+TICK_ORDER_COUNTS = (10, 100, 1_000)
+# A result is flagged by --compare when it is this much slower than the baseline
+REGRESSION_THRESHOLD = 1.2
+
+
+def measure(fn, repeat=5, number=1):
+    """Time fn() `number` times per run over `repeat` runs; seconds per call."""
+    runs = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        runs.append((time.perf_counter() - started) / number)
+    return {'min': min(runs), 'median': statistics.median(runs), 'mean': statistics.fmean(runs), 'max': max(runs),
+            'repeat': repeat, 'number': number}
+
+
+def bench_order_manager(order_counts=ORDER_COUNTS, storages=STORAGE_BACKENDS, repeat=5):
+    results = {}
+    for storage in storages:
+        for count in order_counts:
+            base_dir = tempfile.mkdtemp()
+            try:
+                manager = OrderManager('Benchmark', base_dir=base_dir, storage=storage)
+                symbols = [f'SYM{i}' for i in range(count)]
+                manager.update_orders({symbol: make_order(symbol, period=BENCH_PERIOD) for symbol in symbols})
+                middle = symbols[count // 2]
+                # Whole-file rewrites make single writes on big JSON stores slow, keep those runs short
+                number = 1 if count >= 10_000 else 10
+                prefix = f'order_manager.{storage}.{count}'
+                results[f'{prefix}.get_order'] = measure(lambda: manager.get_order(middle), repeat, number)
+                results[f'{prefix}.list_orders'] = measure(lambda: manager.list_orders(OrderStatus.HOLDING), repeat, number)
+                results[f'{prefix}.update_order'] = measure(lambda: manager.update_order(middle, {'currentPrice': 101.0}), repeat, number)
+                batch = {symbol: {'currentPrice': 102.0, 'profit': 2.0} for symbol in symbols}
+                results[f'{prefix}.update_orders'] = measure(lambda: manager.update_orders(batch, upsert=False), repeat)
+                manager.close()
+            finally:
+                shutil.rmtree(base_dir, ignore_errors=True)
+    return results
+
+
+def bench_moving_averages(ma_types=MA_TYPES, periods=MA_PERIODS, bars=2_000, repeat=5):
+    end = datetime(2024, 8, 16, 16, 0)
+    ohlcv = synthetic_ohlcv('TSLA', end - timedelta(minutes=bars), end)
+    results = {}
+    for ma_type in ma_types:
+        for period in periods:
+            results[f'get_curr_ma.{ma_type}.{period}'] = measure(lambda: get_curr_ma(ohlcv, ma_type, period), repeat, 10)
+            engine = IndicatorEngine()
+            engine.current_ma('TSLA', ma_type, period, ohlcv)
+            # Warm streaming state: what the monitor pays per order once an MA exists
+            results[f'indicator_engine.{ma_type}.{period}'] = measure(lambda: engine.current_ma('TSLA', ma_type, period, ohlcv), repeat, 100)
+    return results
+
+
+def bench_tick(order_counts=TICK_ORDER_COUNTS, storage='json', repeat=5):
+    results = {}
+    for count in order_counts:
+        base_dir = tempfile.mkdtemp()
+        try:
+            manager = OrderManager('Benchmark', base_dir=base_dir, storage=storage)
+            manager.update_orders({f'SYM{i}': make_order(f'SYM{i}', period=BENCH_PERIOD) for i in range(count)})
+            source = FakeDataSource()
+            monitor = OrderMonitor(manager, price_update_interval=3600, data_source=source)
+            results[f'tick.{count}.cold'] = measure(monitor.update_all_active_orders, 1)
+            # Bars cached and unchanged: orders without a new bar are skipped
+            results[f'tick.{count}.cached'] = measure(monitor.update_all_active_orders, repeat)
+            # Every symbol refreshed from the data source on every tick
+            monitor.market_data.ttl = 0
+            results[f'tick.{count}.refresh'] = measure(monitor.update_all_active_orders, repeat)
+            results[f'tick.{count}.refresh']['bars_served'] = source.bars_served
+            # Every order evaluated whether or not its symbol got a new bar
+            monitor.skip_unchanged = False
+            results[f'tick.{count}.evaluate'] = measure(monitor.update_all_active_orders, repeat)
+            manager.close()
+        finally:
+            shutil.rmtree(base_dir, ignore_errors=True)
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(order_counts=ORDER_COUNTS, storages=STORAGE_BACKENDS, ma_types=MA_TYPES, periods=MA_PERIODS,
+        tick_order_counts=TICK_ORDER_COUNTS, repeat=5):
+    results = {}
+    results.update(bench_order_manager(order_counts, storages, repeat))
+    results.update(bench_moving_averages(ma_types, periods, repeat=repeat))
+    results.update(bench_tick(tick_order_counts, repeat=repeat))
+    return {
+        'meta': {
+            'timestamp': datetime.now().isoformat(),
+            'revision': git_revision(),
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+        },
+        'results': results,
+    }
+
+
+def compare(baseline, current):
+    """(name, baseline, current, ratio) for every benchmark in both runs, worst ratio first.
+    Uses the fastest run of each, which is the least sensitive to a busy machine."""
+    rows = []
+    for name, result in current['results'].items():
+        if name in baseline['results']:
+            before, after = baseline['results'][name]['min'], result['min']
+            rows.append((name, before, after, after / before if before else float('inf')))
+    rows.sort(key=lambda row: row[3], reverse=True)
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--output', help="write results to this JSON file (default: stdout)")
+    parser.add_argument('--compare', help="baseline JSON to compare the new results against")
+    parser.add_argument('--quick', action='store_true', help="skip the 10k-order and 1k-order-tick sizes")
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD, help="slowdown ratio reported as a regression")
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args(argv)
+
+    order_counts = tuple(count for count in ORDER_COUNTS if count < 10_000) if args.quick else ORDER_COUNTS
+    tick_order_counts = tuple(count for count in TICK_ORDER_COUNTS if count < 1_000) if args.quick else TICK_ORDER_COUNTS
+    report = run(order_counts=order_counts, tick_order_counts=tick_order_counts, repeat=args.repeat)
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+        regressions = 0
+        for name, before, after, ratio in compare(baseline, report):
+            flag = 'REGRESSION' if ratio > args.threshold else ''
+            regressions += bool(flag)
+            print(f"{name:55s} {before * 1e3:10.3f}ms {after * 1e3:10.3f}ms {ratio:6.2f}x {flag}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,98 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Callable, Optional
+
+import numpy as np
+import pandas as pd
+
+CHART_FORMATS = ('records', 'columns')
+OHLCV_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+
+def downsample_ohlcv(ohlcv: pd.DataFrame, points: int) -> pd.DataFrame:
+    """Merge consecutive bars into at most `points` candles (first open, max high, min low,
+    last close, summed volume), stamped with the time of each candle's first bar."""
+    if points <= 0 or len(ohlcv) <= points:
+        return ohlcv
+    starts = np.linspace(0, len(ohlcv), points + 1).astype(np.int64)[:-1]
+    ends = np.append(starts[1:], len(ohlcv)) - 1
+    columns = {}
+    if 'Open' in ohlcv:
+        columns['Open'] = ohlcv['Open'].to_numpy()[starts]
+    if 'High' in ohlcv:
+        columns['High'] = np.maximum.reduceat(ohlcv['High'].to_numpy(), starts)
+    if 'Low' in ohlcv:
+        columns['Low'] = np.minimum.reduceat(ohlcv['Low'].to_numpy(), starts)
+    if 'Close' in ohlcv:
+        columns['Close'] = ohlcv['Close'].to_numpy()[ends]
+    if 'Volume' in ohlcv:
+        columns['Volume'] = np.add.reduceat(ohlcv['Volume'].to_numpy(), starts)
+    return pd.DataFrame(columns, index=ohlcv.index[starts])
+
+
+def to_columns(ohlcv: pd.DataFrame) -> dict:
+    """Column-oriented payload: one array per field, Datetime as epoch milliseconds."""
+    payload = {'Datetime': (ohlcv.index.asi8 // 1_000_000).tolist()}
+    for column in OHLCV_COLUMNS:
+        if column in ohlcv:
+            payload[column] = ohlcv[column].tolist()
+    return payload
+
+
+def to_records(ohlcv: pd.DataFrame) -> list:
+    """The original per-bar dict format of /api/stock/<symbol>."""
+    return ohlcv.reset_index().to_dict(orient='records')
+
+
+class ChartCache:
+    """Rendered /api/stock/<symbol> bodies on top of a shared MarketDataSnapshot.
+
+    Bodies are cached per (symbol, format, points) and keyed to the bar buffer version,
+    so unchanged charts are neither rebuilt nor re-serialised, and the ETag lets clients
+    skip the download entirely.
+    """
+
+    def __init__(self, market_data, serializer: Callable, days=1, max_entries=256):
+        self.market_data = market_data
+        self.serializer = serializer
+        self.days = days
+        self.max_entries = max_entries
+        self._bodies = OrderedDict()  # (symbol, fmt, points) -> (etag, body)
+        self._lock = threading.Lock()
+
+    def render(self, symbol: str, fmt='records', points: Optional[int] = None, known_etags=()):
+        """Return (etag, body), or (None, None) if there is no data for symbol.
+
+        If the current etag is in known_etags (the client's If-None-Match) the body is
+        not built at all and (etag, None) is returned.
+        """
+        if fmt not in CHART_FORMATS:
+            raise ValueError(f"Unsupported format: {fmt}. Expected one of {CHART_FORMATS}")
+        ohlcv = self.market_data.get_ohlcv(symbol)
+        if ohlcv is None:
+            return None, None
+
+        version = self.market_data.get_version(symbol)
+        key = (symbol, fmt, points)
+        etag = hashlib.blake2b(repr((key, version, ohlcv.index[-1])).encode(), digest_size=12).hexdigest()
+        if etag in known_etags:
+            return etag, None
+        with self._lock:
+            cached = self._bodies.get(key)
+            if cached is not None and cached[0] == etag:
+                self._bodies.move_to_end(key)
+                return cached
+
+        window = ohlcv[ohlcv.index >= ohlcv.index[-1] - pd.Timedelta(days=self.days)]
+        if points:
+            window = downsample_ohlcv(window, points)
+        payload = to_columns(window) if fmt == 'columns' else to_records(window)
+        body = self.serializer(payload)
+
+        with self._lock:
+            self._bodies[key] = (etag, body)
+            self._bodies.move_to_end(key)
+            while len(self._bodies) > self.max_entries:
+                self._bodies.popitem(last=False)
+        return etag, body
@@ -0,0 +1,106 @@
+import json
+import queue
+import threading
+from typing import Any, Dict, Optional
+
+
+class Subscription:
+    """One connected client: a bounded queue of pre-serialised SSE messages."""
+
+    def __init__(self, max_queue):
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.dropped = 0
+
+    def get(self, timeout=None) -> Optional[bytes]:
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class EventStream:
+    """Fans monitor events out to Server-Sent Events clients.
+
+    Each event is serialised once and the same bytes are queued for every subscriber,
+    so the cost per tick does not grow with the number of open dashboards beyond a
+    queue put. A client that falls max_queue events behind has its backlog dropped
+    and gets a single 'resync' event instead, telling it to reload full state.
+    """
+
+    def __init__(self, max_queue=100):
+        self.max_queue = max_queue
+        self._subscribers = set()
+        self._next_id = 1
+        self._lock = threading.Lock()
+
+    def subscribe(self) -> Subscription:
+        subscription = Subscription(self.max_queue)
+        with self._lock:
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    @property
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+    def publish(self, event: str, data: Any):
+        with self._lock:
+            if not self._subscribers:
+                return
+            message = format_sse(event, data, self._next_id)
+            self._next_id += 1
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            try:
+                subscription.queue.put_nowait(message)
+            except queue.Full:
+                self._resync(subscription)
+
+    def _resync(self, subscription: Subscription):
+        while True:
+            try:
+                subscription.queue.get_nowait()
+                subscription.dropped += 1
+            except queue.Empty:
+                break
+        subscription.queue.put_nowait(format_sse('resync', {'dropped': subscription.dropped}))
+
+
+def format_sse(event: str, data: Any, event_id: Optional[int] = None) -> bytes:
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, separators=(',', ':'), default=str)}")
+    return ('\n'.join(lines) + '\n\n').encode()
+
+
+class OrderDeltaTracker:
+    """Remembers the last published value of each order field so only changes are sent."""
+
+    def __init__(self):
+        self._published: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def diff(self, updates: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        deltas = {}
+        with self._lock:
+            for symbol, fields in updates.items():
+                published = self._published.setdefault(symbol, {})
+                changed = {key: value for key, value in fields.items() if published.get(key, _MISSING) != value}
+                if changed:
+                    published.update(changed)
+                    deltas[symbol] = changed
+        return deltas
+
+    def forget(self, symbol: str):
+        with self._lock:
+            self._published.pop(symbol, None)
+
+
+_MISSING = object()
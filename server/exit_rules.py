@@ -0,0 +1,143 @@
+import numpy as np
+
+EXIT_NONE = 0
+EXIT_TAKE_PROFIT = 1
+EXIT_SECONDARY_SL = 2
+EXIT_TRAILING_SL = 3
+EXIT_STATIC_SL = 4
+
+# Order keys the rules read (highestMA is optional)
+RULE_FIELDS = ('entryPrice', 'takeProfitPct', 'secondarySLPct', 'initialSLPct', 'initialSL')
+
+EXIT_REASONS = {
+    EXIT_NONE: None,
+    EXIT_TAKE_PROFIT: "Auto-Sell (Take Profit) hit",
+    EXIT_SECONDARY_SL: "Secondary Stop Loss hit",
+    EXIT_TRAILING_SL: "Initial Trailing Stop Loss hit",
+    EXIT_STATIC_SL: "Initial Static Stop Loss hit",
+}
+
+
+def evaluate_exit(order: dict, current_price, current_ma):
+    """Per-order Dual-Lasso rules. Updates price, profit and highestMA on the order in place
+    and returns the exit reason, or None. This is the reference for evaluate_exits()."""
+    order['currentPrice'] = current_price
+    if order['entryPrice'] != 0:
+        order['profit'] = ((current_price - order['entryPrice']) / order['entryPrice']) * 100
+    else:
+        order['profit'] = 0
+
+    if 'highestMA' not in order or not order['highestMA'] or current_ma > order['highestMA']:
+        order['highestMA'] = current_ma
+
+    takeProfitReached = False
+    take_profit_price = order['entryPrice'] * (1 + order['takeProfitPct'] / 100)
+    if order['highestMA'] >= take_profit_price:
+        takeProfitReached = True
+
+    exit_reason = None
+    if takeProfitReached:
+        if order['secondarySLPct'] <= 0:
+            exit_reason = "Auto-Sell (Take Profit) hit"
+        secondary_sl_value = order['highestMA'] * (1 - order['secondarySLPct'] / 100)
+        if current_ma <= secondary_sl_value:
+            exit_reason = "Secondary Stop Loss hit"
+    else:
+        if order['initialSL'] == "trailing":
+            initial_sl_value = order['highestMA'] * (1 - order['initialSLPct'] / 100)
+            if current_ma <= initial_sl_value:
+                exit_reason = "Initial Trailing Stop Loss hit"
+        else:
+            initial_sl_value = order['entryPrice'] * (1 - order['initialSLPct'] / 100)
+            if current_ma <= initial_sl_value:
+                exit_reason = "Initial Static Stop Loss hit"
+
+    return exit_reason
+
+
+class OrderBatch:
+    """Columnar view of many orders, one NumPy array per field the exit rules read."""
+
+    def __init__(self, symbols, entry_price, take_profit_pct, secondary_sl_pct, initial_sl_pct, trailing, highest_ma, current_ma, current_price):
+        self.symbols = symbols
+        self.entry_price = entry_price
+        self.take_profit_pct = take_profit_pct
+        self.secondary_sl_pct = secondary_sl_pct
+        self.initial_sl_pct = initial_sl_pct
+        self.trailing = trailing
+        self.highest_ma = highest_ma
+        self.current_ma = current_ma
+        self.current_price = current_price
+
+    @classmethod
+    def from_orders(cls, orders, current_prices, current_mas):
+        def column(key):
+            return np.array([order[key] for order in orders], dtype=np.float64)
+
+        return cls(
+            symbols=[order['symbol'] for order in orders],
+            entry_price=column('entryPrice'),
+            take_profit_pct=column('takeProfitPct'),
+            secondary_sl_pct=column('secondarySLPct'),
+            initial_sl_pct=column('initialSLPct'),
+            trailing=np.array([order['initialSL'] == "trailing" for order in orders], dtype=bool),
+            # Missing, None and 0 all mean "not set yet", exactly like the per-order check
+            highest_ma=np.array([order.get('highestMA') or 0.0 for order in orders], dtype=np.float64),
+            current_ma=np.asarray(current_mas, dtype=np.float64),
+            current_price=np.asarray(current_prices, dtype=np.float64),
+        )
+
+    @classmethod
+    def from_records(cls, orders, current_prices, current_mas):
+        """Same as from_orders() for Order records, whose fields are already typed and filled in."""
+        return cls(
+            symbols=[order.symbol for order in orders],
+            entry_price=np.fromiter((order.entryPrice for order in orders), np.float64, len(orders)),
+            take_profit_pct=np.fromiter((order.takeProfitPct for order in orders), np.float64, len(orders)),
+            secondary_sl_pct=np.fromiter((order.secondarySLPct for order in orders), np.float64, len(orders)),
+            initial_sl_pct=np.fromiter((order.initialSLPct for order in orders), np.float64, len(orders)),
+            trailing=np.fromiter((order.initialSL == "trailing" for order in orders), bool, len(orders)),
+            highest_ma=np.fromiter((order.highestMA for order in orders), np.float64, len(orders)),
+            current_ma=np.asarray(current_mas, dtype=np.float64),
+            current_price=np.asarray(current_prices, dtype=np.float64),
+        )
+
+    def __len__(self):
+        return len(self.symbols)
+
+
+def evaluate_exits(entry_price, take_profit_pct, secondary_sl_pct, initial_sl_pct, trailing, highest_ma, current_ma, current_price):
+    """Vectorised evaluate_exit(). Arguments broadcast against each other, so the same call
+    works for one bar of many orders or many bars of many orders.
+
+    Returns (highest_ma, profit, exit_code) where exit_code indexes EXIT_REASONS.
+    """
+    highest_ma = np.where((highest_ma == 0) | (current_ma > highest_ma), current_ma, highest_ma)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        profit = np.where(entry_price != 0, (current_price - entry_price) / entry_price * 100, 0.0)
+
+    take_profit_reached = highest_ma >= entry_price * (1 + take_profit_pct / 100)
+    secondary_hit = current_ma <= highest_ma * (1 - secondary_sl_pct / 100)
+    trailing_hit = current_ma <= highest_ma * (1 - initial_sl_pct / 100)
+    static_hit = current_ma <= entry_price * (1 - initial_sl_pct / 100)
+
+    exit_code = np.select(
+        [
+            take_profit_reached & secondary_hit,
+            take_profit_reached & (secondary_sl_pct <= 0),
+            ~take_profit_reached & trailing & trailing_hit,
+            ~take_profit_reached & ~trailing & static_hit,
+        ],
+        [EXIT_SECONDARY_SL, EXIT_TAKE_PROFIT, EXIT_TRAILING_SL, EXIT_STATIC_SL],
+        default=EXIT_NONE,
+    ).astype(np.int8)
+    return highest_ma, profit, exit_code
+
+
+def evaluate_batch(batch: OrderBatch):
+    """Run evaluate_exits() over an OrderBatch."""
+    return evaluate_exits(
+        batch.entry_price, batch.take_profit_pct, batch.secondary_sl_pct, batch.initial_sl_pct,
+        batch.trailing, batch.highest_ma, batch.current_ma, batch.current_price,
+    )
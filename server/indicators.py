@@ -0,0 +1,276 @@
+import math
+import threading
+from collections import deque
+
+import numpy as np
+
+# Running sums pick up float error over long sessions, so rebuild them from the window this often
+RESYNC_EVERY = 1000
+
+
+def _length(length, default=10):
+    """Same length rule as pandas_ta: anything not positive falls back to the default."""
+    return int(length) if length and int(length) > 0 else default
+
+
+class SMA:
+    """Simple moving average, O(1) per bar."""
+
+    def __init__(self, period):
+        self.period = _length(period)
+        self.window = deque()
+        self.total = 0.0
+        self.updates = 0
+
+    def update(self, value):
+        """Commit a closed bar and return the new average (nan until the window is full)."""
+        self.window.append(value)
+        self.total += value
+        if len(self.window) > self.period:
+            self.total -= self.window.popleft()
+        self.updates += 1
+        if self.updates % RESYNC_EVERY == 0:
+            self.total = math.fsum(self.window)
+        return self.value()
+
+    def peek(self, value):
+        """Average if `value` were the next bar, without committing it."""
+        count = len(self.window)
+        if count == self.period:
+            return (self.total - self.window[0] + value) / self.period
+        if count == self.period - 1:
+            return (self.total + value) / self.period
+        return math.nan
+
+    def value(self):
+        return self.total / self.period if len(self.window) == self.period else math.nan
+
+    def get_state(self):
+        """Everything update() depends on, as a flat list of floats."""
+        return [self.updates, self.total, *self.window]
+
+    def set_state(self, state):
+        self.updates, self.total = int(state[0]), float(state[1])
+        self.window = deque(float(value) for value in state[2:])
+
+
+class WMA:
+    """Linearly weighted moving average (newest bar weighs `period`), O(1) per bar."""
+
+    def __init__(self, period):
+        self.period = _length(period)
+        self.denominator = 0.5 * self.period * (self.period + 1)
+        self.window = deque()
+        self.total = 0.0
+        self.weighted = 0.0
+        self.updates = 0
+
+    def update(self, value):
+        """Commit a closed bar and return the new average (nan until the window is full)."""
+        if len(self.window) == self.period:
+            # Every bar loses one unit of weight, the oldest drops to zero and leaves
+            self.weighted += self.period * value - self.total
+            self.total += value - self.window.popleft()
+        else:
+            self.weighted += (len(self.window) + 1) * value
+            self.total += value
+        self.window.append(value)
+        self.updates += 1
+        if self.updates % RESYNC_EVERY == 0:
+            self.resync()
+        return self.value()
+
+    def peek(self, value):
+        """Average if `value` were the next bar, without committing it."""
+        count = len(self.window)
+        if count == self.period:
+            return (self.weighted + self.period * value - self.total) / self.denominator
+        if count == self.period - 1:
+            return (self.weighted + self.period * value) / self.denominator
+        return math.nan
+
+    def value(self):
+        return self.weighted / self.denominator if len(self.window) == self.period else math.nan
+
+    def resync(self):
+        self.total = math.fsum(self.window)
+        self.weighted = math.fsum(weight * value for weight, value in enumerate(self.window, 1))
+
+    def get_state(self):
+        """Everything update() depends on, as a flat list of floats."""
+        return [self.updates, self.total, self.weighted, *self.window]
+
+    def set_state(self, state):
+        self.updates, self.total, self.weighted = int(state[0]), float(state[1]), float(state[2])
+        self.window = deque(float(value) for value in state[3:])
+
+
+class EMA:
+    """Exponential moving average seeded with the SMA of the first `period` bars, like pandas_ta."""
+
+    def __init__(self, period):
+        self.period = _length(period)
+        self.alpha = 2 / (self.period + 1)
+        self.count = 0
+        self.seed_total = 0.0
+        self.ema = math.nan
+
+    def update(self, value):
+        """Commit a closed bar and return the new average (nan until `period` bars were seen)."""
+        self.ema = self.peek(value)
+        self.count += 1
+        if self.count < self.period:
+            self.seed_total += value
+        return self.ema
+
+    def peek(self, value):
+        """Average if `value` were the next bar, without committing it."""
+        if self.count >= self.period:
+            return self.alpha * value + (1 - self.alpha) * self.ema
+        if self.count == self.period - 1:
+            return (self.seed_total + value) / self.period
+        return math.nan
+
+    def value(self):
+        return self.ema
+
+    def get_state(self):
+        """Everything update() depends on, as a flat list of floats."""
+        return [self.count, self.seed_total, self.ema]
+
+    def set_state(self, state):
+        self.count, self.seed_total, self.ema = int(state[0]), float(state[1]), float(state[2])
+
+
+class HMA:
+    """Hull moving average: WMA(2 * WMA(n / 2) - WMA(n), sqrt(n)), built from streaming WMAs."""
+
+    def __init__(self, period):
+        self.period = _length(period)
+        self.half = WMA(int(self.period / 2))
+        self.full = WMA(self.period)
+        self.smooth = WMA(int(math.sqrt(self.period)))
+
+    def update(self, value):
+        """Commit a closed bar and return the new average (nan until enough bars were seen)."""
+        half = self.half.update(value)
+        full = self.full.update(value)
+        if math.isnan(half) or math.isnan(full):
+            return math.nan
+        return self.smooth.update(2 * half - full)
+
+    def peek(self, value):
+        """Average if `value` were the next bar, without committing it."""
+        half = self.half.peek(value)
+        full = self.full.peek(value)
+        if math.isnan(half) or math.isnan(full):
+            return math.nan
+        return self.smooth.peek(2 * half - full)
+
+    def value(self):
+        return self.smooth.value()
+
+    def get_state(self):
+        """The three WMA states, each of the first two prefixed with its length."""
+        half, full = self.half.get_state(), self.full.get_state()
+        return [len(half), *half, len(full), *full, *self.smooth.get_state()]
+
+    def set_state(self, state):
+        state = list(state)
+        end = 1 + int(state[0])
+        self.half.set_state(state[1:end])
+        start, end = end + 1, end + 1 + int(state[end])
+        self.full.set_state(state[start:end])
+        self.smooth.set_state(state[end:])
+
+
+MOVING_AVERAGES = {'SMA': SMA, 'EMA': EMA, 'WMA': WMA, 'HMA': HMA}
+
+
+def make_moving_average(ma_type, period):
+    if ma_type not in MOVING_AVERAGES:
+        raise ValueError(f"Unsupported ma_type: {ma_type}")
+    return MOVING_AVERAGES[ma_type](period)
+
+
+class _IndicatorState:
+    __slots__ = ('indicator', 'last_timestamp')
+
+    def __init__(self, indicator):
+        self.indicator = indicator
+        self.last_timestamp = None
+
+
+class IndicatorEngine:
+    """Streaming moving averages keyed by (symbol, maType, period).
+
+    Every order on the same symbol and parameters shares one indicator. Closed bars are
+    committed once; the newest bar is still forming, so it is only ever peeked at. One
+    engine can serve several monitors (one per strategy): each prunes as its own owner
+    and an indicator is kept while any owner still holds the symbol.
+    """
+
+    def __init__(self):
+        self._states = {}
+        self._held = {}  # owner -> symbols it holds
+        self._lock = threading.Lock()
+
+    def current_ma(self, symbol, ma_type, period, ohlcv):
+        """Latest MA value for the bars in ohlcv, consuming only bars not seen before."""
+        if ohlcv is None or ohlcv.empty:
+            raise ValueError("OHLCV EMPTY!")
+
+        key = (symbol, ma_type, int(period))
+        index = ohlcv.index
+        closes = ohlcv['Close'].to_numpy(dtype=np.float64)
+        with self._lock:
+            state = self._states.get(key)
+            if state is None or state.last_timestamp is None or state.last_timestamp < index[0]:
+                # First sight of this key, or a gap wider than the buffer: rebuild from scratch
+                state = self._states[key] = _IndicatorState(make_moving_average(ma_type, period))
+                start = 0
+            else:
+                start = index.searchsorted(state.last_timestamp, side='right')
+
+            for value in closes[start:-1]:
+                state.indicator.update(value)
+            if start < len(closes) - 1:
+                state.last_timestamp = index[-2]
+            return state.indicator.peek(closes[-1])
+
+    def prune(self, symbols, owner=None):
+        """Forget indicators for symbols that are no longer held by owner or anyone else."""
+        with self._lock:
+            self._held[owner] = set(symbols)
+            self._drop_unheld()
+
+    def release(self, owner):
+        """Forget everything only owner held, e.g. a strategy that was removed."""
+        with self._lock:
+            self._held.pop(owner, None)
+            self._drop_unheld()
+
+    def _drop_unheld(self):
+        held = set().union(*self._held.values())
+        for key in [key for key in self._states if key[0] not in held]:
+            del self._states[key]
+
+    def export_state(self):
+        """(symbol, maType, period, last committed bar timestamp, indicator state) per indicator."""
+        with self._lock:
+            return [(symbol, ma_type, period, state.last_timestamp, state.indicator.get_state())
+                    for (symbol, ma_type, period), state in self._states.items()]
+
+    def import_state(self, entries):
+        """Restore indicators saved with export_state(); ones already running are kept as they are."""
+        with self._lock:
+            for symbol, ma_type, period, last_timestamp, values in entries:
+                key = (symbol, ma_type, int(period))
+                if key in self._states or ma_type not in MOVING_AVERAGES:
+                    continue
+                state = self._states[key] = _IndicatorState(make_moving_average(ma_type, period))
+                state.indicator.set_state(values)
+                state.last_timestamp = last_timestamp
+
+    def __len__(self):
+        return len(self._states)
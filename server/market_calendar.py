@@ -0,0 +1,117 @@
+from datetime import date, datetime, time, timedelta
+from functools import lru_cache
+from zoneinfo import ZoneInfo
+
+
+def _observed(day: date) -> date:
+    """Saturday holidays are observed on Friday, Sunday ones on Monday."""
+    if day.weekday() == 5:
+        return day - timedelta(days=1)
+    if day.weekday() == 6:
+        return day + timedelta(days=1)
+    return day
+
+
+def _nth_weekday(year, month, weekday, n):
+    """n-th given weekday of the month (n=-1 for the last one)."""
+    if n > 0:
+        first = date(year, month, 1)
+        return first + timedelta(days=(weekday - first.weekday()) % 7 + 7 * (n - 1))
+    last = date(year + month // 12, month % 12 + 1, 1) - timedelta(days=1)
+    return last - timedelta(days=(last.weekday() - weekday) % 7)
+
+
+def _easter(year) -> date:
+    """Gregorian Easter Sunday (Meeus/Jones/Butcher algorithm)."""
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+
+@lru_cache(maxsize=None)
+def us_equity_holidays(year) -> frozenset:
+    """Full-day NYSE/Nasdaq closures of a year under the current holiday rules.
+
+    Early closes (13:00 the day after Thanksgiving and around Christmas and July 4th) are
+    not listed; on those days the monitor simply keeps polling until the regular close.
+    """
+    holidays = {
+        _nth_weekday(year, 1, 0, 3),  # Martin Luther King Jr. Day
+        _nth_weekday(year, 2, 0, 3),  # Washington's Birthday
+        _easter(year) - timedelta(days=2),  # Good Friday
+        _nth_weekday(year, 5, 0, -1),  # Memorial Day
+        _observed(date(year, 7, 4)),
+        _nth_weekday(year, 9, 0, 1),  # Labor Day
+        _nth_weekday(year, 11, 3, 4),  # Thanksgiving
+        _observed(date(year, 12, 25)),
+    }
+    # New Year's Day falling on a Saturday is not moved back into the old year
+    if date(year, 1, 1).weekday() != 5:
+        holidays.add(_observed(date(year, 1, 1)))
+    if year >= 2022:
+        holidays.add(_observed(date(year, 6, 19)))  # Juneteenth
+    return frozenset(holidays)
+
+
+class MarketCalendar:
+    """Regular trading sessions of one exchange: weekdays from open to close, minus holidays.
+
+    `grace` keeps the session open a little past the close so the last bars, which the
+    data source publishes after the minute ends, are still picked up.
+    """
+
+    def __init__(self, timezone='America/New_York', open_time=time(9, 30), close_time=time(16, 0),
+                 holidays=us_equity_holidays, grace=timedelta(minutes=2)):
+        self.timezone = ZoneInfo(timezone)
+        self.open_time = open_time
+        self.close_time = close_time
+        self.holidays = holidays
+        self.grace = grace
+
+    def _now(self, now):
+        if now is None:
+            return datetime.now(self.timezone)
+        if now.tzinfo is None:
+            # Naive times are local wall-clock times, as datetime.now() returns them
+            now = now.astimezone()
+        return now.astimezone(self.timezone)
+
+    def is_trading_day(self, day: date) -> bool:
+        return day.weekday() < 5 and day not in self.holidays(day.year)
+
+    def session(self, day: date):
+        """(open, close) of the day's session as aware datetimes, close including the grace period."""
+        opens = datetime.combine(day, self.open_time, self.timezone)
+        closes = datetime.combine(day, self.close_time, self.timezone) + self.grace
+        return opens, closes
+
+    def is_open(self, now=None) -> bool:
+        now = self._now(now)
+        if not self.is_trading_day(now.date()):
+            return False
+        opens, closes = self.session(now.date())
+        return opens <= now < closes
+
+    def next_open(self, now=None) -> datetime:
+        """Start of the current session if it is open, else of the next one."""
+        now = self._now(now)
+        day = now.date()
+        while True:
+            if self.is_trading_day(day):
+                opens, closes = self.session(day)
+                if now < closes:
+                    return opens
+            day += timedelta(days=1)
+
+    def seconds_until_open(self, now=None) -> float:
+        """0 while the market is open, else how long until it opens."""
+        now = self._now(now)
+        return max(0.0, (self.next_open(now) - now).total_seconds())
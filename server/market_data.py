@@ -0,0 +1,360 @@
+import logging
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+import yfinance as yf
+
+from metrics import METRICS
+
+
+class DataSource:
+    """Interface for anything that can hand out OHLCV bars for many symbols at once."""
+
+    # Called with the number of requests about to go upstream, blocking while over the rate limit;
+    # MarketDataGateway points it at its token bucket
+    throttle: Optional[Callable[[int], None]] = None
+
+    def before_request(self, requests=1):
+        if self.throttle is not None:
+            self.throttle(requests)
+
+    def fetch(self, symbols: Iterable[str], start: datetime, end: datetime, interval: str = '1m') -> Dict[str, pd.DataFrame]:
+        """Return a {symbol: ohlcv} mapping. Symbols without data are left out."""
+        raise NotImplementedError
+
+
+class YFinanceDataSource(DataSource):
+    """Pulls bars from Yahoo with one download per chunk of symbols, up to max_workers chunks in parallel.
+
+    Yahoo has no multi-ticker chart endpoint: a yf.download() with threads=False requests its
+    tickers one after another. Small chunks are what make the fetch parallel, and max_workers
+    is what bounds the number of requests in flight.
+    """
+
+    def __init__(self, chunk_size=1, max_workers=8):
+        self.chunk_size = chunk_size
+        self.max_workers = max_workers
+
+    def fetch(self, symbols, start, end, interval='1m'):
+        symbols = list(dict.fromkeys(symbols))
+        if not symbols:
+            return {}
+        chunks = [symbols[i:i + self.chunk_size] for i in range(0, len(symbols), self.chunk_size)]
+        if len(chunks) == 1:
+            return self.fetch_chunk(chunks[0], start, end, interval)
+
+        result = {}
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(chunks))) as pool:
+            for frames in pool.map(lambda chunk: self.fetch_chunk(chunk, start, end, interval), chunks):
+                result.update(frames)
+        return result
+
+    def fetch_chunk(self, symbols: List[str], start, end, interval) -> Dict[str, pd.DataFrame]:
+        # One request per ticker, each sent only once the rate limit allows it
+        self.before_request(len(symbols))
+        try:
+            data = yf.download(
+                tickers=symbols, start=start, end=end, interval=interval,
+                group_by='ticker', auto_adjust=True, threads=False, progress=False,
+            )
+        except Exception as e:
+            logging.error(f"Batched download failed for {symbols}: {str(e)}")
+            return {}
+        return split_by_symbol(data, symbols)
+
+
+def split_by_symbol(data: pd.DataFrame, symbols: List[str]) -> Dict[str, pd.DataFrame]:
+    """Split a multi-ticker yfinance frame into one OHLCV frame per symbol."""
+    frames = {}
+    if data is None or data.empty:
+        return frames
+
+    if isinstance(data.columns, pd.MultiIndex):
+        available = set(data.columns.get_level_values(0))
+        for symbol in symbols:
+            if symbol not in available:
+                continue
+            frame = data[symbol].dropna(how='all')
+            if not frame.empty:
+                frames[symbol] = frame
+    elif len(symbols) == 1:
+        frame = data.dropna(how='all')
+        if not frame.empty:
+            frames[symbols[0]] = frame
+
+    for symbol, frame in frames.items():
+        frame.columns.name = None
+        frame.index.name = 'Datetime'
+    return frames
+
+
+class TokenBucket:
+    """Allows `rate` acquisitions per second on average, with bursts of up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens=1) -> float:
+        """Take `tokens` tokens, sleeping until they are available. Returns the seconds waited.
+
+        More tokens than the capacity are taken as they refill, so large requests only wait longer.
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    taken = min(tokens, int(self._tokens))
+                    self._tokens -= taken
+                    tokens -= taken
+                    if not tokens:
+                        return waited
+                delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+def _instant(moment) -> datetime:
+    """Aware datetime for comparing starts; naive ones are local wall-clock time, like datetime.now()."""
+    moment = pd.Timestamp(moment).to_pydatetime()
+    return moment if moment.tzinfo is not None else moment.astimezone()
+
+
+# Upstream budget of a process's default gateway: requests per second, and the largest burst
+GATEWAY_RATE = 2.0
+GATEWAY_BURST = 5
+
+
+class _Flight:
+    """One upstream fetch in progress; concurrent requests for its symbols wait on it."""
+
+    def __init__(self, start):
+        self.start = start
+        self.frames = {}
+        self.done = threading.Event()
+
+
+class MarketDataGateway(DataSource):
+    """The one way out to Yahoo: every fetch goes through here.
+
+    - a token bucket limits upstream requests to `rate` per second (bursts of `burst`); the
+      source takes a token right before each request it sends (see DataSource.throttle), so
+      requests running in parallel cannot go out in one burst either
+    - single flight: a symbol already being fetched (from the same start or earlier) is not
+      requested again, the second caller waits for the first fetch and shares its bars
+    - a symbol whose fetch fails or comes back empty is not retried before an exponential
+      backoff (backoff_base * 2^(failures-1), capped at backoff_max) has passed
+    - meanwhile, and whenever a fetch fails, the last good bars are served if they are not
+      older than max_stale seconds and were fetched from the requested start or earlier, so a
+      seed never gets the few bars of an incremental refresh
+    """
+
+    def __init__(self, source: DataSource = None, rate=GATEWAY_RATE, burst=GATEWAY_BURST, backoff_base=1.0, backoff_max=300.0, max_stale=3600.0):
+        self.source = source or YFinanceDataSource()
+        self.source.throttle = self._throttle
+        self.bucket = TokenBucket(rate, burst)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_stale = max_stale
+        self._inflight = {}  # (symbol, interval) -> _Flight
+        self._last_good = {}  # (symbol, interval) -> (monotonic time, start fetched from, bars)
+        self._failures = {}  # (symbol, interval) -> (consecutive failures, monotonic time of the next try)
+        self._lock = threading.Lock()
+
+    def fetch(self, symbols, start, end, interval='1m'):
+        symbols = list(dict.fromkeys(symbols))
+        now = time.monotonic()
+        # Seeds ask from a naive local time, refreshes from the last bar's tz-aware timestamp
+        requested = _instant(start)
+        owned, joined, unavailable = [], {}, []
+        with self._lock:
+            for symbol in symbols:
+                key = (symbol, interval)
+                flight = self._inflight.get(key)
+                if flight is not None and flight.start <= requested:
+                    joined[symbol] = flight
+                elif key in self._failures and self._failures[key][1] > now:
+                    unavailable.append(symbol)
+                else:
+                    owned.append(symbol)
+            flight = _Flight(requested)
+            for symbol in owned:
+                self._inflight[(symbol, interval)] = flight
+        if joined:
+            METRICS.counter('gateway_deduplicated_total').inc(len(joined))
+
+        result = {}
+        if owned:
+            try:
+                flight.frames = self._fetch_upstream(owned, start, end, interval)
+            finally:
+                self._settle(flight, owned, interval)
+            result.update(flight.frames)
+            unavailable += [symbol for symbol in owned if symbol not in flight.frames]
+
+        for symbol, other in joined.items():
+            other.done.wait()
+            if symbol in other.frames:
+                result[symbol] = other.frames[symbol]
+            else:
+                unavailable.append(symbol)
+
+        for symbol in unavailable:
+            stale = self._stale(symbol, interval, requested)
+            if stale is not None:
+                METRICS.counter('gateway_stale_served_total').inc()
+                result[symbol] = stale
+        return result
+
+    def history(self, symbol: str, days=1, interval='1m'):
+        """The last `days` of bars for one symbol, or None when there are none."""
+        end = datetime.now()
+        return self.fetch([symbol], end - timedelta(days=days), end, interval=interval).get(symbol)
+
+    def _throttle(self, requests):
+        METRICS.histogram('gateway_rate_limit_wait_seconds').observe(self.bucket.acquire(requests))
+        METRICS.counter('gateway_upstream_requests_total').inc(requests)
+
+    def _fetch_upstream(self, symbols, start, end, interval):
+        try:
+            return self.source.fetch(symbols, start, end, interval=interval)
+        except Exception as e:
+            logging.error(f"Market data fetch failed for {symbols}: {str(e)}")
+            return {}
+
+    def _settle(self, flight, symbols, interval):
+        now = time.monotonic()
+        with self._lock:
+            for symbol in symbols:
+                key = (symbol, interval)
+                if self._inflight.get(key) is flight:
+                    del self._inflight[key]
+                if symbol in flight.frames:
+                    self._last_good[key] = (now, flight.start, flight.frames[symbol])
+                    self._failures.pop(key, None)
+                else:
+                    failures = self._failures.get(key, (0, 0))[0] + 1
+                    delay = min(self.backoff_max, self.backoff_base * 2 ** (failures - 1))
+                    self._failures[key] = (failures, now + delay)
+                    METRICS.counter('gateway_failures_total').inc()
+        flight.done.set()
+
+    def _stale(self, symbol, interval, requested):
+        with self._lock:
+            entry = self._last_good.get((symbol, interval))
+        if entry is None or time.monotonic() - entry[0] > self.max_stale or entry[1] > requested:
+            return None
+        return entry[2]
+
+
+_default_gateway = None
+_default_gateway_lock = threading.Lock()
+
+
+def default_gateway() -> MarketDataGateway:
+    """Process-wide gateway shared by every caller that does not bring its own data source."""
+    global _default_gateway
+    with _default_gateway_lock:
+        if _default_gateway is None:
+            _default_gateway = MarketDataGateway()
+        return _default_gateway
+
+
+class BarBuffer:
+    """Rolling window of the most recent bars for one symbol, grown by appending new bars."""
+
+    def __init__(self, max_bars: int):
+        self.max_bars = max_bars
+        self.frame = None
+        self.version = 0
+
+    @property
+    def empty(self) -> bool:
+        return self.frame is None or self.frame.empty
+
+    @property
+    def last_timestamp(self) -> pd.Timestamp:
+        return self.frame.index[-1]
+
+    def append(self, bars: pd.DataFrame) -> int:
+        """Merge freshly fetched bars and trim to max_bars. Returns how many rows were received.
+
+        Bars overlapping what we already hold replace the stored ones, since the most
+        recent 1m bar keeps changing until the minute closes.
+        """
+        if bars is None or bars.empty:
+            return 0
+        if self.empty:
+            merged = bars
+        else:
+            keep = self.frame.index.searchsorted(bars.index[0])
+            merged = pd.concat([self.frame.iloc[:keep], bars])
+        # A new frame every time, so readers holding the previous one are never affected
+        self.frame = merged.iloc[-self.max_bars:]
+        self.version += 1
+        return len(bars)
+
+
+def _synthetic_close(t, seed, base):
+    noise = np.modf(np.abs(np.sin(t * 12.9898 + seed) * 43758.5453))[0] - 0.5
+    close = base * (1 + 0.03 * np.sin(t / 390 + seed) + 0.01 * np.sin(t / 17 + seed) + 0.002 * noise)
+    return close, noise
+
+
+def synthetic_ohlcv(symbol: str, start: datetime, end: datetime, freq: str = '1min') -> pd.DataFrame:
+    """Deterministic fake bars: the same symbol and timestamp always give the same prices."""
+    index = pd.date_range(pd.Timestamp(start).ceil(freq), pd.Timestamp(end), freq=freq, inclusive='left', name='Datetime')
+    if len(index) == 0:
+        return pd.DataFrame(columns=['Open', 'High', 'Low', 'Close', 'Volume'], index=index)
+
+    seed = zlib.crc32(symbol.encode()) % 10_000
+    base = 20 + seed / 50
+    t = (index.asi8 // 60_000_000_000).astype(np.float64)
+    close, noise = _synthetic_close(t, seed, base)
+    open_, _ = _synthetic_close(t - 1, seed, base)
+    spread = base * 0.001 * (1 + np.abs(noise))
+    return pd.DataFrame({
+        'Open': open_,
+        'High': np.maximum(open_, close) + spread,
+        'Low': np.minimum(open_, close) - spread,
+        'Close': close,
+        'Volume': (1000 + 9000 * (noise + 0.5)).astype(np.int64),
+    }, index=index)
+
+
+class FakeDataSource(DataSource):
+    """Offline feed for tests and benchmarks, counts how often it is asked for data."""
+
+    def __init__(self, symbols=None):
+        self.symbols = set(symbols) if symbols is not None else None
+        self.calls = 0
+        self.symbols_fetched = 0
+        self.bars_served = 0
+
+    def fetch(self, symbols, start, end, interval='1m'):
+        self.calls += 1
+        freq = interval.replace('m', 'min') if interval.endswith('m') else interval
+        result = {}
+        for symbol in dict.fromkeys(symbols):
+            # Like Yahoo: one request per ticker
+            self.before_request()
+            if self.symbols is not None and symbol not in self.symbols:
+                continue
+            self.symbols_fetched += 1
+            frame = synthetic_ohlcv(symbol, start, end, freq)
+            if not frame.empty:
+                self.bars_served += len(frame)
+                result[symbol] = frame
+        return result
@@ -0,0 +1,179 @@
+import logging
+import os
+import tempfile
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from indicators import IndicatorEngine
+from order_monitor import MarketDataSnapshot
+
+STATE_VERSION = 1
+BAR_COLUMNS = ('Open', 'High', 'Low', 'Close', 'Volume')
+# Older snapshots are ignored: Yahoo only serves 1m bars for the last few days, so the gap could not be filled
+MAX_STATE_AGE = 5 * 24 * 3600
+_NO_TIMESTAMP = np.iinfo(np.int64).min
+
+
+def _to_ns(timestamp):
+    """Nanoseconds (UTC for tz-aware timestamps) and the timezone name, '' if naive."""
+    timestamp = pd.Timestamp(timestamp)
+    return timestamp.value, str(timestamp.tz) if timestamp.tz is not None else ''
+
+
+def _to_index(ns, tz):
+    index = pd.DatetimeIndex(np.asarray(ns, dtype='datetime64[ns]'), name='Datetime')
+    return index.tz_localize('UTC').tz_convert(tz) if tz else index
+
+
+def _strings(values):
+    # At least one character wide, so empty lists still make a valid unicode array
+    return np.array(list(values), dtype=str) if values else np.array([], dtype='U1')
+
+
+def save_state(path, market_data: MarketDataSnapshot, indicators: IndicatorEngine):
+    """Write bar buffers and indicator state to one .npz file, swapped in with os.replace()
+    so a crash mid-write leaves the previous snapshot intact. Returns the file size in bytes."""
+    max_bars, frames = market_data.export_buffers()
+    bar_symbols, bar_tz, bar_offsets, bar_index, bar_values = [], [], [0], [], []
+    for symbol, frame in frames.items():
+        bar_symbols.append(symbol)
+        bar_tz.append(str(frame.index.tz) if frame.index.tz is not None else '')
+        bar_offsets.append(bar_offsets[-1] + len(frame))
+        bar_index.append(frame.index.asi8)
+        bar_values.append(frame.reindex(columns=list(BAR_COLUMNS)).to_numpy(dtype=np.float64))
+
+    entries = indicators.export_state()
+    ma_last, ma_tz, ma_offsets, ma_values = [], [], [0], []
+    for _, _, _, last_timestamp, values in entries:
+        ns, tz = _to_ns(last_timestamp) if last_timestamp is not None else (_NO_TIMESTAMP, '')
+        ma_last.append(ns)
+        ma_tz.append(tz)
+        ma_offsets.append(ma_offsets[-1] + len(values))
+        ma_values.extend(values)
+
+    arrays = {
+        'version': np.array(STATE_VERSION),
+        'saved_at': np.array(time.time()),
+        'max_bars': np.array(max_bars),
+        'bar_symbols': _strings(bar_symbols),
+        'bar_tz': _strings(bar_tz),
+        'bar_offsets': np.array(bar_offsets, dtype=np.int64),
+        'bar_index': np.concatenate(bar_index) if bar_index else np.empty(0, dtype=np.int64),
+        'bar_values': np.concatenate(bar_values) if bar_values else np.empty((0, len(BAR_COLUMNS))),
+        'ma_symbols': _strings(entry[0] for entry in entries),
+        'ma_types': _strings(entry[1] for entry in entries),
+        'ma_periods': np.array([entry[2] for entry in entries], dtype=np.int64),
+        'ma_last': np.array(ma_last, dtype=np.int64),
+        'ma_tz': _strings(ma_tz),
+        'ma_offsets': np.array(ma_offsets, dtype=np.int64),
+        'ma_values': np.array(ma_values, dtype=np.float64),
+    }
+    # A temp file of our own: the debug reloader runs two server processes saving to the same path
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            np.savez(f, **arrays)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return os.path.getsize(path)
+
+
+def _decode(state):
+    """({symbol: bars}, indicator entries) from the arrays of a snapshot."""
+    frames = {}
+    offsets = state['bar_offsets']
+    for i, symbol in enumerate(state['bar_symbols'].tolist()):
+        rows = slice(offsets[i], offsets[i + 1])
+        frame = pd.DataFrame(state['bar_values'][rows], columns=list(BAR_COLUMNS),
+                             index=_to_index(state['bar_index'][rows], state['bar_tz'][i]))
+        if not frame['Volume'].isna().any():
+            frame['Volume'] = frame['Volume'].astype(np.int64)
+        frames[symbol] = frame
+
+    entries = []
+    offsets = state['ma_offsets']
+    for i, (symbol, ma_type, period) in enumerate(zip(state['ma_symbols'].tolist(), state['ma_types'].tolist(), state['ma_periods'].tolist())):
+        ns = int(state['ma_last'][i])
+        last_timestamp = None if ns == _NO_TIMESTAMP else _to_index([ns], state['ma_tz'][i])[0]
+        entries.append((symbol, ma_type, period, last_timestamp, state['ma_values'][offsets[i]:offsets[i + 1]].tolist()))
+    return frames, entries
+
+
+def load_state(path, market_data: MarketDataSnapshot, indicators: IndicatorEngine, max_age=MAX_STATE_AGE):
+    """Seed market_data and indicators from a save_state() file.
+
+    Returns (symbols, indicators) restored; (0, 0) when there is no usable snapshot, in
+    which case the monitor simply starts cold.
+    """
+    if not os.path.exists(path):
+        return 0, 0
+    try:
+        with np.load(path, allow_pickle=False) as state:
+            if int(state['version']) != STATE_VERSION:
+                logging.error(f"Ignoring market state {path}: version {int(state['version'])}, expected {STATE_VERSION}")
+                return 0, 0
+            if time.time() - float(state['saved_at']) > max_age:
+                logging.info(f"Ignoring market state {path}: older than {max_age / 3600:g}h")
+                return 0, 0
+            max_bars = int(state['max_bars'])
+            frames, entries = _decode(state)
+    except Exception as e:
+        # Truncated zips raise BadZipFile, damaged members anything from KeyError to EOFError
+        logging.error(f"Ignoring unreadable market state {path}: {str(e)}")
+        return 0, 0
+
+    market_data.import_buffers(max_bars, frames)
+    indicators.import_state(entries)
+    return len(frames), len(entries)
+
+
+class MarketStateStore:
+    """Keeps a warm-restart snapshot of the monitor's bars and streaming MAs on disk.
+
+    start() reloads the last snapshot, so after a restart only the bars since it are
+    fetched and the MAs pick up where they left off; a background thread saves every
+    save_interval seconds and close() saves once more.
+    """
+
+    def __init__(self, path, market_data: MarketDataSnapshot, indicators: IndicatorEngine, save_interval=300):
+        self.path = path
+        self.market_data = market_data
+        self.indicators = indicators
+        self.save_interval = save_interval
+        self._stop = threading.Event()
+        self._saver = None
+
+    def load(self):
+        symbols, restored = load_state(self.path, self.market_data, self.indicators)
+        if symbols or restored:
+            logging.info(f"Restored bars for {symbols} symbols and {restored} indicators from {self.path}")
+        return symbols, restored
+
+    def save(self):
+        try:
+            save_state(self.path, self.market_data, self.indicators)
+        except Exception as e:
+            logging.error(f"Saving market state failed: {str(e)}")
+
+    def start(self):
+        self.load()
+        if self.save_interval:
+            self._saver = threading.Thread(target=self._save_periodically, daemon=True)
+            self._saver.start()
+
+    def _save_periodically(self):
+        while not self._stop.wait(self.save_interval):
+            self.save()
+
+    def close(self):
+        self._stop.set()
+        if self._saver is not None:
+            self._saver.join()
+        self.save()
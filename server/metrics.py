@@ -0,0 +1,184 @@
+import bisect
+import cProfile
+import functools
+import io
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds in seconds; observations above the last one only land in +Inf
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+HELP = {
+    'stage_seconds': "Time spent per monitor stage.",
+    'stage_errors_total': "Exceptions raised per monitor stage.",
+    'lock_wait_seconds': "Time spent waiting for the order store file lock.",
+    'lock_timeouts_total': "Order store file locks that timed out.",
+    'gateway_upstream_requests_total': "Market data requests sent upstream by the gateway.",
+    'gateway_deduplicated_total': "Symbol requests served by a fetch already in flight.",
+    'gateway_failures_total': "Symbols whose upstream fetch failed or came back empty.",
+    'gateway_stale_served_total': "Symbols answered with their last good bars.",
+    'gateway_rate_limit_wait_seconds': "Time upstream requests waited for the rate limiter.",
+}
+
+
+class Histogram:
+    """Fixed-bucket histogram; observe() is a bisect and three additions under a lock."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    def snapshot(self):
+        """(cumulative count per bucket including +Inf, sum, count)."""
+        with self._lock:
+            counts, total = list(self._counts), self._sum
+        cumulative, running = [], 0
+        for count in counts:
+            running += count
+            cumulative.append(running)
+        return cumulative, total, running
+
+
+class Counter:
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{value}"' for key, value in labels) + '}'
+
+
+class MetricsRegistry:
+    """Histograms, counters and callback gauges rendered in the Prometheus text format."""
+
+    def __init__(self, prefix='order_tracker'):
+        self.prefix = prefix
+        self._families = {}  # name -> (kind, {labels: Histogram | Counter | callable})
+        self._lock = threading.Lock()
+
+    def _get(self, kind, factory, name, labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            family = self._families.setdefault(name, (kind, {}))[1]
+            metric = family.get(key)
+            if metric is None:
+                metric = family[key] = factory()
+            return metric
+
+    def histogram(self, name, **labels) -> Histogram:
+        return self._get('histogram', Histogram, name, labels)
+
+    def counter(self, name, **labels) -> Counter:
+        return self._get('counter', Counter, name, labels)
+
+    def register_callback(self, name, kind, fn, **labels):
+        """Report fn() as a counter or gauge at render time, e.g. hit counts kept elsewhere."""
+        self._get(kind, lambda: fn, name, labels)
+
+    @contextmanager
+    def time(self, stage):
+        """Record the duration of the block in stage_seconds, and count it if it raises."""
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.counter('stage_errors_total', stage=stage).inc()
+            raise
+        finally:
+            self.histogram('stage_seconds', stage=stage).observe(time.perf_counter() - started)
+
+    def timed(self, stage):
+        """Decorator version of time()."""
+        def decorator(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.time(stage):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def render(self) -> str:
+        with self._lock:
+            families = {name: (kind, dict(metrics)) for name, (kind, metrics) in self._families.items()}
+        lines = []
+        for name, (kind, metrics) in sorted(families.items()):
+            full_name = f'{self.prefix}_{name}'
+            if name in HELP:
+                lines.append(f'# HELP {full_name} {HELP[name]}')
+            lines.append(f'# TYPE {full_name} {kind}')
+            for labels, metric in sorted(metrics.items()):
+                if kind == 'histogram':
+                    cumulative, total, count = metric.snapshot()
+                    bounds = [repr(bound) for bound in metric.buckets] + ['+Inf']
+                    for bound, bucket_count in zip(bounds, cumulative):
+                        lines.append(f'{full_name}_bucket{_format_labels(labels + (("le", bound),))} {bucket_count}')
+                    lines.append(f'{full_name}_sum{_format_labels(labels)} {total}')
+                    lines.append(f'{full_name}_count{_format_labels(labels)} {count}')
+                elif callable(metric):
+                    lines.append(f'{full_name}{_format_labels(labels)} {metric()}')
+                else:
+                    lines.append(f'{full_name}{_format_labels(labels)} {metric.value}')
+        return '\n'.join(lines) + '\n'
+
+
+class TickProfiler:
+    """Runs the next monitor tick under cProfile when someone asks for a profile.
+
+    Ticks that nobody asked about pay one lock acquisition and nothing else.
+    """
+
+    def __init__(self, sort='cumulative', limit=40):
+        self.sort = sort
+        self.limit = limit
+        self._requested = False
+        self._done = threading.Event()
+        self._result = None
+        self._lock = threading.Lock()
+
+    def request(self, timeout):
+        """Profile the next tick and return the pstats report, or None if no tick ran in time."""
+        with self._lock:
+            self._requested = True
+            done = self._done
+        if not done.wait(timeout):
+            return None
+        return self._result
+
+    def run(self, fn, *args, **kwargs):
+        with self._lock:
+            requested, done = self._requested, self._done
+            if requested:
+                self._requested = False
+                self._done = threading.Event()
+        if not requested:
+            return fn(*args, **kwargs)
+
+        profile = cProfile.Profile()
+        try:
+            return profile.runcall(fn, *args, **kwargs)
+        finally:
+            out = io.StringIO()
+            pstats.Stats(profile, stream=out).sort_stats(self.sort).print_stats(self.limit)
+            self._result = out.getvalue()
+            done.set()
+
+
+METRICS = MetricsRegistry()
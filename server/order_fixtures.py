@@ -0,0 +1,15 @@
+from order_status import OrderStatus
+
+
+def make_order(symbol, **fields):
+    """A HOLDING market order with every field the monitor reads, for tests and benchmarks.
+
+    The rules are loose enough that nothing exits on synthetic bars unless `fields` says so.
+    """
+    order = {
+        'symbol': symbol, 'status': OrderStatus.HOLDING.value, 'orderType': 'market', 'entryPrice': 100.0,
+        'maType': 'EMA', 'period': 8, 'initialSL': 'trailing', 'initialSLPct': 100,
+        'takeProfitPct': 1000, 'secondarySLPct': 1, 'highestMA': 0,
+    }
+    order.update(fields)
+    return order
@@ -1,103 +1,108 @@
 import os
-import json
-import portalocker
 from datetime import datetime
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Union
 
 from order_status import OrderStatus
+from order_storage import OrderStorage, CachedStorage, JsonFileStorage, JournalStorage, SQLiteStorage
+
+STORAGE_BACKENDS = ('json', 'journal', 'sqlite')
 
 class OrderManager:
-    def __init__(self, strategy_name: str, base_dir='.', logging=False):
+    def __init__(self, strategy_name: str, base_dir='.', logging=False, storage: Union[str, OrderStorage] = 'json',
+                 cache=False, flush_interval=1.0, flush_threshold=100):
         self.strategy_name = strategy_name
         self.logging = logging
         script_dir = os.path.dirname(os.path.abspath(__file__))
         self.base_dir = os.path.join(script_dir, base_dir)
         self.ensure_base_dir()
         self.trades_file = f"TRADES_LOG_{self.strategy_name}.json"
-        self.ensure_json_file()
+        self.storage = self.create_storage(storage)
+        if cache:
+            # Reads become dict lookups; writes are coalesced and flushed in the background
+            self.storage = CachedStorage(self.storage, flush_interval=flush_interval, flush_threshold=flush_threshold)
         if self.logging:
             print(f"Initialized OrderManager for strategy: {self.strategy_name}")
 
+    def create_storage(self, storage: Union[str, OrderStorage]) -> OrderStorage:
+        """Build the storage backend: 'json' (default), 'journal', 'sqlite' or a ready OrderStorage instance."""
+        if isinstance(storage, OrderStorage):
+            return storage
+        if storage == 'json':
+            return JsonFileStorage(self.get_trades_file_path(), logging=self.logging)
+        if storage == 'journal':
+            # Same snapshot file as 'json', changes go to TRADES_LOG_<strategy>.journal.jsonl
+            return JournalStorage(self.get_trades_file_path(), logging=self.logging)
+        if storage == 'sqlite':
+            db_path = os.path.join(self.base_dir, f"TRADES_{self.strategy_name}.sqlite3")
+            # The first start on SQLite imports the existing JSON trades log once
+            return SQLiteStorage(db_path, logging=self.logging, migrate_from=self.get_trades_file_path())
+        raise ValueError(f"Unsupported storage: {storage}. Expected one of {STORAGE_BACKENDS}")
+
     def ensure_base_dir(self):
         if not os.path.exists(self.base_dir):
             os.makedirs(self.base_dir)
             if self.logging:
                 print(f"Created base directory: {self.base_dir}")
 
-    def ensure_json_file(self):
-        trades_path = self.get_trades_file_path()
-        if not os.path.exists(trades_path):
-            with open(trades_path, 'w') as f:
-                json.dump([], f)
-            if self.logging:
-                print(f"Created new trades file: {trades_path}")
+    def flush(self):
+        """Write pending cached changes to disk now (no-op without cache)."""
+        if isinstance(self.storage, CachedStorage):
+            self.storage.flush()
+
+    def close(self):
+        """Release the storage backend (stops background threads, flushes pending writes)."""
+        self.storage.close()
 
     def get_trades_file_path(self) -> str:
         return os.path.join(self.base_dir, self.trades_file)
 
     def read_file_with_lock(self) -> List[Dict[str, Any]]:
-        file_path = self.get_trades_file_path()
-        if self.logging:
-            print(f"Reading trades from file: {file_path}")
-        with portalocker.Lock(file_path, 'r', timeout=10) as file:
-            try:
-                return json.load(file)
-            except json.JSONDecodeError:
-                if self.logging:
-                    print("Failed to decode JSON, returning empty list.")
-                return []
+        return self.storage.load_all()
 
     def write_file_with_lock(self, data: List[Dict[str, Any]]):
-        file_path = self.get_trades_file_path()
-        if self.logging:
-            print(f"Writing {len(data)} trades to file: {file_path}")
-        with portalocker.Lock(file_path, 'w', timeout=10) as file:
-            json.dump(data, file, indent=4)
+        self.storage.replace_all(data)
 
     def update_order(self, symbol: str, data: Dict[str, Any]) -> None:
         if self.logging:
             print(f"Updating order for symbol: {symbol}")
-        trades = self.read_file_with_lock()
-        order_index = next((index for (index, d) in enumerate(trades) if d["symbol"] == symbol), None)
-
-        if order_index is not None:
-            trades[order_index].update(data)
-            if self.logging:
-                print(f"Updated existing order for symbol: {symbol}")
-        else:
-            trades.append(data)
-            if self.logging:
-                print(f"Added new order for symbol: {symbol}")
-
-        self.write_file_with_lock(trades)
+        self.storage.upsert(symbol, data)
 
     def exit_order(self, symbol: str) -> None:
         if self.logging:
             print(f"Exiting order for symbol: {symbol}")
-        trades = self.read_file_with_lock()
-        for trade in trades:
-            if trade['symbol'] == symbol:
-                trade['status'] = OrderStatus.EXITED.value        
-                trade['exitDatetime'] = datetime.now().isoformat()
-                if self.logging:
-                    print(f"Marked order as exited for symbol: {symbol}")
-                break
-            
-        self.write_file_with_lock(trades)
-        
+        self.storage.patch(symbol, {
+            'status': OrderStatus.EXITED.value,
+            'exitDatetime': datetime.now().isoformat(),
+        })
+
+    def update_orders(self, updates: Dict[str, Dict[str, Any]], upsert=True) -> None:
+        """update_order() for many symbols at once: one lock, one write.
+
+        With upsert=False symbols that no longer exist are skipped instead of added.
+        """
+        if self.logging:
+            print(f"Updating orders for symbols: {list(updates)}")
+        if updates:
+            self.storage.update_many(updates, upsert=upsert)
+
+    def exit_orders(self, symbols: List[str]) -> None:
+        """exit_order() for many symbols at once: one lock, one write."""
+        if self.logging:
+            print(f"Exiting orders for symbols: {symbols}")
+        exit_datetime = datetime.now().isoformat()
+        updates = {symbol: {'status': OrderStatus.EXITED.value, 'exitDatetime': exit_datetime} for symbol in symbols}
+        if updates:
+            self.storage.update_many(updates, upsert=False)
+
     def get_order(self, symbol: str) -> Optional[Dict[str, Any]]:
         if self.logging:
             print(f"Retrieving order for symbol: {symbol}")
-        trades = self.read_file_with_lock()
-        return next((trade for trade in trades if trade['symbol'] == symbol), None)
+        return self.storage.get(symbol)
 
     def list_orders(self, status: Optional[OrderStatus] = None) -> List[Dict[str, Any]]:
         if self.logging:
             print(f"Listing orders with status: {status}")
-        trades = self.read_file_with_lock()
-        if status:
-            return [trade for trade in trades if trade['status'] == status.value]
-        return trades
+        return self.storage.list(status.value if status else None)
 
     def list_active_trades(self) -> List[Dict[str, Any]]:
         if self.logging:
@@ -111,16 +116,12 @@ class OrderManager:
 
     def delete_order(self, symbol: str):
         """Delete a single order by symbol."""
-        trades = self.read_file_with_lock()
-        trades = [trade for trade in trades if trade['symbol'] != symbol]
-        self.write_file_with_lock(trades)
+        self.storage.delete(symbol)
         if self.logging:
             print(f"Deleted order with symbol: {symbol}")
 
     def delete_all_completed_orders(self):
         """Delete all orders with EXITED status."""
-        trades = self.read_file_with_lock()
-        trades = [trade for trade in trades if trade['status'] != OrderStatus.EXITED.value]
-        self.write_file_with_lock(trades)
+        self.storage.delete_by_status(OrderStatus.EXITED.value)
         if self.logging:
-            print("Deleted all exited orders")
\ No newline at end of file
+            print("Deleted all exited orders")
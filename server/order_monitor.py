@@ -1,49 +1,243 @@
 
 import threading
+from collections import OrderedDict
 import time
-import yfinance as yf
 import pandas as pd
 import pandas_ta as ta
 from datetime import datetime, timedelta
+from typing import Optional
 from order_manager import OrderManager, OrderStatus
+from market_data import BarBuffer, DataSource, default_gateway
+from indicators import IndicatorEngine
+from alerts import AlertBuffer
+from event_stream import EventStream, OrderDeltaTracker
+from exit_rules import EXIT_REASONS, OrderBatch, evaluate_batch, evaluate_exit
+from order_record import load_orders
+from market_calendar import MarketCalendar
+from metrics import METRICS, TickProfiler
 import logging
 
+@METRICS.timed('get_curr_ohlcv')
 def get_curr_ohlcv(symbol, days=1, interval='1m'):
-    # get curr data
-    stock = yf.Ticker(symbol)
-    end_time = datetime.now()
-    start_time = end_time - timedelta(days=days)  #  data for the last 24 hours
-    hist = stock.history(start=start_time, end=end_time, interval=interval)
-    if not hist.empty:
+    # get curr data, rate limited and shared with concurrent callers by the gateway
+    hist = default_gateway().history(symbol, days=days, interval=interval)
+    if hist is not None and not hist.empty:
         return hist
     else:
-        logging.error(f'Stock Data OHLCV empty for {stock}!')
+        logging.error(f'Stock Data OHLCV empty for {symbol}!')
     
 def get_curr_close(ohlcv):
     return ohlcv['Close'].iloc[-1]
 
+def compute_ma_series(ohlcv, ma_type, period):
+    """Full moving-average series over the Close column, computed with pandas_ta."""
+    # The frame may be shared through MarketDataSnapshot, so never write into it.
+    if ma_type == 'HMA':
+        return ta.hma(ohlcv['Close'], length=period)
+    elif ma_type == 'EMA':
+        return ta.ema(ohlcv['Close'], length=period)
+    elif ma_type == 'SMA':
+        return ta.sma(ohlcv['Close'], length=period)
+    elif ma_type == 'WMA':
+        return ta.wma(ohlcv['Close'], length=period)
+    raise ValueError(f"Unsupported ma_type: {ma_type}")
+
+@METRICS.timed('get_curr_ma')
 def get_curr_ma(ohlcv, ma_type, period):
-    """Calculate the moving average (MA) for the given symbol using pandas_ta."""
+    """Calculate the moving average (MA) for the given symbol using pandas_ta.
+
+    Recomputes the whole series; the monitor uses IndicatorEngine and keeps this as the reference.
+    """
 
     if ohlcv.empty:
         raise ValueError(f"OHLCV EMPTY!")
-    
-    if ma_type == 'HMA':
-        ohlcv['MA'] = ta.hma(ohlcv['Close'], length=period)
-    elif ma_type == 'EMA':
-        ohlcv['MA'] = ta.ema(ohlcv['Close'], length=period)
-    elif ma_type == 'SMA':
-        ohlcv['MA'] = ta.sma(ohlcv['Close'], length=period)
-    else:
-        raise ValueError(f"Unsupported ma_type: {ma_type}")
 
-    return ohlcv['MA'].iloc[-1]
+    return compute_ma_series(ohlcv, ma_type, period).iloc[-1]
+
+# Bars kept per symbol for every unit of the longest MA period in use. EMA is seeded from
+# the first bars it sees, so a few periods of warm-up keep it in line with a full-day series.
+HISTORY_PER_PERIOD = 10
+MIN_HISTORY_BARS = 100
+
+class MarketDataSnapshot:
+    """TTL cache of OHLCV bars so each symbol is downloaded at most once per interval.
+
+    Each symbol keeps a rolling BarBuffer: the first fetch seeds it with `days` of history,
+    later refreshes only ask for bars from the last timestamp we already hold. With
+    max_symbols set, the least recently read symbols are evicted beyond that many.
+    """
+
+    def __init__(self, ttl, data_source: Optional[DataSource] = None, days=1, interval='1m', max_bars=MIN_HISTORY_BARS, max_symbols=None):
+        self.ttl = ttl
+        self.data_source = data_source or default_gateway()
+        self.days = days
+        self.interval = interval
+        self.max_bars = max_bars
+        self.max_symbols = max_symbols
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bars_received = 0
+        self._buffers = OrderedDict()  # symbol -> BarBuffer, least recently used first
+        self._fetched_at = {}  # symbol -> monotonic time of the last refresh
+        self._lock = threading.Lock()
+
+    def require_period(self, period):
+        """Make sure buffers hold enough bars for an MA of this length."""
+        max_bars = max(MIN_HISTORY_BARS, int(period) * HISTORY_PER_PERIOD)
+        with self._lock:
+            if max_bars > self.max_bars:
+                # Trimmed buffers cannot grow backwards, so reseed them on the next refresh
+                self.max_bars = max_bars
+                self._buffers.clear()
+                self._fetched_at.clear()
+
+    def _is_fresh(self, symbol, now):
+        fetched_at = self._fetched_at.get(symbol)
+        return fetched_at is not None and now - fetched_at < self.ttl
+
+    def _fetch(self, symbols):
+        end_time = datetime.now()
+        with self._lock:
+            buffers = {symbol: self._buffers.get(symbol) for symbol in symbols}
+        unseeded = [symbol for symbol, buffer in buffers.items() if buffer is None or buffer.empty]
+        seeded = [symbol for symbol, buffer in buffers.items() if buffer is not None and not buffer.empty]
+
+        frames = {}
+        with METRICS.time('fetch_ohlcv'):
+            if unseeded:
+                start_time = end_time - timedelta(days=self.days)
+                frames.update(self.data_source.fetch(unseeded, start_time, end_time, interval=self.interval))
+            # Seeded symbols are asked for the bars from their own last one. Symbols that share it
+            # (usually all those trading) go in one request, so a halted symbol does not make the
+            # others download its whole gap. The start is the bar's own tz-aware timestamp:
+            # yfinance reads naive times as exchange time, so local time would skip hours.
+            by_start = {}
+            for symbol in seeded:
+                by_start.setdefault(buffers[symbol].last_timestamp, []).append(symbol)
+            for start_time, group in by_start.items():
+                frames.update(self.data_source.fetch(group, start_time, end_time, interval=self.interval))
+
+        fetched_at = time.monotonic()
+        with self._lock:
+            for symbol in symbols:
+                buffer = self._buffers.get(symbol)
+                if buffer is None:
+                    buffer = self._buffers[symbol] = BarBuffer(self.max_bars)
+                self.bars_received += buffer.append(frames.get(symbol))
+                if buffer.empty:
+                    logging.error(f'Stock Data OHLCV empty for {symbol}!')
+                self._fetched_at[symbol] = fetched_at
+                self._buffers.move_to_end(symbol)
+            while self.max_symbols is not None and len(self._buffers) > self.max_symbols:
+                evicted, _ = self._buffers.popitem(last=False)
+                self._fetched_at.pop(evicted, None)
+                self.evictions += 1
+
+    def prefetch(self, symbols):
+        """Refresh every stale symbol in one batched request."""
+        now = time.monotonic()
+        with self._lock:
+            stale = [symbol for symbol in dict.fromkeys(symbols) if not self._is_fresh(symbol, now)]
+            self.misses += len(stale)
+        if stale:
+            self._fetch(stale)
+
+    def get_ohlcv(self, symbol):
+        """Return cached bars for symbol, fetching them if missing or older than ttl."""
+        with self._lock:
+            fresh = self._is_fresh(symbol, time.monotonic())
+            if fresh:
+                self.hits += 1
+            else:
+                self.misses += 1
+        if not fresh:
+            self._fetch([symbol])
+        with self._lock:
+            buffer = self._buffers.get(symbol)
+            if buffer is None or buffer.empty:
+                return None
+            self._buffers.move_to_end(symbol)
+            return buffer.frame
+
+    def get_version(self, symbol):
+        """Counter that changes whenever new bars for symbol were stored (0 if unknown)."""
+        with self._lock:
+            buffer = self._buffers.get(symbol)
+            return buffer.version if buffer is not None else 0
+
+    def last_bar(self, symbol):
+        """(timestamp, close) of the newest bar held for symbol, or None. The close is part of
+        it because the current minute's bar keeps changing until the minute ends."""
+        with self._lock:
+            buffer = self._buffers.get(symbol)
+            if buffer is None or buffer.empty:
+                return None
+            return buffer.last_timestamp, float(buffer.frame['Close'].iloc[-1])
+
+    def export_buffers(self):
+        """(max_bars, {symbol: bars}) for every symbol held."""
+        with self._lock:
+            return self.max_bars, {symbol: buffer.frame for symbol, buffer in self._buffers.items() if not buffer.empty}
+
+    def import_buffers(self, max_bars, frames):
+        """Seed buffers with bars saved by export_buffers(). They count as stale, so the next
+        read only fetches the bars since the last saved one."""
+        with self._lock:
+            # Buffers are sized for the longest period in use; keep that so require_period() does not reseed them
+            self.max_bars = max(self.max_bars, int(max_bars))
+            for symbol, frame in frames.items():
+                if symbol in self._buffers or frame is None or frame.empty:
+                    continue
+                buffer = self._buffers[symbol] = BarBuffer(self.max_bars)
+                buffer.append(frame)
+
+    def invalidate(self, symbol=None):
+        """Drop one symbol (or everything) so the next read fetches fresh bars."""
+        with self._lock:
+            if symbol is None:
+                self._buffers.clear()
+                self._fetched_at.clear()
+            else:
+                self._buffers.pop(symbol, None)
+                self._fetched_at.pop(symbol, None)
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                    'symbols': len(self._buffers), 'bars_received': self.bars_received}
+
+# Order fields that change what the exit rules say, besides the bars
+EVALUATION_FIELDS = ('maType', 'period', 'initialSL', 'initialSLPct', 'takeProfitPct', 'secondarySLPct', 'entryPrice')
+# Longest single sleep while the market is closed, so clock changes are noticed
+MAX_IDLE_SECONDS = 15 * 60
 
 class OrderMonitor:
-    def __init__(self, order_manager: OrderManager, price_update_interval, auto_remove_on_exit=False):
+    def __init__(self, order_manager: OrderManager, price_update_interval, auto_remove_on_exit=False, data_source: Optional[DataSource] = None,
+                 calendar: Optional[MarketCalendar] = None, skip_unchanged=True,
+                 market_data: Optional[MarketDataSnapshot] = None, indicators: Optional[IndicatorEngine] = None):
         self.order_manager = order_manager
         self.price_update_interval = price_update_interval
         self.auto_remove_on_exit = auto_remove_on_exit
+        # Shared by the monitor loop and check_orders() so both see one download per interval;
+        # pass market_data and indicators to share them with the monitors of other strategies
+        self.market_data = market_data if market_data is not None else MarketDataSnapshot(ttl=price_update_interval, data_source=data_source)
+        # Streaming MAs shared by all orders on the same (symbol, maType, period)
+        self.indicators = indicators if indicators is not None else IndicatorEngine()
+        # Exit alerts published by each tick, served to /api/notifications without re-evaluating
+        self.alerts = AlertBuffer()
+        # Push channel for /api/stream: per-tick order deltas (changed fields only) and new alerts
+        self.events = EventStream()
+        self.order_deltas = OrderDeltaTracker()
+        # Profiles the next tick when /api/metrics/profile asks for it
+        self.profiler = TickProfiler()
+        # With a calendar the loop sleeps through closed markets instead of polling them
+        self.calendar = calendar
+        # Orders are only re-evaluated when their symbol got a new or revised bar, or their rules changed
+        self.skip_unchanged = skip_unchanged
+        self._evaluated = {}  # symbol -> (last bar, rule fields) it was last evaluated on
+        self._signalling = {}  # symbol -> latest exit alert, carried over while the order is skipped
+        self._stopped = threading.Event()
         self.price_update_thread = threading.Thread(target=self.update_prices_continuously, daemon=True)
         self.running = False
         logging.basicConfig(level=logging.INFO)
@@ -58,6 +252,7 @@ class OrderMonitor:
     def stop(self):
         """Stop the monitoring threads."""
         self.running = False
+        self._stopped.set()
         self.price_update_thread.join()
         logging.info("OrderMonitor stopped.")
 
@@ -65,21 +260,43 @@ class OrderMonitor:
     def update_prices_continuously(self):
         """Continuously update prices for active orders."""
         while self.running:
-            self.update_all_active_orders()
-            time.sleep(self.price_update_interval)
+            idle = self.seconds_until_open()
+            if idle:
+                # No new bars while the market is closed: neither fetch nor evaluate
+                self.go_idle()
+                self._stopped.wait(min(idle, MAX_IDLE_SECONDS))
+                continue
+            try:
+                self.profiler.run(self.update_all_active_orders)
+            except Exception as e:
+                # Already counted in stage_errors_total by the 'tick' timer; the next tick tries again
+                logging.error(f"Monitor tick failed: {str(e)}")
+            self._stopped.wait(self.price_update_interval)
+
+    def seconds_until_open(self):
+        """0 when there is no calendar or the market is open."""
+        return self.calendar.seconds_until_open() if self.calendar is not None else 0
+
+    def go_idle(self):
+        """Nothing is signalled while the market is closed: empty latest() for /api/notifications."""
+        self.alerts.publish([])
 
     def update_all_active_orders(self):
-        """Update prices and profit for all active orders."""
-        orders = self.order_manager.list_orders(OrderStatus.HOLDING)
-        for order in orders:
-            self.update_order_price_and_profit(order['symbol'], order)
-            
-            # check exit conditions
-            self.evaluate_order(order['symbol'], order)
+        """Update prices and profit for all active orders and act on any exit signals."""
+        with METRICS.time('tick'):
+            orders = load_orders(self.order_manager.list_orders(OrderStatus.HOLDING))
+            self.indicators.prune((order.symbol for order in orders), owner=self)
+            return self.evaluate_orders(orders)
+
+    def prefetch_market_data(self, orders):
+        """Size the bar buffers for the longest period held and refresh all symbols in one batch."""
+        if orders:
+            self.market_data.require_period(max(order.period for order in orders))
+        self.market_data.prefetch(order.symbol for order in orders)
 
     def update_order_price_and_profit(self, symbol: str, order: dict):
         try:
-            ohlcv = get_curr_ohlcv(symbol)
+            ohlcv = self.market_data.get_ohlcv(symbol)
             current_price = get_curr_close(ohlcv)
             if current_price is None:
                 logging.error(f"CURRENT PRICE IS NONE! updating price for {symbol}")
@@ -91,7 +308,7 @@ class OrderMonitor:
             else:
                 order['profit'] = 0
 
-            current_ma = get_curr_ma(ohlcv, ma_type=order['maType'], period=order['period'])
+            current_ma = self.indicators.current_ma(symbol, order['maType'], order['period'], ohlcv)
             if 'highestMA' not in order or current_ma > order['highestMA']:
                 order['highestMA'] = current_ma
 
@@ -102,74 +319,153 @@ class OrderMonitor:
 
     def check_orders(self):
         """Check the status of all active orders and return exit alerts."""
-        exit_alerts = []
         orders = self.order_manager.list_orders(OrderStatus.HOLDING)
         #print(f"debugging check_orders 92: orders: {orders}")
+        return self.evaluate_orders(orders)
+
+    def evaluate_orders(self, orders):
+        """Batch version of evaluate_order(): the exit rules run once over columnar arrays."""
+        orders = self.track_held(load_orders(orders))
+        self.prefetch_market_data(orders)
+        priced, prices, mas = self.price_orders(self.select_updated(orders))
+        return self.apply_exit_rules(priced, prices, mas)
+
+    def track_held(self, orders):
+        """Forget the bookkeeping of symbols no longer held. Returns orders."""
+        held = {order.symbol for order in orders}
+        for state in (self._evaluated, self._signalling):
+            for symbol in [symbol for symbol in state if symbol not in held]:
+                del state[symbol]
+        return orders
+
+    def select_updated(self, orders):
+        """Orders whose symbol has a bar they were not evaluated on yet, or whose rules were edited.
+
+        They are marked as evaluated on that bar; orders without bars are always kept so their
+        errors keep being logged.
+        """
+        if not self.skip_unchanged:
+            return orders
+        selected = []
         for order in orders:
-            exit_alert = self.evaluate_order(order['symbol'], order)
-            if exit_alert:
-                exit_alerts.append(exit_alert)
+            bar = self.market_data.last_bar(order.symbol)
+            key = (bar, tuple(getattr(order, field) for field in EVALUATION_FIELDS))
+            if bar is None or self._evaluated.get(order.symbol) != key:
+                self._evaluated[order.symbol] = key
+                selected.append(order)
+        return selected
+
+    def price_orders(self, orders):
+        """Current close and MA for each Order from cached bars. Orders that fail are logged and left out."""
+        priced, prices, mas = [], [], []
+        for order in orders:
+            symbol = order.symbol
+            try:
+                ohlcv = self.market_data.get_ohlcv(symbol)
+                current_price = get_curr_close(ohlcv)
+                with METRICS.time('compute_ma'):
+                    current_ma = self.indicators.current_ma(symbol, order.maType, order.period, ohlcv)
+            except Exception as e:
+                logging.error(f"Error evaluating order for {symbol}: {str(e)}")
+                continue
+            priced.append(order)
+            prices.append(current_price)
+            mas.append(current_ma)
+        return priced, prices, mas
+
+    def apply_exit_rules(self, priced, prices, mas):
+        """Run the vectorised exit rules, commit the results in one write and publish the alerts."""
+        if not priced:
+            return self.commit_exit_results([], [], [], [], [])
+
+        highest_ma, profit, exit_codes = evaluate_batch(OrderBatch.from_records(priced, prices, mas))
+        return self.commit_exit_results(priced, prices, highest_ma, profit, exit_codes)
+
+    def commit_exit_results(self, priced, prices, highest_ma, profit, exit_codes):
+        """Apply evaluated exit rules to the orders, write them in one batch and publish the alerts.
+
+        Returns every alert still signalled, including those of held orders skipped this tick.
+        """
+        updates, exit_alerts, new_alerts = {}, [], []
+        for i, order in enumerate(priced):
+            symbol = order.symbol
+            changes = {
+                'currentPrice': prices[i],
+                'profit': float(profit[i]),
+                'highestMA': float(highest_ma[i]),
+            }
+            exit_reason = EXIT_REASONS[int(exit_codes[i])]
+            # Without auto-remove an order keeps signalling every tick; only the first one is news.
+            # The stored exitReason is never cleared, so it cannot tell a signal that stopped and came back
+            is_new = bool(exit_reason) and symbol not in self._signalling
+            if exit_reason:
+                changes['exitReason'] = exit_reason
+                if self.auto_remove_on_exit:
+                    changes['status'] = OrderStatus.EXITED.value
+                    changes['exitDatetime'] = datetime.now().isoformat()
+            order.update(changes)
+            updates[symbol] = changes
+            if exit_reason:
+                exit_alerts.append(self.build_exit_alert(symbol, order, exit_reason))
+                if is_new:
+                    new_alerts.append(exit_alerts[-1])
+                if not self.auto_remove_on_exit:
+                    self._signalling[symbol] = exit_alerts[-1]
+            else:
+                self._signalling.pop(symbol, None)
+        exit_alerts += [alert for symbol, alert in self._signalling.items() if symbol not in updates]
+
+        # Every price, profit, highestMA and exit change of the tick goes out in one write.
+        # Only the fields computed here are sent, so edits made meanwhile are not overwritten,
+        # and orders deleted meanwhile are not brought back.
+        if updates:
+            self.order_manager.update_orders(updates, upsert=False)
+        new_alerts = self.alerts.publish(new_alerts, current=exit_alerts)
+        self.publish_events(updates, new_alerts)
         return exit_alerts
 
+    def publish_events(self, updates, new_alerts):
+        deltas = self.order_deltas.diff(updates)
+        if deltas:
+            self.events.publish('orders', deltas)
+        for alert in new_alerts:
+            self.events.publish('alert', alert)
+
     def evaluate_order(self, symbol: str, order: dict):
+        """Per-order reference path, kept alongside evaluate_orders()."""
         try:
-            ohlcv = get_curr_ohlcv(symbol)
+            ohlcv = self.market_data.get_ohlcv(symbol)
             current_price = get_curr_close(ohlcv)
             if current_price is None:
                 logging.error(f"CURRENT PRICE IS NONE! evaluating order for {symbol}")
                 return None
 
-            current_ma = get_curr_ma(ohlcv, ma_type=order['maType'], period=order['period'])
+            current_ma = self.indicators.current_ma(symbol, order['maType'], order['period'], ohlcv)
             if current_ma is None:
                 logging.error(f"CURRENT MA IS NONE! evaluating order for {symbol}")
                 return None
 
-            order['currentPrice'] = current_price
-            if order['entryPrice'] != 0:
-                order['profit'] = ((current_price - order['entryPrice']) / order['entryPrice']) * 100
-            else:
-                order['profit'] = 0
-
-            if 'highestMA' not in order or not order['highestMA'] or current_ma > order['highestMA']:
-                order['highestMA'] = current_ma
-
-            takeProfitReached = False
-            take_profit_price = order['entryPrice'] * (1 + order['takeProfitPct'] / 100)
-            if order['highestMA'] >= take_profit_price:
-                takeProfitReached = True
-
-            exit_reason = None
-            if takeProfitReached:
-                if order['secondarySLPct'] <= 0:
-                    exit_reason = "Auto-Sell (Take Profit) hit"
-                secondary_sl_value = order['highestMA'] * (1 - order['secondarySLPct'] / 100)
-                if current_ma <= secondary_sl_value:
-                    exit_reason = "Secondary Stop Loss hit"
-            else:
-                if order['initialSL'] == "trailing":
-                    initial_sl_value = order['highestMA'] * (1 - order['initialSLPct'] / 100)
-                    if current_ma <= initial_sl_value:
-                        exit_reason = "Initial Trailing Stop Loss hit"
-                else:
-                    initial_sl_value = order['entryPrice'] * (1 - order['initialSLPct'] / 100)
-                    if current_ma <= initial_sl_value:
-                        exit_reason = "Initial Static Stop Loss hit"
-
+            exit_reason = evaluate_exit(order, current_price, current_ma)
             if exit_reason:
-                order['exitReason'] = exit_reason
-                self.order_manager.update_order(symbol, order)
-
-                if self.auto_remove_on_exit:
-                    self.order_manager.exit_order(symbol)
-
-                exit_alert = {
-                    'symbol': symbol,
-                    'message': f"{exit_reason} for {symbol}. Current price: {order['currentPrice']:.2f}, Profit: {order['profit']:.2f}%, Highest MA: {order['highestMA']:.2f}",
-                    'timestamp': datetime.now().isoformat()
-                }
-
-                return exit_alert
+                return self.handle_exit(symbol, order, exit_reason)
 
         except Exception as e:
             logging.error(f"Error evaluating order for {symbol}: {str(e)}")
             return None
+
+    def handle_exit(self, symbol: str, order: dict, exit_reason: str):
+        """Record the exit reason, exit the order if configured to, and build the alert."""
+        order['exitReason'] = exit_reason
+        self.order_manager.update_order(symbol, order)
+
+        if self.auto_remove_on_exit:
+            self.order_manager.exit_order(symbol)
+
+        return self.build_exit_alert(symbol, order, exit_reason)
+
+    def build_exit_alert(self, symbol: str, order: dict, exit_reason: str):
+        return {
+            'symbol': symbol,
+            'message': f"{exit_reason} for {symbol}. Current price: {order['currentPrice']:.2f}, Profit: {order['profit']:.2f}%, Highest MA: {order['highestMA']:.2f}",
+            'timestamp': datetime.now().isoformat()
+        }
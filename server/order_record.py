@@ -0,0 +1,165 @@
+import logging
+from typing import Any, Dict, Iterable, List
+
+import numpy as np
+
+from indicators import MOVING_AVERAGES
+
+ORDER_FIELDS = (
+    'symbol', 'status', 'orderType', 'entryPrice', 'currentPrice', 'maType', 'period', 'initialSL',
+    'initialSLPct', 'takeProfitPct', 'secondarySLPct', 'highestMA', 'profit', 'exitReason',
+    'entryDatetime', 'exitDatetime',
+)
+REQUIRED_FIELDS = ('symbol', 'orderType', 'maType', 'period', 'initialSL', 'initialSLPct', 'takeProfitPct', 'secondarySLPct')
+PCT_FIELDS = ('initialSLPct', 'takeProfitPct', 'secondarySLPct')
+# Filled in by the monitor; missing or null in older trade logs means "not computed yet"
+COMPUTED_FIELDS = ('currentPrice', 'highestMA', 'profit')
+INITIAL_SL_MODES = ('trailing', 'static')
+_FIELD_SET = frozenset(ORDER_FIELDS)
+
+# Fixed-width layout of the fields the monitor works on, for shipping many orders at once
+ORDER_DTYPE = np.dtype([
+    ('symbol', 'U32'), ('maType', 'U8'), ('period', 'i4'), ('trailing', '?'), ('entryPrice', 'f8'),
+    ('takeProfitPct', 'f8'), ('secondarySLPct', 'f8'), ('initialSLPct', 'f8'), ('highestMA', 'f8'),
+])
+
+
+class OrderValidationError(ValueError):
+    pass
+
+
+def validate_order(data: Dict[str, Any], partial=False) -> Dict[str, Any]:
+    """Check and coerce order fields coming from the API. Returns a new dict.
+
+    With partial=True (updates), only the fields present are checked.
+    """
+    if not partial:
+        for field in REQUIRED_FIELDS:
+            if field not in data:
+                raise OrderValidationError(f"'{field}' is required")
+    order = dict(data)
+    if 'symbol' in order and (not isinstance(order['symbol'], str) or not order['symbol'].strip()):
+        raise OrderValidationError("'symbol' must be a non-empty string")
+    if 'maType' in order and order['maType'] not in MOVING_AVERAGES:
+        raise OrderValidationError(f"'maType' must be one of {tuple(MOVING_AVERAGES)}")
+    if 'initialSL' in order and order['initialSL'] not in INITIAL_SL_MODES:
+        raise OrderValidationError(f"'initialSL' must be one of {INITIAL_SL_MODES}")
+    if 'period' in order:
+        try:
+            order['period'] = int(order['period'])
+        except (TypeError, ValueError):
+            raise OrderValidationError("'period' must be an integer") from None
+        if order['period'] < 1:
+            raise OrderValidationError("'period' must be at least 1")
+    for field in PCT_FIELDS + ('entryPrice',):
+        if order.get(field) is None:
+            if field in PCT_FIELDS and field in order:
+                raise OrderValidationError(f"'{field}' must be a number")
+            continue
+        try:
+            order[field] = float(order[field])
+        except (TypeError, ValueError):
+            raise OrderValidationError(f"'{field}' must be a number") from None
+    return order
+
+
+class Order:
+    """One order as the monitor sees it: attribute access instead of string-key lookups.
+
+    Fields outside ORDER_FIELDS are kept in `extra` so to_dict() round-trips. Item access
+    (order['profit'], order.get(...)) is supported for code written against plain dicts.
+    """
+
+    __slots__ = ORDER_FIELDS + ('extra',)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'Order':
+        """Build from a stored order. Raises OrderValidationError if the exit rules cannot run on it."""
+        order = cls.__new__(cls)
+        for field in ORDER_FIELDS:
+            setattr(order, field, data.get(field))
+        try:
+            order.period = int(order.period)
+            order.entryPrice = float(order.entryPrice)
+            for field in PCT_FIELDS:
+                setattr(order, field, float(getattr(order, field)))
+        except (TypeError, ValueError):
+            raise OrderValidationError(f"Order {order.symbol} is missing or has invalid rule fields") from None
+        # So the hot loop never has to ask whether highestMA is there
+        for field in COMPUTED_FIELDS:
+            setattr(order, field, float(getattr(order, field) or 0.0))
+        order.extra = {key: value for key, value in data.items() if key not in _FIELD_SET}
+        return order
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {field: getattr(self, field) for field in ORDER_FIELDS}
+        data.update(self.extra)
+        return data
+
+    def update(self, changes: Dict[str, Any]):
+        for key, value in changes.items():
+            self[key] = value
+
+    def __getitem__(self, key):
+        if key in _FIELD_SET:
+            return getattr(self, key)
+        return self.extra[key]
+
+    def __setitem__(self, key, value):
+        if key in _FIELD_SET:
+            setattr(self, key, value)
+        else:
+            self.extra[key] = value
+
+    def __contains__(self, key):
+        return key in _FIELD_SET or key in self.extra
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __repr__(self):
+        return f"Order({self.to_dict()!r})"
+
+
+def load_orders(orders: Iterable[Any]) -> List[Order]:
+    """Orders from storage as Order records; ones the rules cannot run on are logged and left out."""
+    records = []
+    for order in orders:
+        if isinstance(order, Order):
+            records.append(order)
+            continue
+        try:
+            records.append(Order.from_dict(order))
+        except OrderValidationError as e:
+            logging.error(str(e))
+    return records
+
+
+def to_array(orders: List[Order]) -> np.ndarray:
+    """Pack the monitor's fields of many orders into one ORDER_DTYPE array."""
+    array = np.empty(len(orders), dtype=ORDER_DTYPE)
+    for name in ORDER_DTYPE.names:
+        if name == 'trailing':
+            array[name] = [order.initialSL == 'trailing' for order in orders]
+        else:
+            array[name] = [getattr(order, name) for order in orders]
+    return array
+
+
+def from_array(array: np.ndarray) -> List[Order]:
+    """Order records back from an ORDER_DTYPE array (fields it does not carry are None)."""
+    orders = []
+    for row in array.tolist():
+        order = Order.__new__(Order)
+        for field in ORDER_FIELDS:
+            setattr(order, field, None)
+        order.symbol, order.maType, order.period, trailing, order.entryPrice, order.takeProfitPct, \
+            order.secondarySLPct, order.initialSLPct, order.highestMA = row
+        order.initialSL = 'trailing' if trailing else 'static'
+        order.currentPrice = order.profit = 0.0
+        order.extra = {}
+        orders.append(order)
+    return orders
@@ -0,0 +1,751 @@
+import os
+import json
+import sqlite3
+import threading
+import portalocker
+import logging
+import time
+from contextlib import contextmanager
+from typing import Dict, Any, Iterable, List, Optional
+
+from metrics import METRICS
+
+
+class OrderStorage:
+    """Where OrderManager keeps its orders. Orders are plain dicts keyed by 'symbol'."""
+
+    def load_all(self) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def replace_all(self, trades: List[Dict[str, Any]]) -> None:
+        raise NotImplementedError
+
+    def get(self, symbol: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def list(self, status: Optional[str] = None) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def upsert(self, symbol: str, data: Dict[str, Any]) -> None:
+        """Merge data into the order for symbol, or append it as a new order."""
+        raise NotImplementedError
+
+    def patch(self, symbol: str, fields: Dict[str, Any]) -> None:
+        """Merge fields into an existing order; unknown symbols are ignored."""
+        raise NotImplementedError
+
+    def delete(self, symbol: str) -> None:
+        raise NotImplementedError
+
+    def delete_by_status(self, status: str) -> None:
+        raise NotImplementedError
+
+    def update_many(self, updates: Dict[str, Dict[str, Any]], upsert: bool = True) -> None:
+        """upsert() (or patch() with upsert=False) for many symbols in one write."""
+        trades = self.load_all()
+        self.replace_all(_merge_updates(trades, updates, upsert))
+
+    def apply(self, puts: Dict[str, Dict[str, Any]], deletes: Iterable[str] = ()) -> None:
+        """Write many changes at once: puts replace whole orders (or add them), deletes remove them."""
+        deletes = set(deletes)
+        trades = [trade for trade in self.load_all() if trade['symbol'] not in deletes]
+        seen = set()
+        for i, trade in enumerate(trades):
+            if trade['symbol'] in puts:
+                trades[i] = puts[trade['symbol']]
+                seen.add(trade['symbol'])
+        trades.extend(order for symbol, order in puts.items() if symbol not in seen and symbol not in deletes)
+        self.replace_all(trades)
+
+    def stamp(self):
+        """Something that changes whenever the stored data changes on disk, or None if unknown."""
+        return None
+
+    def close(self) -> None:
+        """Flush anything pending and release background resources."""
+
+
+@contextmanager
+def _timed_lock(lock: portalocker.Lock):
+    """Hold a portalocker lock, recording how long acquiring it took and whether it timed out."""
+    started = time.perf_counter()
+    try:
+        file = lock.acquire()
+    except portalocker.exceptions.LockException:
+        METRICS.counter('lock_timeouts_total').inc()
+        raise
+    finally:
+        METRICS.histogram('lock_wait_seconds').observe(time.perf_counter() - started)
+    try:
+        yield file
+    finally:
+        lock.release()
+
+
+class JsonFileStorage(OrderStorage):
+    """The original format: one pretty-printed JSON list, rewritten on every change."""
+
+    def __init__(self, file_path: str, logging=False):
+        self.file_path = file_path
+        self.logging = logging
+        if not os.path.exists(file_path):
+            with open(file_path, 'w') as f:
+                json.dump([], f)
+            if self.logging:
+                print(f"Created new trades file: {file_path}")
+
+    @METRICS.timed('read_orders')
+    def read_file_with_lock(self) -> List[Dict[str, Any]]:
+        if self.logging:
+            print(f"Reading trades from file: {self.file_path}")
+        with _timed_lock(portalocker.Lock(self.file_path, 'r', timeout=10)) as file:
+            try:
+                return json.load(file)
+            except json.JSONDecodeError:
+                if self.logging:
+                    print("Failed to decode JSON, returning empty list.")
+                return []
+
+    @METRICS.timed('write_orders')
+    def write_file_with_lock(self, data: List[Dict[str, Any]]):
+        if self.logging:
+            print(f"Writing {len(data)} trades to file: {self.file_path}")
+        with _timed_lock(portalocker.Lock(self.file_path, 'w', timeout=10)) as file:
+            json.dump(data, file, indent=4)
+
+    def load_all(self):
+        return self.read_file_with_lock()
+
+    def replace_all(self, trades):
+        self.write_file_with_lock(trades)
+
+    def get(self, symbol):
+        trades = self.read_file_with_lock()
+        return next((trade for trade in trades if trade['symbol'] == symbol), None)
+
+    def list(self, status=None):
+        trades = self.read_file_with_lock()
+        if status:
+            return [trade for trade in trades if trade['status'] == status]
+        return trades
+
+    def upsert(self, symbol, data):
+        trades = self.read_file_with_lock()
+        order_index = next((index for (index, d) in enumerate(trades) if d["symbol"] == symbol), None)
+        if order_index is not None:
+            trades[order_index].update(data)
+        else:
+            trades.append(data)
+        self.write_file_with_lock(trades)
+
+    def patch(self, symbol, fields):
+        trades = self.read_file_with_lock()
+        for trade in trades:
+            if trade['symbol'] == symbol:
+                trade.update(fields)
+                break
+        self.write_file_with_lock(trades)
+
+    def delete(self, symbol):
+        trades = self.read_file_with_lock()
+        self.write_file_with_lock([trade for trade in trades if trade['symbol'] != symbol])
+
+    def delete_by_status(self, status):
+        trades = self.read_file_with_lock()
+        self.write_file_with_lock([trade for trade in trades if trade['status'] != status])
+
+    @METRICS.timed('update_orders')
+    def update_many(self, updates, upsert=True):
+        if self.logging:
+            print(f"Updating {len(updates)} trades in file: {self.file_path}")
+        # Read and rewrite under one lock instead of one lock per order
+        with _timed_lock(portalocker.Lock(self.file_path, 'r+', timeout=10)) as file:
+            try:
+                trades = json.load(file)
+            except json.JSONDecodeError:
+                trades = []
+            trades = _merge_updates(trades, updates, upsert)
+            file.seek(0)
+            file.truncate()
+            json.dump(trades, file, indent=4)
+
+    def stamp(self):
+        return _file_stamp(self.file_path)
+
+
+class JournalStorage(OrderStorage):
+    """Snapshot file plus an append-only journal of changes.
+
+    Every write appends one JSON line describing the change instead of rewriting all trades.
+    A background compactor periodically folds the journal into the snapshot (written to a
+    temp file and swapped in with os.replace, so a crash never leaves it half written).
+    Readers keep the folded state in memory and only replay journal lines they have not
+    seen yet. A torn last line from a crashed writer is ignored.
+
+    The snapshot is a plain JSON list, the same format as JsonFileStorage.
+    """
+
+    def __init__(self, snapshot_path: str, journal_path: Optional[str] = None, logging=False,
+                 compact_interval: Optional[float] = 60, fsync=False):
+        self.snapshot_path = snapshot_path
+        self.journal_path = journal_path or os.path.splitext(snapshot_path)[0] + '.journal.jsonl'
+        self.lock_path = self.journal_path + '.lock'
+        self.logging = logging
+        self.fsync = fsync
+        self._trades: Dict[str, Dict[str, Any]] = {}
+        self._snapshot_stamp = None
+        self._journal_offset = 0
+        self._journal_entries = 0
+        self._mutex = threading.RLock()
+        if not os.path.exists(snapshot_path):
+            self._write_snapshot([])
+        open(self.journal_path, 'a').close()
+
+        self._stop = threading.Event()
+        self._compactor = None
+        if compact_interval:
+            self._compactor = threading.Thread(target=self._compact_periodically, args=(compact_interval,), daemon=True)
+            self._compactor.start()
+
+    def _file_lock(self, shared=False):
+        flags = portalocker.LockFlags.SHARED if shared else portalocker.LockFlags.EXCLUSIVE
+        return _timed_lock(portalocker.Lock(self.lock_path, 'a', timeout=10, flags=flags | portalocker.LockFlags.NON_BLOCKING))
+
+    def _write_snapshot(self, trades):
+        tmp_path = self.snapshot_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(trades, f, indent=4)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+
+    def _load_snapshot(self):
+        with open(self.snapshot_path) as f:
+            try:
+                trades = json.load(f)
+            except json.JSONDecodeError as e:
+                # Snapshots are swapped in atomically, so this is real corruption: do not hide it
+                raise ValueError(f"Corrupt trades snapshot {self.snapshot_path}: {e}")
+        self._trades = {trade['symbol']: trade for trade in trades}
+        self._snapshot_stamp = _file_stamp(self.snapshot_path)
+        self._journal_offset = 0
+        self._journal_entries = 0
+
+    def _refresh(self):
+        """Catch up with changes made by other processes. Caller holds the file lock."""
+        if self._snapshot_stamp != _file_stamp(self.snapshot_path):
+            self._load_snapshot()
+        if os.path.getsize(self.journal_path) < self._journal_offset:
+            self._load_snapshot()
+
+        with open(self.journal_path, 'rb') as f:
+            f.seek(self._journal_offset)
+            tail = f.read()
+        complete = tail.rfind(b'\n') + 1
+        for line in tail[:complete].splitlines():
+            if not line.strip():
+                continue
+            try:
+                self._apply(json.loads(line))
+            except (json.JSONDecodeError, KeyError) as e:
+                logging.error(f"Skipping unreadable journal entry in {self.journal_path}: {e}")
+            self._journal_entries += 1
+        self._journal_offset += complete
+
+    def _apply(self, entry):
+        op = entry['op']
+        if op == 'upsert':
+            order = self._trades.get(entry['symbol'])
+            if order is not None:
+                order.update(entry['data'])
+            else:
+                self._trades[entry['symbol']] = dict(entry['data'])
+        elif op == 'patch':
+            order = self._trades.get(entry['symbol'])
+            if order is not None:
+                order.update(entry['data'])
+        elif op == 'put':
+            self._trades[entry['symbol']] = dict(entry['data'])
+        elif op == 'delete':
+            self._trades.pop(entry['symbol'], None)
+        elif op == 'delete_status':
+            self._trades = {symbol: trade for symbol, trade in self._trades.items() if trade['status'] != entry['status']}
+        else:
+            raise KeyError(op)
+
+    def _append(self, *entries):
+        lines = b''.join(json.dumps(entry).encode() + b'\n' for entry in entries)
+        with self._mutex, self._file_lock():
+            self._refresh()
+            with open(self.journal_path, 'ab') as f:
+                if f.tell() > self._journal_offset:
+                    # Torn line left by a crashed writer: terminate it so it is skipped as garbage
+                    f.write(b'\n')
+                f.write(lines)
+                f.flush()
+                if self.fsync:
+                    os.fsync(f.fileno())
+                end = f.tell()
+            for entry in entries:
+                self._apply(entry)
+            self._journal_offset = end
+            self._journal_entries += len(entries)
+
+    def _read(self):
+        with self._mutex, self._file_lock(shared=True):
+            self._refresh()
+            return [dict(trade) for trade in self._trades.values()]
+
+    def compact(self):
+        """Fold the journal into a fresh snapshot and truncate the journal."""
+        with self._mutex, self._file_lock():
+            self._refresh()
+            if self._journal_entries == 0:
+                return
+            self._write_snapshot(list(self._trades.values()))
+            open(self.journal_path, 'w').close()
+            self._snapshot_stamp = _file_stamp(self.snapshot_path)
+            self._journal_offset = 0
+            if self.logging:
+                print(f"Compacted {self._journal_entries} journal entries into {self.snapshot_path}")
+            self._journal_entries = 0
+
+    def _compact_periodically(self, interval):
+        while not self._stop.wait(interval):
+            try:
+                self.compact()
+            except Exception as e:
+                logging.error(f"Journal compaction failed: {str(e)}")
+
+    def close(self):
+        self._stop.set()
+        if self._compactor is not None:
+            self._compactor.join()
+        self.compact()
+
+    def load_all(self):
+        return self._read()
+
+    def replace_all(self, trades):
+        with self._mutex, self._file_lock():
+            self._write_snapshot(trades)
+            open(self.journal_path, 'w').close()
+            self._load_snapshot()
+
+    def get(self, symbol):
+        with self._mutex, self._file_lock(shared=True):
+            self._refresh()
+            trade = self._trades.get(symbol)
+            return dict(trade) if trade is not None else None
+
+    def list(self, status=None):
+        trades = self._read()
+        if status:
+            return [trade for trade in trades if trade['status'] == status]
+        return trades
+
+    def upsert(self, symbol, data):
+        self._append({'op': 'upsert', 'symbol': symbol, 'data': data})
+
+    def patch(self, symbol, fields):
+        self._append({'op': 'patch', 'symbol': symbol, 'data': fields})
+
+    def delete(self, symbol):
+        self._append({'op': 'delete', 'symbol': symbol})
+
+    def delete_by_status(self, status):
+        self._append({'op': 'delete_status', 'status': status})
+
+    def update_many(self, updates, upsert=True):
+        op = 'upsert' if upsert else 'patch'
+        if updates:
+            self._append(*({'op': op, 'symbol': symbol, 'data': data} for symbol, data in updates.items()))
+
+    def apply(self, puts, deletes=()):
+        entries = [{'op': 'delete', 'symbol': symbol} for symbol in deletes]
+        entries += [{'op': 'put', 'symbol': symbol, 'data': order} for symbol, order in puts.items()]
+        if entries:
+            self._append(*entries)
+
+    def stamp(self):
+        return (_file_stamp(self.snapshot_path), _file_stamp(self.journal_path))
+
+
+class SQLiteStorage(OrderStorage):
+    """One row per order in SQLite (WAL mode), indexed on symbol and status.
+
+    The order dict is stored as JSON in `data`; `status` is duplicated into its own
+    column so list(status) is an index lookup. `seq` keeps the original insertion order.
+    """
+
+    SCHEMA_VERSION = 1
+
+    def __init__(self, db_path: str, logging=False, migrate_from: Optional[str] = None):
+        self.db_path = db_path
+        self.logging = logging
+        self._local = threading.local()
+        with self._transaction() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS orders ("
+                "seq INTEGER PRIMARY KEY AUTOINCREMENT, "
+                "symbol TEXT NOT NULL UNIQUE, "
+                "status TEXT, "
+                "data TEXT NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_orders_status ON orders(status)")
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            if version < self.SCHEMA_VERSION:
+                if migrate_from and os.path.exists(migrate_from):
+                    self._migrate_from_json(conn, migrate_from)
+                conn.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 connections must stay on the thread that opened them
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _transaction(self):
+        return _Transaction(self._connection())
+
+    def _migrate_from_json(self, conn, json_path):
+        """One-shot import of an existing TRADES_LOG_<strategy>.json. The JSON file is left in place."""
+        with portalocker.Lock(json_path, 'r', timeout=10) as file:
+            try:
+                trades = json.load(file)
+            except json.JSONDecodeError:
+                trades = []
+        conn.executemany(
+            "INSERT OR REPLACE INTO orders (symbol, status, data) VALUES (?, ?, ?)",
+            [(trade['symbol'], trade.get('status'), json.dumps(trade)) for trade in trades],
+        )
+        if self.logging:
+            print(f"Migrated {len(trades)} trades from {json_path} to {self.db_path}")
+
+    def _write(self, conn, symbol, order):
+        conn.execute(
+            "INSERT INTO orders (symbol, status, data) VALUES (?, ?, ?) "
+            "ON CONFLICT(symbol) DO UPDATE SET status = excluded.status, data = excluded.data",
+            (symbol, order.get('status'), json.dumps(order)),
+        )
+
+    def _read(self, conn, symbol):
+        row = conn.execute("SELECT data FROM orders WHERE symbol = ?", (symbol,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def load_all(self):
+        return self.list()
+
+    def replace_all(self, trades):
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM orders")
+            for trade in trades:
+                self._write(conn, trade['symbol'], trade)
+
+    def get(self, symbol):
+        return self._read(self._connection(), symbol)
+
+    def list(self, status=None):
+        conn = self._connection()
+        if status:
+            rows = conn.execute("SELECT data FROM orders WHERE status = ? ORDER BY seq", (status,))
+        else:
+            rows = conn.execute("SELECT data FROM orders ORDER BY seq")
+        return [json.loads(row[0]) for row in rows]
+
+    def upsert(self, symbol, data):
+        with self._transaction() as conn:
+            order = self._read(conn, symbol)
+            if order is not None:
+                order.update(data)
+            else:
+                order = data
+            self._write(conn, symbol, order)
+
+    def patch(self, symbol, fields):
+        with self._transaction() as conn:
+            order = self._read(conn, symbol)
+            if order is not None:
+                order.update(fields)
+                self._write(conn, symbol, order)
+
+    def delete(self, symbol):
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM orders WHERE symbol = ?", (symbol,))
+
+    def delete_by_status(self, status):
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM orders WHERE status = ?", (status,))
+
+    def update_many(self, updates, upsert=True):
+        with self._transaction() as conn:
+            for symbol, data in updates.items():
+                order = self._read(conn, symbol)
+                if order is not None:
+                    order.update(data)
+                elif upsert:
+                    order = data
+                else:
+                    continue
+                self._write(conn, symbol, order)
+
+    def apply(self, puts, deletes=()):
+        with self._transaction() as conn:
+            conn.executemany("DELETE FROM orders WHERE symbol = ?", [(symbol,) for symbol in deletes])
+            for symbol, order in puts.items():
+                self._write(conn, symbol, order)
+
+    def stamp(self):
+        # Committed WAL transactions only touch the -wal file until a checkpoint
+        return tuple(_file_stamp(path) for path in (self.db_path, self.db_path + '-wal'))
+
+
+class CachedStorage(OrderStorage):
+    """Authoritative in-memory copy of another backend, written back in batches.
+
+    Orders live in a dict keyed by symbol with a secondary index by status, so reads are
+    dict lookups. Writes only touch memory and record what changed: the fields patched into
+    an existing order, or the whole order when it is new or replaced. Changes are flushed to
+    the backend once flush_threshold of them pile up or every flush_interval seconds, patches
+    as patches, so fields another process edited meanwhile are not written back over.
+    Every watch_interval seconds, and before every flush, the backend stamp (file mtimes) is
+    checked, and edits made by other processes are reloaded with our pending changes on top.
+    """
+
+    def __init__(self, backend: OrderStorage, flush_interval: Optional[float] = 1.0,
+                 flush_threshold: int = 100, watch_interval: float = 1.0):
+        self.backend = backend
+        self.flush_threshold = flush_threshold
+        self.watch_interval = watch_interval
+        self.flushes = 0
+        self._lock = threading.RLock()
+        self._flush_lock = threading.Lock()
+        self._dirty = {}  # symbol -> fields patched since the last flush, None to write the whole order
+        self._deleted = set()
+        self._load()
+
+        self._stop = threading.Event()
+        self._flusher = None
+        if flush_interval:
+            self._flusher = threading.Thread(target=self._flush_periodically, args=(flush_interval,), daemon=True)
+            self._flusher.start()
+
+    def _load(self):
+        """(Re)load from the backend, keeping changes that are not flushed yet."""
+        stamp = self.backend.stamp()
+        orders = {trade['symbol']: trade for trade in self.backend.load_all()}
+        with self._lock:
+            for symbol in self._deleted:
+                orders.pop(symbol, None)
+            for symbol, fields in list(self._dirty.items()):
+                if fields is None:
+                    orders[symbol] = self._orders[symbol]
+                elif symbol in orders:
+                    orders[symbol] = {**orders[symbol], **fields}
+                else:
+                    # Deleted by another process: patches do not bring it back
+                    del self._dirty[symbol]
+            self._orders = orders
+            self._by_status = {}
+            for symbol, order in orders.items():
+                self._by_status.setdefault(order.get('status'), {})[symbol] = None
+            self._stamp = stamp
+            self._checked_at = time.monotonic()
+
+    def _watch(self):
+        if self._stamp is None or time.monotonic() - self._checked_at < self.watch_interval:
+            return
+        self._checked_at = time.monotonic()
+        if self.backend.stamp() != self._stamp:
+            self._load()
+
+    def _put(self, symbol, order, fields=None):
+        """Store order for symbol; fields are what changed in an existing order, None for a whole new one."""
+        old = self._orders.get(symbol)
+        self._orders[symbol] = order
+        if old is None or old.get('status') != order.get('status'):
+            if old is not None:
+                self._by_status.get(old.get('status'), {}).pop(symbol, None)
+            self._by_status.setdefault(order.get('status'), {})[symbol] = None
+        if fields is None or old is None:
+            self._dirty[symbol] = None
+        elif symbol not in self._dirty:
+            self._dirty[symbol] = dict(fields)
+        elif self._dirty[symbol] is not None:
+            self._dirty[symbol].update(fields)
+        self._deleted.discard(symbol)
+
+    def _merge(self, symbol, fields):
+        order = self._orders.get(symbol)
+        self._put(symbol, {**order, **fields} if order is not None else dict(fields), fields)
+
+    def _remove(self, symbol):
+        order = self._orders.pop(symbol, None)
+        if order is not None:
+            self._by_status.get(order.get('status'), {}).pop(symbol, None)
+            self._dirty.pop(symbol, None)
+            self._deleted.add(symbol)
+
+    def _changed(self):
+        if len(self._dirty) + len(self._deleted) >= self.flush_threshold:
+            self.flush()
+
+    def flush(self):
+        """Write every pending change to the backend in one batch."""
+        with self._flush_lock:
+            with self._lock:
+                # Reload edits from other processes first: the stamp taken after our write would
+                # otherwise hide them from _watch() for good
+                if self.backend.stamp() != self._stamp:
+                    self._load()
+                # In store order, so backends append new orders in the order they were added
+                puts = {symbol: dict(order) for symbol, order in self._orders.items()
+                        if symbol in self._dirty and self._dirty[symbol] is None}
+                patches = {symbol: dict(fields) for symbol, fields in self._dirty.items() if fields is not None}
+                deletes = set(self._deleted)
+                self._dirty.clear()
+                self._deleted.clear()
+            if not puts and not patches and not deletes:
+                return
+            try:
+                if puts or deletes:
+                    self.backend.apply(puts, deletes)
+                if patches:
+                    self.backend.update_many(patches, upsert=False)
+            except Exception:
+                with self._lock:
+                    # Put them back unless they were changed again meanwhile
+                    for symbol in puts:
+                        if symbol not in self._deleted and symbol in self._orders:
+                            self._dirty[symbol] = None
+                    for symbol, fields in patches.items():
+                        if symbol not in self._deleted and symbol in self._orders and self._dirty.get(symbol, {}) is not None:
+                            self._dirty[symbol] = {**fields, **self._dirty.get(symbol, {})}
+                    self._deleted |= {symbol for symbol in deletes if symbol not in self._orders}
+                raise
+            self.flushes += 1
+            with self._lock:
+                self._stamp = self.backend.stamp()
+
+    def _flush_periodically(self, interval):
+        while not self._stop.wait(interval):
+            try:
+                self.flush()
+            except Exception as e:
+                logging.error(f"Flushing cached orders failed: {str(e)}")
+
+    def close(self):
+        self._stop.set()
+        if self._flusher is not None:
+            self._flusher.join()
+        self.flush()
+        self.backend.close()
+
+    def load_all(self):
+        return self.list()
+
+    def replace_all(self, trades):
+        with self._lock:
+            for symbol in list(self._orders):
+                self._remove(symbol)
+            for trade in trades:
+                self._put(trade['symbol'], dict(trade))
+        self.flush()
+
+    def get(self, symbol):
+        with self._lock:
+            self._watch()
+            order = self._orders.get(symbol)
+            return dict(order) if order is not None else None
+
+    def list(self, status=None):
+        with self._lock:
+            self._watch()
+            if status:
+                return [dict(self._orders[symbol]) for symbol in self._by_status.get(status, ())]
+            return [dict(order) for order in self._orders.values()]
+
+    def upsert(self, symbol, data):
+        with self._lock:
+            self._watch()
+            self._merge(symbol, data)
+            self._changed()
+
+    def patch(self, symbol, fields):
+        with self._lock:
+            self._watch()
+            if symbol in self._orders:
+                self._merge(symbol, fields)
+                self._changed()
+
+    def delete(self, symbol):
+        with self._lock:
+            self._watch()
+            self._remove(symbol)
+            self._changed()
+
+    def delete_by_status(self, status):
+        with self._lock:
+            self._watch()
+            for symbol in list(self._by_status.get(status, ())):
+                self._remove(symbol)
+            self._changed()
+
+    def update_many(self, updates, upsert=True):
+        with self._lock:
+            self._watch()
+            for symbol, data in updates.items():
+                if upsert or symbol in self._orders:
+                    self._merge(symbol, data)
+            self._changed()
+
+    def apply(self, puts, deletes=()):
+        with self._lock:
+            self._watch()
+            for symbol in deletes:
+                self._remove(symbol)
+            for symbol, order in puts.items():
+                self._put(symbol, dict(order))
+            self._changed()
+
+    def stamp(self):
+        return self.backend.stamp()
+
+
+def _merge_updates(trades, updates, upsert):
+    """Merge {symbol: fields} into a trades list; new symbols are appended when upsert is set."""
+    index = {trade['symbol']: i for i, trade in enumerate(trades)}
+    for symbol, data in updates.items():
+        if symbol in index:
+            trades[index[symbol]].update(data)
+        elif upsert:
+            index[symbol] = len(trades)
+            trades.append(data)
+    return trades
+
+
+def _file_stamp(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+
+class _Transaction:
+    """BEGIN IMMEDIATE ... COMMIT, rolled back if the block raises."""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        return False
@@ -1,11 +1,22 @@
 
-from datetime import datetime, timedelta
-from flask import Flask, jsonify, request
+import atexit
+import functools
+import os
+from datetime import datetime
+from flask import Flask, Response, jsonify, request, stream_with_context
 from flask_cors import CORS
-import yfinance as yf
-from order_manager import OrderManager
 from order_status import OrderStatus
-from order_monitor import OrderMonitor
+from order_record import OrderValidationError, validate_order
+from order_monitor import MarketDataSnapshot, OrderMonitor
+from market_data import default_gateway
+from market_calendar import MarketCalendar
+from chart_data import ChartCache
+from async_monitor import AsyncOrderMonitor
+from sharded_monitor import ShardedOrderMonitor
+from event_stream import format_sse
+from metrics import METRICS
+from strategy_registry import StrategyRegistry
+from market_state import MarketStateStore
 
 app = Flask(__name__)
 
@@ -15,10 +26,58 @@ CORS(app, resources={r"/api/*": {"origins": "*"}})
 
 AUTO_REMOVE_ON_EXIT = True # TODO: fix glitch
 print("AUTO_REMOVE_ON_EXIT = ", AUTO_REMOVE_ON_EXIT)
-# Initialize OrderManager and OrderMonitor
-order_manager = OrderManager(strategy_name='MyStrategy')
-order_monitor = OrderMonitor(order_manager, price_update_interval=10, auto_remove_on_exit=AUTO_REMOVE_ON_EXIT) 
-order_monitor.start()
+ORDER_STORAGE = 'json' # or 'journal'; 'sqlite' migrates TRADES_LOG_<strategy>.json on first start
+ORDER_CACHE = False # keep orders in memory and flush changes to disk in the background
+# Every Yahoo request (monitor, charts, order prices) goes through one rate-limited, deduplicating gateway
+market_gateway = default_gateway()
+DEFAULT_STRATEGY = 'MyStrategy' # served by the unscoped /api/orders... routes
+PRICE_UPDATE_INTERVAL = 10
+MONITOR_ENGINE = 'thread' # 'asyncio' for concurrent fetches on a fixed-rate clock, 'sharded' for worker processes
+MONITOR_SHARDS = 4 # worker processes used by the 'sharded' engine
+MARKET_HOURS_ONLY = True # the monitor idles outside US equity trading hours (set False for 24h markets such as crypto)
+market_calendar = MarketCalendar() if MARKET_HOURS_ONLY else None
+# One bar cache for the monitors of every strategy, so a symbol held by several is fetched once
+monitor_market_data = MarketDataSnapshot(ttl=PRICE_UPDATE_INTERVAL, data_source=market_gateway)
+
+def create_monitor(order_manager, market_data, indicators):
+    if MONITOR_ENGINE == 'sharded':
+        # Bars and MAs live in the worker processes, one set per strategy
+        return ShardedOrderMonitor(order_manager, price_update_interval=PRICE_UPDATE_INTERVAL, auto_remove_on_exit=AUTO_REMOVE_ON_EXIT,
+                                   calendar=market_calendar, workers=MONITOR_SHARDS)
+    monitor_class = AsyncOrderMonitor if MONITOR_ENGINE == 'asyncio' else OrderMonitor
+    return monitor_class(order_manager, price_update_interval=PRICE_UPDATE_INTERVAL, auto_remove_on_exit=AUTO_REMOVE_ON_EXIT,
+                         calendar=market_calendar, market_data=market_data, indicators=indicators)
+
+# Every TRADES_LOG_<strategy>.json found next to this file is served, each with its own storage and monitor
+strategies = StrategyRegistry(storage=ORDER_STORAGE, cache=ORDER_CACHE, market_data=monitor_market_data, monitor_factory=create_monitor)
+CHART_CACHE_TTL = 30 # seconds a chart's bars are reused before fetching the new ones
+# Charts want a full day of bars, more than the monitor keeps, so they get their own LRU-bounded buffers
+chart_market_data = MarketDataSnapshot(ttl=CHART_CACHE_TTL, data_source=market_gateway, max_bars=24 * 60, max_symbols=200)
+chart_cache = ChartCache(chart_market_data, serializer=app.json.dumps)
+for cache_name, snapshot in (('monitor', monitor_market_data), ('chart', chart_market_data)):
+    for stat in ('hits', 'misses', 'evictions'):
+        METRICS.register_callback(f'market_data_cache_{stat}_total', 'counter', lambda snapshot=snapshot, stat=stat: snapshot.stats()[stat], cache=cache_name)
+# Bars and streaming MAs are saved every few minutes and on exit; a restart reloads them and only fetches the gap
+MARKET_STATE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'market_state.npz')
+market_state = MarketStateStore(MARKET_STATE_FILE, monitor_market_data, strategies.indicators, save_interval=300)
+
+def start():
+    """Load the strategies, restore the market state and start the monitors."""
+    global order_manager, order_monitor
+    strategies.load()
+    order_manager = strategies.add(DEFAULT_STRATEGY)
+    order_monitor = strategies.monitor(DEFAULT_STRATEGY)
+    market_state.start()
+    # atexit runs last-in first-out: the market state is saved before close() releases the strategies' indicators,
+    # then every monitor is stopped and cached order writes are flushed
+    atexit.register(strategies.close)
+    atexit.register(market_state.close)
+    strategies.start()
+
+# The 'sharded' engine's spawned workers import this module as __mp_main__: they must not load the
+# strategies or start monitors (and workers) of their own
+if __name__ != '__mp_main__':
+    start()
 
 
 @app.route('/api/config/auto-remove', methods=['POST'])
@@ -29,24 +88,62 @@ def set_auto_remove_on_exit():
         return jsonify({"error": "'autoRemoveOnExit' is required"}), 400
     
     AUTO_REMOVE_ON_EXIT = data['autoRemoveOnExit']
-    order_monitor.auto_remove_on_exit = AUTO_REMOVE_ON_EXIT
+    for monitor in strategies.monitors():
+        monitor.auto_remove_on_exit = AUTO_REMOVE_ON_EXIT
     
     return jsonify({"message": f"AUTO_REMOVE_ON_EXIT set to {AUTO_REMOVE_ON_EXIT}"}), 200
 
 
 
+def strategy_route(rule, **options):
+    """Serve a view at /api<rule> for the default strategy and at /api/strategies/<strategy><rule>
+    for any strategy. The view gets that strategy's order manager and monitor as its first arguments."""
+    def decorator(view):
+        @functools.wraps(view)
+        def scoped(strategy=DEFAULT_STRATEGY, **kwargs):
+            manager = strategies.get(strategy)
+            if manager is None:
+                return jsonify({"error": f"Strategy {strategy} not found"}), 404
+            return view(manager, strategies.monitor(strategy), **kwargs)
+        app.route(f'/api{rule}', **options)(scoped)
+        app.route(f'/api/strategies/<strategy>{rule}', **options)(scoped)
+        return scoped
+    return decorator
+
+@app.route('/api/strategies', methods=['GET', 'POST'])
+def handle_strategies():
+    if request.method == 'GET':
+        return jsonify(strategies.names())
+    name = (request.json or {}).get('name')
+    if not name:
+        return jsonify({"error": "'name' is required"}), 400
+    if name in strategies:
+        return jsonify({"error": f"Strategy {name} already exists"}), 409
+    try:
+        strategies.add(name)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"message": f"Strategy {name} created successfully"}), 201
+
+@app.route('/api/strategies/<strategy>', methods=['DELETE'])
+def remove_strategy(strategy):
+    """Stop serving a strategy; its trades log is kept on disk and loaded again on the next start."""
+    if strategy == DEFAULT_STRATEGY:
+        return jsonify({"error": "The default strategy cannot be removed"}), 400
+    if strategy not in strategies:
+        return jsonify({"error": f"Strategy {strategy} not found"}), 404
+    strategies.remove(strategy)
+    return jsonify({"message": f"Strategy {strategy} removed"}), 200
+
 def get_current_price(symbol):
-    """Helper function to fetch the most recent price from Yahoo Finance."""
-    stock = yf.Ticker(symbol)
-    end_time = datetime.now()
-    start_time = end_time - timedelta(days=1)  # Get data for the last 24 hours
-    hist = stock.history(start=start_time, end=end_time, interval="1m")
-    if not hist.empty:
+    """Helper function to fetch the most recent price from Yahoo Finance, through the shared gateway."""
+    hist = market_gateway.history(symbol, days=1, interval="1m")
+    if hist is not None and not hist.empty:
         return hist['Close'].iloc[-1]
     else:
         raise ValueError(f"Unable to fetch recent price data for {symbol}")
 
-def update_order_data(symbol, data, is_new_order=False):
+def update_order_data(order_manager, symbol, data, is_new_order=False):
     """
     Shared function to handle order updates for both new and existing orders.
     """
@@ -82,21 +179,22 @@ def update_order_data(symbol, data, is_new_order=False):
     # Update the order
     order_manager.update_order(symbol, data)
 
-@app.route('/api/orders', methods=['POST', 'GET', 'OPTIONS'])
-def handle_orders():
+@strategy_route('/orders', methods=['POST', 'GET', 'OPTIONS'])
+def handle_orders(order_manager, order_monitor):
     if request.method == 'OPTIONS':
         return '', 204
     
     elif request.method == 'POST':
-        data = request.json
-        required_fields = ['symbol', 'orderType', 'maType', 'period', 'initialSL', 'initialSLPct', 'takeProfitPct', 'secondarySLPct']
-        for field in required_fields:
-            if field not in data:
-                return jsonify({"error": f"'{field}' is required"}), 400
-        
+        # Checked and coerced once here, so the monitor can rely on typed, complete orders
+        try:
+            data = validate_order(request.json)
+        except OrderValidationError as e:
+            return jsonify({"error": str(e)}), 400
+
         symbol = data.get('symbol')
         try:
-            update_order_data(symbol, data, is_new_order=True)
+            update_order_data(order_manager, symbol, data, is_new_order=True)
+            publish_order_change(order_manager, order_monitor, symbol)
             return jsonify({"message": "Order created successfully"}), 201
         except ValueError as e:
             return jsonify({"error": str(e)}), 400
@@ -105,8 +203,8 @@ def handle_orders():
         all_orders = order_manager.list_orders()
         return jsonify(all_orders)
 
-@app.route('/api/orders/<symbol>', methods=['GET', 'PUT', 'DELETE'])
-def handle_order(symbol):
+@strategy_route('/orders/<symbol>', methods=['GET', 'PUT', 'DELETE'])
+def handle_order(order_manager, order_monitor, symbol):
     if request.method == 'OPTIONS':
         return '', 204
     elif request.method == 'GET':
@@ -116,54 +214,127 @@ def handle_order(symbol):
         else:
             return jsonify({"error": "Order not found"}), 404
     elif request.method == 'PUT':
-        data = request.json
         if not order_manager.get_order(symbol):
             return jsonify({"error": "Order not found"}), 404
         try:
-            update_order_data(symbol, data, is_new_order=False)
+            data = validate_order(request.json, partial=True)
+            update_order_data(order_manager, symbol, data, is_new_order=False)
+            publish_order_change(order_manager, order_monitor, symbol)
             return jsonify({"message": "Order updated successfully"}), 200
         except ValueError as e:
             return jsonify({"error": str(e)}), 400
     elif request.method == 'DELETE':
         order_manager.delete_order(symbol)
+        publish_order_change(order_manager, order_monitor, symbol)
         return jsonify({"message": "Order deleted successfully"}), 200
     
     else:
         return jsonify({"error": "Wrong method!"}), 500
 
 
-@app.route('/api/orders/completed', methods=['DELETE'])
-def delete_all_completed_orders():
+@strategy_route('/orders/completed', methods=['DELETE'])
+def delete_all_completed_orders(order_manager, order_monitor):
     try:
         order_manager.delete_all_completed_orders()
+        order_monitor.events.publish('resync', {})
         return jsonify({"message": "All completed orders deleted successfully"}), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
-@app.route('/api/orders/<symbol>/exit', methods=['POST'])
-def exit_order(symbol):
+@strategy_route('/orders/<symbol>/exit', methods=['POST'])
+def exit_order(order_manager, order_monitor, symbol):
     order = order_manager.get_order(symbol)
     if not order:
         return jsonify({"error": "Order not found"}), 404
 
     order_manager.exit_order(symbol)
+    publish_order_change(order_manager, order_monitor, symbol)
     
     return jsonify({"message": "Order exited successfully"}), 200
 
 @app.route('/api/stock/<symbol>', methods=['GET'])
 def get_stock_data(symbol):
-    stock = yf.Ticker(symbol)
-    end_time = datetime.now()
-    start_time = end_time - timedelta(days=1)  # Get data for the last 24 hours
-    hist = stock.history(start=start_time, end=end_time, interval="1m")
-    data = hist.reset_index().to_dict(orient='records')
-    return jsonify(data)
-
-
-@app.route('/api/notifications', methods=['GET'])
-def get_exit_alerts():
-    exit_alerts = order_monitor.check_orders()
-    return jsonify(exit_alerts)
+    """Last 24 hours of 1m bars from the shared chart cache.
+
+    ?format=columns returns one array per field instead of one dict per bar, ?points=N merges
+    bars into at most N candles. Responses carry an ETag and honour If-None-Match.
+    """
+    fmt = request.args.get('format', 'records')
+    points = request.args.get('points', type=int)
+    try:
+        etag, body = chart_cache.render(symbol, fmt, points, known_etags=request.if_none_match)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if etag is None:
+        return jsonify([] if fmt == 'records' else {})
+
+    response = Response(body, mimetype='application/json', status=200 if body is not None else 304)
+    response.set_etag(etag)
+    return response
+
+
+@strategy_route('/notifications', methods=['GET'])
+def get_exit_alerts(order_manager, order_monitor):
+    """Exit alerts published by the monitor; never fetches market data.
+
+    Without `since` this returns the alerts of the latest tick. With `since=<seq>` it returns
+    {"alerts": [...], "cursor": <seq to send next>, "missed": <older alerts were dropped>}.
+    """
+    since = request.args.get('since', type=int)
+    if since is None:
+        return jsonify(order_monitor.alerts.latest())
+    alerts, cursor, missed = order_monitor.alerts.since(since)
+    return jsonify({"alerts": alerts, "cursor": cursor, "missed": missed})
+
+STREAM_KEEPALIVE_SECONDS = 15
+
+@strategy_route('/stream', methods=['GET'])
+def stream_events(order_manager, order_monitor):
+    """Server-Sent Events push channel.
+
+    Sends a 'snapshot' of all orders on connect, then 'orders' events holding only the
+    fields that changed per symbol (null for a deleted order), 'alert' events for new exit
+    alerts, and 'resync' if this client fell too far behind and should reload everything.
+    """
+    subscription = order_monitor.events.subscribe()
+
+    def generate():
+        try:
+            yield format_sse('snapshot', {
+                'orders': order_manager.list_orders(),
+                'alertsCursor': order_monitor.alerts.since(0)[1],
+            })
+            while True:
+                message = subscription.get(timeout=STREAM_KEEPALIVE_SECONDS)
+                # A comment line keeps proxies from closing idle connections and lets us notice disconnects
+                yield message if message is not None else b': keepalive\n\n'
+        finally:
+            order_monitor.events.unsubscribe(subscription)
+
+    headers = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers=headers)
+
+PROFILE_TIMEOUT_SECONDS = 60
+
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """Stage timings, error and cache counters in the Prometheus text format."""
+    return Response(METRICS.render(), mimetype='text/plain; version=0.0.4')
+
+@strategy_route('/metrics/profile', methods=['GET'])
+def get_tick_profile(order_manager, order_monitor):
+    """Run the next monitor tick under cProfile and return the report (threaded engines only)."""
+    timeout = min(request.args.get('timeout', default=PROFILE_TIMEOUT_SECONDS, type=float), PROFILE_TIMEOUT_SECONDS)
+    report = order_monitor.profiler.request(timeout)
+    if report is None:
+        return jsonify({"error": f"No monitor tick finished within {timeout:g}s"}), 504
+    return Response(report, mimetype='text/plain')
+
+def publish_order_change(order_manager, order_monitor, symbol):
+    """Push API-made changes to stream clients as well, as a full order (or null when deleted)."""
+    order = order_manager.get_order(symbol)
+    order_monitor.order_deltas.forget(symbol)
+    order_monitor.events.publish('orders', {symbol: order})
 
 
 if __name__ == '__main__':
@@ -0,0 +1,201 @@
+import bisect
+import hashlib
+import logging
+import multiprocessing
+import threading
+
+import numpy as np
+
+from market_data import GATEWAY_BURST, GATEWAY_RATE, MarketDataGateway
+from order_manager import OrderManager
+from order_monitor import OrderMonitor
+from exit_rules import OrderBatch, evaluate_batch
+from order_record import from_array, load_orders, to_array
+
+
+def stable_hash(key: str) -> int:
+    """Hash that is the same in every process (str hashes are salted per interpreter)."""
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), 'big')
+
+
+class HashRing:
+    """Consistent hashing of symbols onto shards.
+
+    Each shard owns `replicas` points on the ring and a symbol goes to the first point at or
+    after its hash, so changing the shard count only moves the symbols of the shards involved.
+    """
+
+    def __init__(self, shards, replicas=64):
+        points = sorted((stable_hash(f"{shard}:{replica}"), shard) for shard in range(shards) for replica in range(replicas))
+        self._hashes = [point for point, _ in points]
+        self._shards = [shard for _, shard in points]
+
+    def shard_for(self, symbol: str) -> int:
+        index = bisect.bisect(self._hashes, stable_hash(symbol)) % len(self._hashes)
+        return self._shards[index]
+
+    def partition(self, orders):
+        """Group orders by the shard owning their symbol."""
+        shards = {}
+        for order in orders:
+            shards.setdefault(self.shard_for(order.symbol), []).append(order)
+        return shards
+
+
+def price_shard(monitor: OrderMonitor, orders):
+    """Price one shard's orders and run the exit rules on them.
+
+    Returns one compact (symbol, price, ma, highest_ma, profit, exit_code) record per order
+    that got new bars and could be priced.
+    """
+    monitor.indicators.prune(order.symbol for order in orders)
+    monitor.track_held(orders)
+    if not orders:
+        return []
+    monitor.prefetch_market_data(orders)
+    # Orders without a new bar since this worker last saw them send no record back
+    priced, prices, mas = monitor.price_orders(monitor.select_updated(orders))
+    if not priced:
+        return []
+    highest_ma, profit, exit_codes = evaluate_batch(OrderBatch.from_records(priced, prices, mas))
+    return [
+        (order.symbol, float(prices[i]), float(mas[i]), float(highest_ma[i]), float(profit[i]), int(exit_codes[i]))
+        for i, order in enumerate(priced)
+    ]
+
+
+def shard_worker(conn, price_update_interval, data_source, skip_unchanged=True, rate_share=1.0):
+    """Worker process: keeps its own bar buffers and indicator state warm across ticks.
+
+    Without a data source the worker gets a gateway with rate_share of the default upstream
+    budget, so all workers together stay within what one process may send.
+    """
+    if data_source is None:
+        data_source = MarketDataGateway(rate=GATEWAY_RATE * rate_share, burst=max(1, int(GATEWAY_BURST * rate_share)))
+    monitor = OrderMonitor(None, price_update_interval, data_source=data_source, skip_unchanged=skip_unchanged)
+    while True:
+        try:
+            orders = conn.recv()
+        except EOFError:
+            break
+        if orders is None:
+            break
+        try:
+            records = price_shard(monitor, from_array(orders))
+        except Exception as e:
+            logging.error(f"Shard tick failed: {str(e)}")
+            records = []
+        conn.send(records)
+    conn.close()
+
+
+class ShardedOrderMonitor(OrderMonitor):
+    """Spreads HOLDING symbols over `workers` processes so pandas work is not bound by one GIL.
+
+    Symbols are assigned with consistent hashing, so a symbol keeps landing on the same
+    worker and its streaming MAs stay warm. Workers send back compact result records and the
+    parent applies them to the OrderManager in one batch, exactly like OrderMonitor does.
+    Workers are spawned rather than forked: by the time a strategy is added, other monitors,
+    the market state saver and Flask threads are running, and a fork could copy a lock one
+    of them holds. start_method='forkserver' also works where available.
+    """
+
+    def __init__(self, order_manager: OrderManager, price_update_interval, auto_remove_on_exit=False, data_source=None,
+                 calendar=None, skip_unchanged=True, market_data=None, indicators=None, workers=4, replicas=64, start_method='spawn'):
+        super().__init__(order_manager, price_update_interval, auto_remove_on_exit=auto_remove_on_exit, data_source=data_source,
+                         calendar=calendar, skip_unchanged=skip_unchanged, market_data=market_data, indicators=indicators)
+        self.workers = workers
+        # Workers build their own MarketDataSnapshot; None gives each a gateway with its share of the rate limit
+        self.worker_data_source = data_source
+        self.ring = HashRing(workers, replicas)
+        self._context = multiprocessing.get_context(start_method)
+        self._processes = [None] * workers
+        self._conns = [None] * workers
+        # The monitor thread and check_orders() must not interleave messages on the pipes
+        self._shard_lock = threading.Lock()
+
+    def start(self):
+        self.start_workers()
+        super().start()
+
+    def stop(self):
+        super().stop()
+        self.stop_workers()
+
+    def start_workers(self):
+        for shard in range(self.workers):
+            self._start_worker(shard)
+
+    def stop_workers(self):
+        for shard in range(self.workers):
+            self._stop_worker(shard)
+
+    def _start_worker(self, shard):
+        parent_conn, child_conn = self._context.Pipe()
+        process = self._context.Process(
+            target=shard_worker,
+            args=(child_conn, self.price_update_interval, self.worker_data_source, self.skip_unchanged, 1 / self.workers),
+            name=f"order-monitor-shard-{shard}", daemon=True,
+        )
+        process.start()
+        child_conn.close()
+        self._processes[shard] = process
+        self._conns[shard] = parent_conn
+
+    def _stop_worker(self, shard):
+        conn, process = self._conns[shard], self._processes[shard]
+        if conn is None:
+            return
+        try:
+            conn.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        conn.close()
+        process.join(timeout=5)
+        if process.is_alive():
+            process.terminate()
+        self._conns[shard] = self._processes[shard] = None
+
+    def evaluate_orders(self, orders):
+        """Price every shard in parallel, then commit all results with one write."""
+        if not any(self._conns):
+            # Not started: price in this process
+            return super().evaluate_orders(orders)
+        orders = self.track_held(load_orders(orders))
+        with self._shard_lock:
+            records = self._price_shards(orders)
+
+        # Back in list_orders() order, so alerts come out as they would from OrderMonitor
+        position = {order.symbol: i for i, order in enumerate(orders)}
+        records.sort(key=lambda record: position[record[0]])
+        priced = [orders[position[record[0]]] for record in records]
+        if not priced:
+            return self.commit_exit_results([], [], [], [], [])
+        _, prices, _, highest_ma, profit, exit_codes = (list(column) for column in zip(*records))
+        return self.commit_exit_results(priced, prices, np.array(highest_ma), np.array(profit), np.array(exit_codes))
+
+    def _price_shards(self, orders):
+        shards = self.ring.partition(orders)
+        # Every worker gets a (possibly empty) batch so it can prune symbols it no longer owns
+        sent = []
+        for shard in range(self.workers):
+            try:
+                # One fixed-layout array per shard: a single buffer to pickle instead of a dict per order
+                self._conns[shard].send(to_array(shards.get(shard, [])))
+                sent.append(shard)
+            except (BrokenPipeError, OSError) as e:
+                logging.error(f"Shard {shard} is gone, restarting it: {str(e)}")
+                self._restart_worker(shard)
+
+        records = []
+        for shard in sent:
+            try:
+                records += self._conns[shard].recv()
+            except (EOFError, OSError) as e:
+                logging.error(f"Shard {shard} died mid-tick, restarting it: {str(e)}")
+                self._restart_worker(shard)
+        return records
+
+    def _restart_worker(self, shard):
+        self._stop_worker(shard)
+        self._start_worker(shard)
@@ -0,0 +1,117 @@
+import os
+import re
+import threading
+from typing import Callable, Dict, List, Optional
+
+from indicators import IndicatorEngine
+from order_manager import OrderManager
+
+# Strategy names end up in file names and URLs
+STRATEGY_NAME = re.compile(r'[A-Za-z0-9_-]{1,64}')
+_TRADES_FILE = re.compile(r'TRADES_LOG_([A-Za-z0-9_-]{1,64})\.json|TRADES_([A-Za-z0-9_-]{1,64})\.sqlite3')
+
+
+class StrategyRegistry:
+    """One OrderManager, and optionally one monitor, per strategy.
+
+    Every strategy keeps its own trades log and storage, so a write to one strategy only
+    takes that strategy's lock and never blocks reads of another. The registry's own lock
+    is only held while strategies are added or removed; lookups are plain dict reads.
+
+    Monitors are built by monitor_factory(order_manager, market_data, indicators) and all
+    get the same MarketDataSnapshot and IndicatorEngine, so a symbol held by several
+    strategies is fetched once per interval and its MAs are computed once.
+    """
+
+    def __init__(self, base_dir='.', storage='json', cache=False, market_data=None, indicators: Optional[IndicatorEngine] = None,
+                 monitor_factory: Optional[Callable] = None, logging=False):
+        self.base_dir = base_dir
+        self.storage = storage
+        self.cache = cache
+        self.market_data = market_data
+        self.indicators = indicators if indicators is not None else IndicatorEngine()
+        self.monitor_factory = monitor_factory
+        self.logging = logging
+        self._managers: Dict[str, OrderManager] = {}
+        self._monitors = {}
+        self._started = False
+        self._lock = threading.Lock()
+
+    def discover(self) -> List[str]:
+        """Names of the strategies that already have a trades log or database in base_dir."""
+        directory = os.path.join(os.path.dirname(os.path.abspath(__file__)), self.base_dir)
+        if not os.path.isdir(directory):
+            return []
+        names = set()
+        for file_name in os.listdir(directory):
+            match = _TRADES_FILE.fullmatch(file_name)
+            if match:
+                names.add(match.group(1) or match.group(2))
+        return sorted(names)
+
+    def load(self, names=None):
+        """add() every strategy in names, by default every discovered one. Returns their names."""
+        names = self.discover() if names is None else names
+        for name in names:
+            self.add(name)
+        return list(names)
+
+    def add(self, name: str) -> OrderManager:
+        """Open (or create) the strategy's storage and monitor. Returns the existing manager if already added."""
+        if not STRATEGY_NAME.fullmatch(name or ''):
+            raise ValueError("Strategy names may only contain letters, digits, '_' and '-' (at most 64)")
+        with self._lock:
+            manager = self._managers.get(name)
+            if manager is not None:
+                return manager
+            manager = OrderManager(name, base_dir=self.base_dir, logging=self.logging, storage=self.storage, cache=self.cache)
+            if self.monitor_factory is not None:
+                monitor = self._monitors[name] = self.monitor_factory(manager, self.market_data, self.indicators)
+                if self._started:
+                    monitor.start()
+            self._managers[name] = manager
+            return manager
+
+    def remove(self, name: str):
+        """Stop the strategy's monitor and close its storage. Its trades log stays on disk."""
+        with self._lock:
+            manager = self._managers.pop(name)
+            monitor = self._monitors.pop(name, None)
+        if monitor is not None:
+            if monitor.running:
+                monitor.stop()
+            self.indicators.release(monitor)
+        manager.close()
+
+    def get(self, name: str) -> Optional[OrderManager]:
+        return self._managers.get(name)
+
+    def monitor(self, name: str):
+        return self._monitors.get(name)
+
+    def names(self) -> List[str]:
+        return sorted(self._managers)
+
+    def monitors(self):
+        return list(self._monitors.values())
+
+    def __contains__(self, name):
+        return name in self._managers
+
+    def __len__(self):
+        return len(self._managers)
+
+    def start(self):
+        """Start the monitors of every strategy, and of strategies added from now on."""
+        with self._lock:
+            self._started = True
+            monitors = list(self._monitors.values())
+        for monitor in monitors:
+            monitor.start()
+
+    def close(self):
+        """Stop every monitor and close every strategy's storage."""
+        with self._lock:
+            self._started = False
+        for name in self.names():
+            self.remove(name)
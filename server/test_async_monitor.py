@@ -0,0 +1,84 @@
+import asyncio
+import shutil
+import tempfile
+import time
+import unittest
+from unittest import mock
+from async_monitor import AsyncOrderMonitor
+from market_data import FakeDataSource
+from order_manager import OrderManager
+from order_fixtures import make_order
+
+class SlowDataSource(FakeDataSource):
+
+    def __init__(self, delay):
+        super().__init__()
+        self.delay = delay
+
+    def fetch(self, symbols, start, end, interval='1m'):
+        time.sleep(self.delay)
+        return super().fetch(symbols, start, end, interval)
+
+class AsyncOrderMonitorTestCase(unittest.TestCase):
+
+    def setUp(self):
+        base_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, base_dir)
+        self.order_manager = OrderManager('Test', base_dir=base_dir)
+        for i in range(12):
+            self.order_manager.update_order(f'SYM{i}', make_order(f'SYM{i}'))
+
+    def test_concurrent_chunks_and_latency(self):
+        source = SlowDataSource(delay=0.1)
+        monitor = AsyncOrderMonitor(self.order_manager, price_update_interval=0.05, data_source=source, max_concurrency=4, chunk_size=3)
+        monitor.market_data.ttl = 0.03
+        monitor.start()
+        time.sleep(0.35)
+        monitor.stop()
+
+        stats = monitor.latency_stats()
+        self.assertGreaterEqual(stats['ticks'], 1)
+        # Four chunks of three symbols, fetched in parallel rather than back to back
+        self.assertLess(stats['max'], 0.3)
+        self.assertTrue(all(order['currentPrice'] for order in self.order_manager.list_orders()))
+
+    def test_overrun_skips_ticks(self):
+        source = SlowDataSource(delay=0.12)
+        monitor = AsyncOrderMonitor(self.order_manager, price_update_interval=0.05, data_source=source, max_concurrency=1, chunk_size=12)
+        monitor.market_data.ttl = 0.03
+        monitor.start()
+        time.sleep(0.4)
+        monitor.stop()
+        stats = monitor.latency_stats()
+        self.assertGreater(stats['skipped_ticks'], 0)
+        # Overrunning ticks are dropped, not queued behind each other
+        self.assertLessEqual(stats['ticks'], 4)
+
+    def test_alerts_clear_once_nothing_is_held(self):
+        self.order_manager.update_order('AAPL', make_order('AAPL', initialSL='static', initialSLPct=-1000))
+        monitor = AsyncOrderMonitor(self.order_manager, price_update_interval=60, data_source=FakeDataSource())
+        asyncio.run(monitor.run_tick())
+        self.assertIn('AAPL', [alert['symbol'] for alert in monitor.alerts.latest()])
+
+        for symbol in self.order_manager.list_orders():
+            self.order_manager.delete_order(symbol['symbol'])
+        self.assertEqual(asyncio.run(monitor.run_tick()), [])
+        self.assertEqual(monitor.alerts.latest(), [])
+
+    def test_idle_market_clears_alerts(self):
+        calendar = mock.Mock()
+        calendar.seconds_until_open.return_value = 3600
+        monitor = AsyncOrderMonitor(self.order_manager, price_update_interval=0.01, data_source=FakeDataSource(), calendar=calendar)
+        monitor.alerts.publish([{'symbol': 'SYM0'}])
+        monitor.start()
+        time.sleep(0.05)
+        monitor.stop()
+        self.assertEqual(monitor.ticks, 0)
+        self.assertEqual(monitor.alerts.latest(), [])
+
+    def test_rejects_unknown_overrun_policy(self):
+        with self.assertRaises(ValueError):
+            AsyncOrderMonitor(self.order_manager, price_update_interval=1, overrun='queue', data_source=FakeDataSource())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+import math
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime
+from backtest import load_bars, replay_orders, sweep_parameters
+from exit_rules import evaluate_exit
+from market_data import synthetic_ohlcv
+from order_monitor import compute_ma_series
+from order_fixtures import make_order
+
+def replay_reference(ohlcv, order):
+    """Bar-by-bar replay with the per-order rules, as the live monitor would see the bars."""
+    order = dict(order, highestMA=0)
+    ma = compute_ma_series(ohlcv, order['maType'], int(order['period']))
+    for timestamp, close, current_ma in zip(ohlcv.index, ohlcv['Close'], ma):
+        if math.isnan(current_ma):
+            continue
+        exit_reason = evaluate_exit(order, close, current_ma)
+        if exit_reason:
+            return timestamp, exit_reason
+    return ohlcv.index[-1], None
+
+class BacktestTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.bars = {
+            symbol: synthetic_ohlcv(symbol, datetime(2024, 8, 12, 9, 30), datetime(2024, 8, 16, 16, 0))
+            for symbol in ('TSLA', 'AAPL')
+        }
+
+    def orders(self):
+        orders = []
+        for symbol in self.bars:
+            entry_price = float(self.bars[symbol]['Close'].iloc[0])
+            for ma_type in ('SMA', 'EMA', 'HMA'):
+                for initial_sl in ('trailing', 'static'):
+                    for take_profit in (0.5, 2, 1000):
+                        orders.append(make_order(
+                            symbol, maType=ma_type, period=14, initialSL=initial_sl, initialSLPct=1,
+                            takeProfitPct=take_profit, secondarySLPct=0.5, entryPrice=entry_price,
+                        ))
+        return orders
+
+    def test_matches_bar_by_bar_rules(self):
+        orders = self.orders()
+        results = replay_orders(self.bars, orders)
+        self.assertEqual(len(results), len(orders))
+        self.assertTrue(results['exitReason'].notna().any())
+        for position, order in enumerate(orders):
+            with self.subTest(order=position):
+                exit_datetime, exit_reason = replay_reference(self.bars[order['symbol']], order)
+                self.assertEqual(results.loc[position, 'exitReason'], exit_reason)
+                self.assertEqual(results.loc[position, 'exitDatetime'], exit_datetime)
+
+    def test_entry_datetime_and_default_entry_price(self):
+        entry = self.bars['TSLA'].index[200]
+        order = make_order('TSLA', entryPrice=0, entryDatetime=entry.isoformat(), initialSL='static', initialSLPct=100)
+        result = replay_orders(self.bars, [order]).iloc[0]
+        self.assertEqual(result['entryDatetime'], entry)
+        self.assertEqual(result['entryPrice'], self.bars['TSLA']['Close'].iloc[200])
+        self.assertIsNone(result['exitReason'])
+        self.assertEqual(result['bars'], len(self.bars['TSLA']) - 201)
+
+    def test_load_bars_from_csv(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.bars['TSLA'].to_csv(os.path.join(directory, 'TSLA.csv'))
+        loaded = load_bars(directory)
+        self.assertEqual(list(loaded), ['TSLA'])
+        self.assertEqual(len(loaded['TSLA']), len(self.bars['TSLA']))
+        self.assertAlmostEqual(loaded['TSLA']['Close'].sum(), self.bars['TSLA']['Close'].sum())
+
+class SweepTestCase(unittest.TestCase):
+
+    GRID = {'maType': ('EMA', 'HMA'), 'period': (8, 14), 'initialSLPct': (0.5, 2), 'takeProfitPct': (1, 1000), 'secondarySLPct': (0, 0.5)}
+
+    def setUp(self):
+        self.ohlcv = synthetic_ohlcv('TSLA', datetime(2024, 8, 12, 9, 30), datetime(2024, 8, 16, 16, 0))
+
+    def test_each_configuration_matches_a_replayed_order(self):
+        results = sweep_parameters(self.ohlcv, self.GRID, workers=1)
+        self.assertEqual(len(results), 2 * 2 * 2 * 2 * 2 * 2)
+        self.assertTrue(results['returnPct'].is_monotonic_decreasing)
+        self.assertTrue((results['maxDrawdownPct'] >= 0).all())
+
+        orders = [make_order('TSLA', entryPrice=0, **{key: row[key] for key in ('maType', 'period', 'initialSL', 'initialSLPct', 'takeProfitPct', 'secondarySLPct')})
+                  for _, row in results.iterrows()]
+        replayed = replay_orders({'TSLA': self.ohlcv}, orders)
+        self.assertEqual(list(replayed['exitReason']), list(results['exitReason']))
+        self.assertEqual(list(replayed['exitDatetime']), list(results['exitDatetime']))
+        self.assertEqual(list(replayed['returnPct']), list(results['returnPct']))
+
+    def test_worker_processes_give_the_same_table(self):
+        inline = sweep_parameters(self.ohlcv, self.GRID, workers=1)
+        parallel = sweep_parameters(self.ohlcv, self.GRID, workers=2)
+        self.assertTrue(inline.equals(parallel))
+
+if __name__ == '__main__':
+    unittest.main()
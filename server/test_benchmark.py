@@ -0,0 +1,20 @@
+import unittest
+import benchmark
+
+class BenchmarkTestCase(unittest.TestCase):
+
+    def test_report_and_compare(self):
+        report = benchmark.run(order_counts=(10,), storages=('json', 'sqlite'), ma_types=('EMA',), periods=(14,),
+                               tick_order_counts=(10,), repeat=1)
+        results = report['results']
+        self.assertIn('order_manager.sqlite.10.update_orders', results)
+        self.assertIn('get_curr_ma.EMA.14', results)
+        self.assertIn('tick.10.refresh', results)
+        self.assertTrue(all(result['min'] > 0 for result in results.values()))
+
+        rows = benchmark.compare(report, report)
+        self.assertEqual(len(rows), len(results))
+        self.assertTrue(all(ratio == 1 for _, _, _, ratio in rows))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import json
+import unittest
+from functools import partial
+from datetime import datetime
+from chart_data import ChartCache, downsample_ohlcv, to_columns
+from market_data import FakeDataSource, synthetic_ohlcv
+from order_monitor import MarketDataSnapshot
+
+class DownsampleTestCase(unittest.TestCase):
+
+    def test_buckets_keep_ohlc_semantics(self):
+        frame = synthetic_ohlcv('TSLA', datetime(2024, 8, 16, 9, 30), datetime(2024, 8, 16, 16, 0))
+        candles = downsample_ohlcv(frame, 40)
+        self.assertEqual(len(candles), 40)
+        self.assertEqual(candles['Open'].iloc[0], frame['Open'].iloc[0])
+        self.assertEqual(candles['Close'].iloc[-1], frame['Close'].iloc[-1])
+        self.assertAlmostEqual(candles['High'].max(), frame['High'].max())
+        self.assertAlmostEqual(candles['Low'].min(), frame['Low'].min())
+        self.assertEqual(candles['Volume'].sum(), frame['Volume'].sum())
+        self.assertIs(downsample_ohlcv(frame, len(frame) + 1), frame)
+
+    def test_columns_use_epoch_milliseconds(self):
+        frame = synthetic_ohlcv('TSLA', datetime(2024, 8, 16, 9, 30), datetime(2024, 8, 16, 9, 35))
+        payload = to_columns(frame)
+        self.assertEqual(len(payload['Close']), len(frame))
+        self.assertEqual(payload['Datetime'][0], int(frame.index[0].timestamp() * 1000))
+
+class ChartCacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.data_source = FakeDataSource()
+        self.snapshot = MarketDataSnapshot(ttl=60, data_source=self.data_source, max_bars=24 * 60, max_symbols=2)
+        self.cache = ChartCache(self.snapshot, serializer=partial(json.dumps, default=str), max_entries=2)
+
+    def test_reuses_body_until_bars_change(self):
+        etag, body = self.cache.render('TSLA', 'columns')
+        self.assertEqual(self.cache.render('TSLA', 'columns'), (etag, body))
+        self.assertEqual(self.cache.render('TSLA', 'columns', known_etags={etag}), (etag, None))
+        self.assertEqual(self.data_source.calls, 1)
+
+        self.snapshot.ttl = 0  # next read refreshes the buffer, which bumps its version
+        new_etag, _ = self.cache.render('TSLA', 'columns')
+        self.assertNotEqual(new_etag, etag)
+        self.assertEqual(self.data_source.calls, 2)
+
+    def test_formats_and_limits(self):
+        etag, records = self.cache.render('TSLA')
+        self.assertIn('Close', json.loads(records)[0])
+        _, columns = self.cache.render('TSLA', 'columns', points=50)
+        self.assertEqual(len(json.loads(columns)['Close']), 50)
+        with self.assertRaises(ValueError):
+            self.cache.render('TSLA', 'csv')
+
+        self.cache.render('AAPL')
+        self.cache.render('MSFT')
+        self.assertEqual(len(self.cache._bodies), 2)
+        self.assertEqual(self.snapshot.stats()['symbols'], 2)
+        self.assertEqual(self.snapshot.stats()['evictions'], 1)
+
+if __name__ == '__main__':
+    unittest.main()
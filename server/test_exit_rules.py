@@ -0,0 +1,62 @@
+import unittest
+import numpy as np
+from exit_rules import EXIT_REASONS, OrderBatch, evaluate_batch, evaluate_exit
+
+def random_orders(rng, count):
+    orders = []
+    for i in range(count):
+        entry_price = float(rng.choice([0.0, rng.uniform(1, 500)], p=[0.02, 0.98]))
+        order = {
+            'symbol': f'SYM{i}',
+            'entryPrice': entry_price,
+            'takeProfitPct': float(rng.choice([0.0, 0.5, rng.uniform(0, 10)])),
+            'secondarySLPct': float(rng.choice([-1.0, 0.0, 100.0, rng.uniform(0, 5)])),
+            'initialSLPct': float(rng.choice([0.0, rng.uniform(0, 5)])),
+            'initialSL': str(rng.choice(['trailing', 'static'])),
+        }
+        highest_ma = rng.choice(['missing', 'none', 'zero', 'value'])
+        if highest_ma == 'none':
+            order['highestMA'] = None
+        elif highest_ma == 'zero':
+            order['highestMA'] = 0
+        elif highest_ma == 'value':
+            order['highestMA'] = entry_price * rng.uniform(0.9, 1.15)
+        orders.append(order)
+    return orders
+
+class ExitRulesTestCase(unittest.TestCase):
+
+    def test_batch_matches_per_order_rules(self):
+        rng = np.random.default_rng(42)
+        for _ in range(20):
+            orders = random_orders(rng, 500)
+            prices = [order['entryPrice'] * rng.uniform(0.9, 1.15) for order in orders]
+            mas = [price * rng.uniform(0.98, 1.02) for price in prices]
+            # Exact threshold hits exercise the <= / >= boundaries
+            for i in range(0, len(orders), 7):
+                mas[i] = orders[i]['entryPrice'] * (1 - orders[i]['initialSLPct'] / 100)
+
+            batch = OrderBatch.from_orders(orders, prices, mas)
+            highest_ma, profit, exit_codes = evaluate_batch(batch)
+
+            for i, order in enumerate(orders):
+                expected = dict(order)
+                expected_reason = evaluate_exit(expected, prices[i], mas[i])
+                with self.subTest(order=order, price=prices[i], ma=mas[i]):
+                    self.assertEqual(EXIT_REASONS[int(exit_codes[i])], expected_reason)
+                    self.assertEqual(highest_ma[i], expected['highestMA'])
+                    self.assertAlmostEqual(profit[i], expected['profit'])
+
+    def test_broadcasts_over_bars(self):
+        orders = random_orders(np.random.default_rng(7), 4)
+        batch = OrderBatch.from_orders(orders, [1.0] * 4, [1.0] * 4)
+        mas = np.linspace(50, 600, 12)
+        _, _, exit_codes = evaluate_batch(OrderBatch(
+            batch.symbols, batch.entry_price[:, None], batch.take_profit_pct[:, None],
+            batch.secondary_sl_pct[:, None], batch.initial_sl_pct[:, None], batch.trailing[:, None],
+            batch.highest_ma[:, None], mas[None, :], mas[None, :],
+        ))
+        self.assertEqual(exit_codes.shape, (4, 12))
+
+if __name__ == '__main__':
+    unittest.main()
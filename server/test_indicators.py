@@ -0,0 +1,93 @@
+import unittest
+from datetime import datetime, timedelta
+import numpy as np
+import pandas_ta as ta
+from indicators import EMA, HMA, MOVING_AVERAGES, SMA, WMA, IndicatorEngine
+from market_data import FakeDataSource, synthetic_ohlcv
+from order_monitor import MarketDataSnapshot, get_curr_ma
+
+PERIODS = [1, 2, 3, 5, 8, 9, 14, 20, 50]
+REFERENCE = {'SMA': (SMA, ta.sma), 'EMA': (EMA, ta.ema), 'WMA': (WMA, ta.wma), 'HMA': (HMA, ta.hma)}
+
+def closes(symbol='TSLA', bars=600):
+    end = datetime(2024, 8, 16, 16, 0)
+    return synthetic_ohlcv(symbol, end - timedelta(minutes=bars), end)['Close']
+
+class StreamingMovingAverageTestCase(unittest.TestCase):
+
+    def test_matches_pandas_ta(self):
+        close = closes()
+        for ma_type, (indicator_class, reference) in REFERENCE.items():
+            for period in PERIODS:
+                with self.subTest(ma_type=ma_type, period=period):
+                    indicator = indicator_class(period)
+                    streamed = np.array([indicator.update(value) for value in close])
+                    expected = reference(close, length=period).to_numpy(dtype=np.float64)
+                    np.testing.assert_allclose(streamed, expected, rtol=1e-9, equal_nan=True)
+
+    def test_peek_does_not_commit(self):
+        close = closes().to_numpy()
+        for indicator_class in (SMA, EMA, WMA, HMA):
+            with self.subTest(indicator=indicator_class.__name__):
+                streamed, peeked = indicator_class(9), indicator_class(9)
+                for value in close[:-1]:
+                    streamed.update(value)
+                    peeked.update(value)
+                    peeked.peek(value * 2)
+                self.assertAlmostEqual(peeked.peek(close[-1]), streamed.update(close[-1]), places=9)
+
+    def test_state_round_trip(self):
+        close = closes().to_numpy()
+        for indicator_class in (SMA, EMA, WMA, HMA):
+            with self.subTest(indicator=indicator_class.__name__):
+                original, restored = indicator_class(9), indicator_class(9)
+                for value in close[:300]:
+                    original.update(value)
+                restored.set_state(original.get_state())
+                for value in close[300:]:
+                    self.assertAlmostEqual(restored.update(value), original.update(value), places=12)
+
+class IndicatorEngineTestCase(unittest.TestCase):
+
+    def test_tracks_get_curr_ma_across_ticks(self):
+        snapshot = MarketDataSnapshot(ttl=0, data_source=FakeDataSource(), max_bars=2000)
+        engine = IndicatorEngine()
+        frame = snapshot.get_ohlcv('TSLA')
+        for ma_type in ('SMA', 'EMA', 'WMA', 'HMA'):
+            for period in (5, 14, 50):
+                with self.subTest(ma_type=ma_type, period=period):
+                    expected = get_curr_ma(frame, ma_type, period)
+                    self.assertAlmostEqual(engine.current_ma('TSLA', ma_type, period, frame), expected, places=6)
+
+        # Grow the frame a bar at a time while revising the forming bar, as live data does
+        for step in range(1, 30):
+            grown = frame.copy()
+            grown.loc[grown.index[-1], 'Close'] += step * 0.01
+            for ma_type in ('SMA', 'EMA', 'WMA', 'HMA'):
+                with self.subTest(step=step, ma_type=ma_type):
+                    expected = get_curr_ma(grown, ma_type, 14)
+                    self.assertAlmostEqual(engine.current_ma('TSLA', ma_type, 14, grown), expected, places=6)
+            frame = synthetic_ohlcv('TSLA', grown.index[0], grown.index[-1] + timedelta(minutes=2))
+        self.assertEqual(len(engine), 12)
+
+    def test_every_streaming_type_has_a_reference(self):
+        # validate_order() accepts any of MOVING_AVERAGES, so backtests and get_curr_ma() must handle them too
+        frame = synthetic_ohlcv('TSLA', datetime(2024, 8, 16, 9, 30), datetime(2024, 8, 16, 12, 0))
+        for ma_type in MOVING_AVERAGES:
+            with self.subTest(ma_type=ma_type):
+                self.assertAlmostEqual(get_curr_ma(frame, ma_type, 14), IndicatorEngine().current_ma('TSLA', ma_type, 14, frame), places=6)
+
+    def test_shared_by_key_and_pruned(self):
+        frame = synthetic_ohlcv('TSLA', datetime(2024, 8, 16, 9, 30), datetime(2024, 8, 16, 12, 0))
+        engine = IndicatorEngine()
+        engine.current_ma('TSLA', 'EMA', 8, frame)
+        engine.current_ma('TSLA', 'EMA', '8', frame)
+        engine.current_ma('AAPL', 'EMA', 8, frame)
+        self.assertEqual(len(engine), 2)
+        engine.prune(['TSLA'])
+        self.assertEqual(len(engine), 1)
+        with self.assertRaises(ValueError):
+            engine.current_ma('TSLA', 'KAMA', 8, frame)
+
+if __name__ == '__main__':
+    unittest.main()
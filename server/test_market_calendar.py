@@ -0,0 +1,44 @@
+import unittest
+from datetime import date, datetime, time
+from zoneinfo import ZoneInfo
+from market_calendar import MarketCalendar, us_equity_holidays
+
+NEW_YORK = ZoneInfo('America/New_York')
+
+class MarketCalendarTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.calendar = MarketCalendar()
+
+    def test_holidays(self):
+        self.assertEqual(sorted(us_equity_holidays(2024)), [
+            date(2024, 1, 1), date(2024, 1, 15), date(2024, 2, 19), date(2024, 3, 29), date(2024, 5, 27),
+            date(2024, 6, 19), date(2024, 7, 4), date(2024, 9, 2), date(2024, 11, 28), date(2024, 12, 25),
+        ])
+        # Observed on the Friday before; New Year's Day 2022 fell on a Saturday and was not moved
+        self.assertIn(date(2026, 7, 3), us_equity_holidays(2026))
+        self.assertNotIn(date(2021, 12, 31), us_equity_holidays(2022))
+
+    def test_session_hours(self):
+        self.assertTrue(self.calendar.is_open(datetime(2024, 8, 16, 9, 30, tzinfo=NEW_YORK)))
+        self.assertFalse(self.calendar.is_open(datetime(2024, 8, 16, 9, 29, tzinfo=NEW_YORK)))
+        # Still open during the grace period after the close
+        self.assertTrue(self.calendar.is_open(datetime(2024, 8, 16, 16, 1, tzinfo=NEW_YORK)))
+        self.assertFalse(self.calendar.is_open(datetime(2024, 8, 16, 16, 2, tzinfo=NEW_YORK)))
+        self.assertFalse(self.calendar.is_open(datetime(2024, 7, 4, 12, 0, tzinfo=NEW_YORK)))
+        # The same instant in another timezone
+        self.assertTrue(self.calendar.is_open(datetime(2024, 8, 16, 14, 0, tzinfo=ZoneInfo('UTC'))))
+
+    def test_next_open_skips_weekends_and_holidays(self):
+        friday_evening = datetime(2024, 8, 30, 18, 0, tzinfo=NEW_YORK)
+        # Saturday, Sunday, then Labor Day
+        self.assertEqual(self.calendar.next_open(friday_evening), datetime(2024, 9, 3, 9, 30, tzinfo=NEW_YORK))
+        self.assertEqual(self.calendar.seconds_until_open(datetime(2024, 9, 3, 9, 0, tzinfo=NEW_YORK)), 1800)
+        self.assertEqual(self.calendar.seconds_until_open(datetime(2024, 9, 3, 10, 0, tzinfo=NEW_YORK)), 0)
+
+    def test_custom_hours(self):
+        calendar = MarketCalendar('Europe/London', open_time=time(8, 0), close_time=time(16, 30), holidays=lambda year: ())
+        self.assertTrue(calendar.is_open(datetime(2024, 7, 4, 8, 0, tzinfo=ZoneInfo('Europe/London'))))
+
+if __name__ == '__main__':
+    unittest.main()
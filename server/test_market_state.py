@@ -0,0 +1,104 @@
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+import pandas as pd
+from indicators import IndicatorEngine
+from market_data import FakeDataSource, synthetic_ohlcv
+from market_state import MarketStateStore, load_state, save_state
+from order_manager import OrderManager
+from order_monitor import MarketDataSnapshot, OrderMonitor
+from order_fixtures import make_order
+
+class MarketStateTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.base_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.base_dir)
+        self.path = os.path.join(self.base_dir, 'market_state.npz')
+        self.order_manager = OrderManager('Test', base_dir=self.base_dir)
+        for symbol, ma_type in (('TSLA', 'EMA'), ('AAPL', 'HMA'), ('MSFT', 'SMA')):
+            self.order_manager.update_order(symbol, make_order(symbol, maType=ma_type, period=20))
+
+    def monitor(self, source):
+        return OrderMonitor(self.order_manager, price_update_interval=60, data_source=source)
+
+    def test_round_trip(self):
+        monitor = self.monitor(FakeDataSource())
+        monitor.update_all_active_orders()
+        save_state(self.path, monitor.market_data, monitor.indicators)
+        self.assertFalse([name for name in os.listdir(self.base_dir) if name.endswith('.tmp')])
+
+        market_data, indicators = MarketDataSnapshot(ttl=60, data_source=FakeDataSource()), IndicatorEngine()
+        self.assertEqual(load_state(self.path, market_data, indicators), (3, 3))
+        self.assertEqual(market_data.max_bars, monitor.market_data.max_bars)
+        for symbol in ('TSLA', 'AAPL', 'MSFT'):
+            with self.subTest(symbol=symbol):
+                pd.testing.assert_frame_equal(market_data.export_buffers()[1][symbol], monitor.market_data.export_buffers()[1][symbol],
+                                              check_freq=False)
+        # Restored MAs continue exactly where the saved ones were
+        end = datetime.now() + timedelta(minutes=5)
+        for symbol, ma_type in (('TSLA', 'EMA'), ('AAPL', 'HMA'), ('MSFT', 'SMA')):
+            bars = synthetic_ohlcv(symbol, end - timedelta(minutes=200), end)
+            with self.subTest(symbol=symbol):
+                self.assertAlmostEqual(indicators.current_ma(symbol, ma_type, 20, bars), monitor.indicators.current_ma(symbol, ma_type, 20, bars), places=9)
+
+    def test_timezone_aware_bars(self):
+        frame = synthetic_ohlcv('TSLA', datetime(2024, 8, 16, 9, 30), datetime(2024, 8, 16, 16, 0))
+        frame.index = frame.index.tz_localize('America/New_York')
+        market_data, indicators = MarketDataSnapshot(ttl=60, data_source=FakeDataSource()), IndicatorEngine()
+        market_data.import_buffers(500, {'TSLA': frame})
+        indicators.current_ma('TSLA', 'EMA', 8, frame)
+        save_state(self.path, market_data, indicators)
+
+        restored, restored_indicators = MarketDataSnapshot(ttl=60, data_source=FakeDataSource()), IndicatorEngine()
+        load_state(self.path, restored, restored_indicators)
+        pd.testing.assert_frame_equal(restored.export_buffers()[1]['TSLA'], frame.iloc[-500:], check_freq=False)
+        self.assertEqual(restored_indicators.export_state()[0][3], frame.index[-2])
+
+    def test_warm_restart_fetches_only_the_gap(self):
+        cold_source = FakeDataSource()
+        cold = self.monitor(cold_source)
+        cold.update_all_active_orders()
+        # What shutdown does: a last save
+        MarketStateStore(self.path, cold.market_data, cold.indicators, save_interval=None).close()
+
+        warm_source = FakeDataSource()
+        warm = self.monitor(warm_source)
+        MarketStateStore(self.path, warm.market_data, warm.indicators, save_interval=None).start()
+        warm.update_all_active_orders()
+        self.assertEqual(warm_source.calls, 1)
+        self.assertLessEqual(warm_source.bars_served, 3 * 2)
+        self.assertGreaterEqual(cold_source.bars_served, 3 * cold.market_data.max_bars)
+        for order in self.order_manager.list_orders():
+            self.assertGreater(order['highestMA'], 0)
+
+    def test_unusable_snapshots_start_cold(self):
+        market_data, indicators = MarketDataSnapshot(ttl=60, data_source=FakeDataSource()), IndicatorEngine()
+        self.assertEqual(load_state(self.path, market_data, indicators), (0, 0))
+        with open(self.path, 'wb') as f:
+            f.write(b'not a snapshot')
+        self.assertEqual(load_state(self.path, market_data, indicators), (0, 0))
+        save_state(self.path, market_data, indicators)
+        self.assertEqual(load_state(self.path, market_data, indicators, max_age=-1), (0, 0))
+
+    def test_truncated_snapshot_starts_cold(self):
+        monitor = self.monitor(FakeDataSource())
+        monitor.update_all_active_orders()
+        size = save_state(self.path, monitor.market_data, monitor.indicators)
+        with open(self.path, 'r+b') as f:
+            f.truncate(size // 2)
+        market_data, indicators = MarketDataSnapshot(ttl=60, data_source=FakeDataSource()), IndicatorEngine()
+        self.assertEqual(load_state(self.path, market_data, indicators), (0, 0))
+        self.assertEqual(market_data.stats()['symbols'], 0)
+        # A store that cannot read its snapshot still starts, and replaces it on close
+        store = MarketStateStore(self.path, market_data, indicators, save_interval=None)
+        store.start()
+        store.close()
+        self.assertEqual(load_state(self.path, market_data, indicators), (0, 0))
+        self.assertEqual(os.listdir(self.base_dir).count('market_state.npz'), 1)
+        self.assertFalse([name for name in os.listdir(self.base_dir) if name.endswith('.tmp')])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+import threading
+import unittest
+from metrics import Histogram, MetricsRegistry, TickProfiler
+
+class MetricsTestCase(unittest.TestCase):
+
+    def test_histogram_is_cumulative(self):
+        histogram = Histogram(buckets=(0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 3.0):
+            histogram.observe(value)
+        cumulative, total, count = histogram.snapshot()
+        self.assertEqual(cumulative, [2, 3, 4])
+        self.assertAlmostEqual(total, 3.65)
+        self.assertEqual(count, 4)
+
+    def test_stage_timer_counts_errors_and_renders(self):
+        registry = MetricsRegistry(prefix='test')
+        with registry.time('tick'):
+            pass
+        with self.assertRaises(RuntimeError):
+            with registry.time('tick'):
+                raise RuntimeError('boom')
+        registry.register_callback('cache_hits_total', 'counter', lambda: 7, cache='monitor')
+
+        text = registry.render()
+        self.assertIn('# TYPE test_stage_seconds histogram', text)
+        self.assertIn('test_stage_seconds_bucket{stage="tick",le="+Inf"} 2', text)
+        self.assertIn('test_stage_seconds_count{stage="tick"} 2', text)
+        self.assertIn('test_stage_errors_total{stage="tick"} 1', text)
+        self.assertIn('test_cache_hits_total{cache="monitor"} 7', text)
+
+    def test_profiler_only_profiles_requested_ticks(self):
+        profiler = TickProfiler()
+        self.assertEqual(profiler.run(sum, [1, 2]), 3)
+        self.assertIsNone(profiler.request(timeout=0.01))
+
+        reports = []
+        waiter = threading.Thread(target=lambda: reports.append(profiler.request(timeout=5)))
+        waiter.start()
+        while not profiler._requested:
+            pass
+        self.assertEqual(profiler.run(sorted, [3, 1, 2]), [1, 2, 3])
+        waiter.join()
+        self.assertIn('function calls', reports[0])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,195 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from order_fixtures import make_order
+from order_manager import OrderManager
+from order_status import OrderStatus
+
+class OrderManagerContract:
+    storage = None
+
+    def setUp(self):
+        self.base_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.base_dir)
+        self.manager = OrderManager('Test', base_dir=self.base_dir, storage=self.storage)
+        self.addCleanup(self.manager.close)
+
+    def test_update_inserts_then_merges(self):
+        self.manager.update_order('TSLA', make_order('TSLA'))
+        self.manager.update_order('AAPL', make_order('AAPL'))
+        self.manager.update_order('TSLA', {'currentPrice': 105.0})
+        order = self.manager.get_order('TSLA')
+        self.assertEqual(order['currentPrice'], 105.0)
+        self.assertEqual(order['entryPrice'], 100.0)
+        self.assertEqual([o['symbol'] for o in self.manager.list_orders()], ['TSLA', 'AAPL'])
+
+    def test_exit_and_list_by_status(self):
+        self.manager.update_order('TSLA', make_order('TSLA'))
+        self.manager.update_order('AAPL', make_order('AAPL'))
+        self.manager.exit_order('TSLA')
+        self.manager.exit_order('MISSING')
+        self.assertEqual([o['symbol'] for o in self.manager.list_orders(OrderStatus.HOLDING)], ['AAPL'])
+        exited = self.manager.list_completed_trades()
+        self.assertEqual([o['symbol'] for o in exited], ['TSLA'])
+        self.assertIsNotNone(exited[0]['exitDatetime'])
+        self.assertIsNone(self.manager.get_order('MISSING'))
+
+    def test_bulk_update_and_exit(self):
+        self.manager.update_order('TSLA', make_order('TSLA'))
+        self.manager.update_orders({'TSLA': {'currentPrice': 101.0}, 'AAPL': make_order('AAPL')})
+        self.manager.update_orders({'MSFT': {'currentPrice': 1.0}}, upsert=False)
+        self.manager.exit_orders(['AAPL', 'MISSING'])
+        orders = {o['symbol']: o for o in self.manager.list_orders()}
+        self.assertEqual(list(orders), ['TSLA', 'AAPL'])
+        self.assertEqual(orders['TSLA']['currentPrice'], 101.0)
+        self.assertEqual(orders['TSLA']['entryPrice'], 100.0)
+        self.assertEqual(orders['AAPL']['status'], 'EXITED')
+
+    def test_delete(self):
+        for symbol in ('TSLA', 'AAPL', 'MSFT'):
+            self.manager.update_order(symbol, make_order(symbol))
+        self.manager.exit_order('AAPL')
+        self.manager.delete_order('TSLA')
+        self.manager.delete_all_completed_orders()
+        self.assertEqual([o['symbol'] for o in self.manager.list_orders()], ['MSFT'])
+
+class JsonOrderManagerTestCase(OrderManagerContract, unittest.TestCase):
+    storage = 'json'
+
+class JournalOrderManagerTestCase(OrderManagerContract, unittest.TestCase):
+    storage = 'journal'
+
+    def journal_lines(self):
+        with open(self.manager.storage.journal_path) as f:
+            return f.read().splitlines()
+
+    def test_writes_append_and_compaction_folds(self):
+        self.manager.update_order('TSLA', make_order('TSLA'))
+        self.manager.update_order('TSLA', {'currentPrice': 101.0})
+        self.manager.exit_order('TSLA')
+        self.assertEqual(len(self.journal_lines()), 3)
+
+        self.manager.storage.compact()
+        self.assertEqual(self.journal_lines(), [])
+        with open(self.manager.get_trades_file_path()) as f:
+            snapshot = json.load(f)
+        self.assertEqual(snapshot[0]['currentPrice'], 101.0)
+        self.assertEqual(snapshot[0]['status'], 'EXITED')
+
+    def test_other_readers_see_journal_tail(self):
+        other = OrderManager('Test', base_dir=self.base_dir, storage='journal')
+        self.addCleanup(other.close)
+        self.manager.update_order('TSLA', make_order('TSLA'))
+        self.assertEqual(other.get_order('TSLA')['entryPrice'], 100.0)
+        self.manager.storage.compact()
+        self.manager.update_order('TSLA', {'entryPrice': 90.0})
+        self.assertEqual(other.get_order('TSLA')['entryPrice'], 90.0)
+
+    def test_torn_journal_line_is_ignored(self):
+        self.manager.update_order('TSLA', make_order('TSLA'))
+        with open(self.manager.storage.journal_path, 'a') as f:
+            f.write('{"op": "upsert", "symbol": "AAPL", "da')
+
+        reopened = OrderManager('Test', base_dir=self.base_dir, storage='journal')
+        self.addCleanup(reopened.close)
+        self.assertEqual([o['symbol'] for o in reopened.list_orders()], ['TSLA'])
+        reopened.update_order('MSFT', make_order('MSFT'))
+        self.assertEqual([o['symbol'] for o in self.manager.list_orders()], ['TSLA', 'MSFT'])
+
+class CachedOrderManagerTestCase(OrderManagerContract, unittest.TestCase):
+    storage = 'json'
+
+    def setUp(self):
+        self.base_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.base_dir)
+        self.manager = OrderManager('Test', base_dir=self.base_dir, cache=True, flush_interval=None, flush_threshold=3)
+        self.addCleanup(self.manager.close)
+
+    def read_disk(self):
+        with open(self.manager.get_trades_file_path()) as f:
+            return json.load(f)
+
+    def test_writes_are_coalesced(self):
+        self.manager.update_order('TSLA', make_order('TSLA'))
+        self.manager.update_order('TSLA', {'currentPrice': 101.0})
+        self.assertEqual(self.read_disk(), [])
+        self.assertEqual(self.manager.get_order('TSLA')['currentPrice'], 101.0)
+
+        self.manager.update_order('AAPL', make_order('AAPL'))
+        self.manager.update_order('MSFT', make_order('MSFT'))
+        self.assertEqual([o['symbol'] for o in self.read_disk()], ['TSLA', 'AAPL', 'MSFT'])
+        self.assertEqual(self.manager.storage.flushes, 1)
+
+    def test_returned_orders_are_copies(self):
+        self.manager.update_order('TSLA', make_order('TSLA'))
+        self.manager.get_order('TSLA')['entryPrice'] = 0
+        self.manager.list_orders(OrderStatus.HOLDING)[0]['entryPrice'] = 0
+        self.assertEqual(self.manager.get_order('TSLA')['entryPrice'], 100.0)
+
+    def test_picks_up_edits_from_other_processes(self):
+        self.manager.update_order('TSLA', make_order('TSLA'))
+        self.manager.flush()
+        self.manager.update_order('AAPL', make_order('AAPL'))
+
+        other = OrderManager('Test', base_dir=self.base_dir)
+        other.update_order('MSFT', make_order('MSFT', status='EXITED'))
+        self.manager.storage.watch_interval = 0
+        self.assertEqual([o['symbol'] for o in self.manager.list_orders()], ['TSLA', 'MSFT', 'AAPL'])
+        self.assertEqual([o['symbol'] for o in self.manager.list_completed_trades()], ['MSFT'])
+
+        self.manager.flush()
+        self.assertEqual([o['symbol'] for o in other.list_orders()], ['TSLA', 'MSFT', 'AAPL'])
+
+    def test_flush_does_not_hide_or_revert_edits_from_other_processes(self):
+        self.manager.storage.watch_interval = 60
+        self.manager.update_order('X', make_order('X'))
+        self.manager.update_order('Y', make_order('Y', takeProfitPct=5))
+        self.manager.flush()
+
+        other = OrderManager('Test', base_dir=self.base_dir)
+        other.update_order('Y', {'takeProfitPct': 9})
+        # A flush of something unrelated picks the edit up instead of taking the new file as its own
+        self.manager.update_order('X', {'currentPrice': 1.0})
+        self.manager.flush()
+        self.assertEqual(self.manager.get_order('Y')['takeProfitPct'], 9)
+
+        # Edited again after that flush, and not seen yet: the monitor's price write only sends its own fields
+        other.update_order('Y', {'takeProfitPct': 12})
+        self.manager.update_order('Y', {'currentPrice': 2.0})
+        self.manager.flush()
+        self.assertEqual(other.get_order('Y')['takeProfitPct'], 12)
+        self.assertEqual(other.get_order('Y')['currentPrice'], 2.0)
+        self.assertEqual(self.manager.get_order('Y')['takeProfitPct'], 12)
+
+    def test_patches_do_not_bring_back_orders_deleted_elsewhere(self):
+        self.manager.update_order('TSLA', make_order('TSLA'))
+        self.manager.flush()
+        self.manager.update_order('TSLA', {'currentPrice': 1.0})
+        OrderManager('Test', base_dir=self.base_dir).delete_order('TSLA')
+        self.manager.flush()
+        self.assertEqual(self.read_disk(), [])
+        self.assertIsNone(self.manager.get_order('TSLA'))
+
+class SQLiteOrderManagerTestCase(OrderManagerContract, unittest.TestCase):
+    storage = 'sqlite'
+
+    def test_migrates_json_trades_once(self):
+        base_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, base_dir)
+        trades = [make_order('TSLA'), make_order('BA', status='EXITED')]
+        with open(os.path.join(base_dir, 'TRADES_LOG_Old.json'), 'w') as f:
+            json.dump(trades, f)
+
+        manager = OrderManager('Old', base_dir=base_dir, storage='sqlite')
+        self.assertEqual(manager.list_orders(), trades)
+        self.assertEqual(manager.list_orders(OrderStatus.EXITED), [trades[1]])
+
+        # Emptying the database must not bring the JSON trades back on the next start
+        manager.delete_order('TSLA')
+        manager.delete_all_completed_orders()
+        self.assertEqual(OrderManager('Old', base_dir=base_dir, storage='sqlite').list_orders(), [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,456 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from contextlib import contextmanager
+from unittest import mock
+from datetime import datetime, timedelta
+from alerts import AlertBuffer
+from event_stream import EventStream
+from market_data import BarBuffer, DataSource, FakeDataSource, MarketDataGateway, YFinanceDataSource, split_by_symbol, synthetic_ohlcv
+from order_fixtures import make_order
+from order_manager import OrderManager
+from order_monitor import MarketDataSnapshot, OrderMonitor
+from order_status import OrderStatus
+from metrics import METRICS
+import pandas as pd
+
+class MarketDataSnapshotTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.source = FakeDataSource()
+        self.snapshot = MarketDataSnapshot(ttl=60, data_source=self.source)
+
+    def test_fetches_each_symbol_once_per_ttl(self):
+        for _ in range(3):
+            self.snapshot.get_ohlcv('TSLA')
+            self.snapshot.get_ohlcv('AAPL')
+        self.assertEqual(self.source.symbols_fetched, 2)
+        self.assertEqual(self.snapshot.stats()['hits'], 4)
+        self.assertEqual(self.snapshot.stats()['misses'], 2)
+
+    def test_expired_entries_are_refetched(self):
+        self.snapshot.ttl = 0
+        self.snapshot.get_ohlcv('TSLA')
+        self.snapshot.get_ohlcv('TSLA')
+        self.assertEqual(self.source.symbols_fetched, 2)
+
+    def test_invalidate(self):
+        self.snapshot.get_ohlcv('TSLA')
+        self.snapshot.invalidate('TSLA')
+        self.snapshot.get_ohlcv('TSLA')
+        self.assertEqual(self.snapshot.stats()['misses'], 2)
+
+    def test_prefetch_batches_stale_symbols(self):
+        self.snapshot.get_ohlcv('TSLA')
+        self.snapshot.prefetch(['TSLA', 'AAPL', 'MSFT', 'AAPL'])
+        self.assertEqual(self.source.calls, 2)
+        self.assertEqual(self.source.symbols_fetched, 3)
+        self.assertFalse(self.snapshot.get_ohlcv('MSFT').empty)
+        self.assertEqual(self.snapshot.stats()['hits'], 1)
+
+    def test_missing_symbol_is_not_refetched_within_ttl(self):
+        self.source.symbols = {'TSLA'}
+        self.snapshot.prefetch(['TSLA', 'NOPE'])
+        self.assertIsNone(self.snapshot.get_ohlcv('NOPE'))
+        self.assertEqual(self.source.calls, 1)
+
+    def test_refresh_only_fetches_new_bars(self):
+        self.snapshot.ttl = 0
+        seeded = self.snapshot.get_ohlcv('TSLA')
+        self.assertEqual(len(seeded), self.snapshot.max_bars)
+        served = self.source.bars_served
+
+        refreshed = self.snapshot.get_ohlcv('TSLA')
+        self.assertLessEqual(self.source.bars_served - served, 2)
+        self.assertEqual(len(refreshed), self.snapshot.max_bars)
+        self.assertEqual(refreshed.index[-1], refreshed.index.max())
+        self.assertTrue(refreshed.index.is_unique)
+
+    def test_halted_symbol_does_not_widen_the_refresh_of_others(self):
+        self.snapshot.ttl = 0
+        self.snapshot.prefetch(['TSLA', 'AAPL'])
+        halted_at = datetime.now().replace(second=0, microsecond=0) - timedelta(days=2)
+        self.snapshot.import_buffers(self.snapshot.max_bars, {'HALT': synthetic_ohlcv('HALT', halted_at - timedelta(hours=2), halted_at)})
+        served = self.source.bars_served
+
+        self.snapshot.prefetch(['TSLA', 'AAPL', 'HALT'])
+        # HALT's own two-day gap, plus a bar or two for each live symbol
+        self.assertLessEqual(self.source.bars_served - served, 2 * 24 * 60 + 1 + 2 * 2)
+        self.assertEqual(self.source.calls, 3)
+
+    def test_require_period_grows_history(self):
+        self.snapshot.get_ohlcv('TSLA')
+        self.snapshot.require_period(50)
+        self.assertEqual(len(self.snapshot.get_ohlcv('TSLA')), 500)
+        self.snapshot.require_period(5)
+        self.assertEqual(self.snapshot.max_bars, 500)
+
+    def test_refresh_asks_from_the_last_bar_in_exchange_time(self):
+        for tz in ('UTC', 'Europe/Berlin'):
+            with self.subTest(tz=tz), local_timezone(tz):
+                source = ExchangeTimeDataSource(pd.Timestamp.now(NEW_YORK).floor('min'))
+                snapshot = MarketDataSnapshot(ttl=0, data_source=source)
+                last = snapshot.get_ohlcv('TSLA').index[-1]
+                source.now += pd.Timedelta(minutes=5)
+                refreshed = snapshot.get_ohlcv('TSLA')
+                self.assertEqual(source.starts[-1], last)
+                self.assertEqual(refreshed.index[-1], last + pd.Timedelta(minutes=5))
+
+NEW_YORK = 'America/New_York'
+
+@contextmanager
+def local_timezone(tz):
+    previous = os.environ.get('TZ')
+    os.environ['TZ'] = tz
+    time.tzset()
+    try:
+        yield
+    finally:
+        if previous is None:
+            del os.environ['TZ']
+        else:
+            os.environ['TZ'] = previous
+        time.tzset()
+
+class ExchangeTimeDataSource(DataSource):
+    """Behaves like yfinance: naive times are read as New York time and bars come back tz-aware."""
+
+    def __init__(self, now):
+        self.now = now
+        self.starts = []
+
+    def fetch(self, symbols, start, end, interval='1m'):
+        start = pd.Timestamp(start)
+        start = start.tz_localize(NEW_YORK) if start.tz is None else start.tz_convert(NEW_YORK)
+        self.starts.append(start)
+        result = {}
+        for symbol in symbols:
+            frame = synthetic_ohlcv(symbol, start.tz_localize(None), self.now.tz_localize(None))
+            if not frame.empty:
+                frame.index = frame.index.tz_localize(NEW_YORK)
+                result[symbol] = frame
+        return result
+
+class BarBufferTestCase(unittest.TestCase):
+
+    def test_append_revises_last_bar_and_trims(self):
+        source = FakeDataSource()
+        end = datetime(2024, 8, 16, 12, 0)
+        buffer = BarBuffer(max_bars=60)
+        buffer.append(source.fetch(['TSLA'], end - timedelta(hours=2), end)['TSLA'])
+        self.assertEqual(len(buffer.frame), 60)
+
+        revised = source.fetch(['TSLA'], end - timedelta(minutes=1), end + timedelta(minutes=3))['TSLA']
+        revised.loc[revised.index[0], 'Close'] = -1.0
+        self.assertEqual(buffer.append(revised), 4)
+        self.assertEqual(len(buffer.frame), 60)
+        self.assertEqual(buffer.frame['Close'].iloc[-4], -1.0)
+        self.assertEqual(buffer.last_timestamp, revised.index[-1])
+
+class FakeDataSourceTestCase(unittest.TestCase):
+
+    def test_bars_are_deterministic(self):
+        source = FakeDataSource()
+        end = datetime(2024, 8, 16, 12, 0)
+        full = source.fetch(['TSLA'], end - timedelta(hours=2), end)['TSLA']
+        tail = source.fetch(['TSLA'], end - timedelta(minutes=30), end)['TSLA']
+        self.assertEqual(len(full), 120)
+        pd.testing.assert_frame_equal(full.iloc[-30:], tail)
+
+    def test_split_by_symbol(self):
+        index = pd.date_range('2024-08-16 09:30', periods=3, freq='1min')
+        columns = pd.MultiIndex.from_product([['TSLA', 'AAPL'], ['Open', 'Close']])
+        data = pd.DataFrame(1.0, index=index, columns=columns)
+        data[('AAPL', 'Close')] = float('nan')
+        data[('AAPL', 'Open')] = float('nan')
+        frames = split_by_symbol(data, ['TSLA', 'AAPL', 'MSFT'])
+        self.assertEqual(list(frames), ['TSLA'])
+        self.assertEqual(list(frames['TSLA'].columns), ['Open', 'Close'])
+
+    def test_yfinance_symbols_are_fetched_in_parallel(self):
+        delay = 0.1
+
+        def serial_download(tickers, start, end, interval, **kwargs):
+            # What yf.download(threads=False) does: one request per ticker, one after another
+            time.sleep(delay * len(tickers))
+            return pd.concat({ticker: synthetic_ohlcv(ticker, start, end) for ticker in tickers}, axis=1)
+
+        source = YFinanceDataSource(max_workers=8)
+        end = datetime(2024, 8, 16, 12, 0)
+        durations = {}
+        with mock.patch('market_data.yf.download', side_effect=serial_download):
+            for count in (1, 8):
+                started = time.perf_counter()
+                frames = source.fetch([f'SYM{i}' for i in range(count)], end - timedelta(minutes=10), end)
+                durations[count] = time.perf_counter() - started
+                self.assertEqual(len(frames), count)
+        self.assertLess(durations[8], durations[1] + 3 * delay)
+
+class FlakySource(FakeDataSource):
+    """Slow fake feed that can be switched to failing."""
+
+    def __init__(self, delay=0.0):
+        super().__init__()
+        self.delay = delay
+        self.failing = False
+
+    def fetch(self, symbols, start, end, interval='1m'):
+        time.sleep(self.delay)
+        if self.failing:
+            self.calls += 1
+            raise ConnectionError("throttled")
+        return super().fetch(symbols, start, end, interval)
+
+class MarketDataGatewayTestCase(unittest.TestCase):
+
+    def test_concurrent_requests_share_one_fetch(self):
+        source = FlakySource(delay=0.2)
+        gateway = MarketDataGateway(source, rate=100, burst=10)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(gateway.history('TSLA'))) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(source.calls, 1)
+        self.assertEqual(len(results), 4)
+        self.assertTrue(all(result is results[0] for result in results))
+
+    def test_failures_back_off_and_serve_stale_bars(self):
+        source = FlakySource()
+        gateway = MarketDataGateway(source, rate=100, burst=10, backoff_base=60)
+        good = gateway.history('TSLA')
+        source.failing = True
+        self.assertIs(gateway.history('TSLA'), good)
+        self.assertEqual(source.calls, 2)
+        # Backing off: no upstream call, still the last good bars
+        self.assertIs(gateway.history('TSLA'), good)
+        self.assertEqual(source.calls, 2)
+        self.assertIsNone(gateway.history('AAPL'))
+
+    def test_seed_is_not_served_stale_incremental_bars(self):
+        source = FlakySource()
+        gateway = MarketDataGateway(source, rate=100, burst=10, backoff_base=0)
+        end = datetime.now()
+        seed = end - timedelta(days=1)
+        incremental = gateway.fetch(['TSLA'], end - timedelta(minutes=2), end)['TSLA']
+        source.failing = True
+        self.assertEqual(gateway.fetch(['TSLA'], seed, end), {})
+        # A refresh from the same start or later may still fall back to them
+        self.assertIs(gateway.fetch(['TSLA'], end - timedelta(minutes=1), end)['TSLA'], incremental)
+
+    def test_token_bucket_limits_upstream_rate(self):
+        source = FlakySource()
+        gateway = MarketDataGateway(source, rate=20, burst=1)
+        started = time.monotonic()
+        for symbol in ('TSLA', 'AAPL', 'MSFT'):
+            gateway.history(symbol)
+        self.assertGreaterEqual(time.monotonic() - started, 0.09)
+        self.assertEqual(source.calls, 3)
+
+    def test_parallel_requests_are_paced_by_the_bucket(self):
+        sent = []
+
+        def download(tickers, start, end, interval, **kwargs):
+            sent.append(time.monotonic())
+            return pd.concat({ticker: synthetic_ohlcv(ticker, start, end) for ticker in tickers}, axis=1)
+
+        gateway = MarketDataGateway(YFinanceDataSource(max_workers=8), rate=20, burst=2)
+        end = datetime(2024, 8, 16, 12, 0)
+        with mock.patch('market_data.yf.download', side_effect=download):
+            self.assertEqual(len(gateway.fetch([f'SYM{i}' for i in range(8)], end - timedelta(minutes=10), end)), 8)
+        # Sent as tokens come in: the burst right away, then one every 1/rate seconds
+        sent = [moment - sent[0] for moment in sorted(sent)]
+        for i, moment in enumerate(sent):
+            with self.subTest(request=i):
+                self.assertGreaterEqual(moment, (i - 1) / 20 - 0.02)
+
+    def test_batched_fetch_pays_per_symbol(self):
+        gateway = MarketDataGateway(FlakySource(), rate=20, burst=1)
+        started = time.monotonic()
+        self.assertEqual(len(gateway.fetch(['TSLA', 'AAPL', 'MSFT'], datetime.now() - timedelta(hours=1), datetime.now())), 3)
+        self.assertGreaterEqual(time.monotonic() - started, 0.09)
+
+class OrderMonitorTestCase(unittest.TestCase):
+
+    def setUp(self):
+        base_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, base_dir)
+        self.order_manager = OrderManager('Test', base_dir=base_dir)
+        self.source = FakeDataSource()
+        self.monitor = OrderMonitor(self.order_manager, price_update_interval=60, auto_remove_on_exit=True, data_source=self.source)
+
+    def test_tick_fetches_once_and_writes_once(self):
+        self.order_manager.update_order('TSLA', make_order('TSLA'))
+        self.order_manager.update_order('AAPL', make_order('AAPL', initialSL='static', initialSLPct=-1000))
+        self.order_manager.update_order('MSFT', make_order('MSFT', maType='HMA'))
+
+        with mock.patch.object(self.order_manager.storage, 'update_many', wraps=self.order_manager.storage.update_many) as update_many:
+            alerts = self.monitor.update_all_active_orders()
+        self.assertEqual(update_many.call_count, 1)
+        self.assertEqual(self.source.calls, 1)
+
+        self.assertEqual([alert['symbol'] for alert in alerts], ['AAPL'])
+        self.assertIn('Initial Static Stop Loss hit', alerts[0]['message'])
+        self.assertEqual([o['symbol'] for o in self.order_manager.list_orders(OrderStatus.HOLDING)], ['TSLA', 'MSFT'])
+        exited = self.order_manager.get_order('AAPL')
+        self.assertEqual(exited['status'], 'EXITED')
+        self.assertEqual(exited['exitReason'], 'Initial Static Stop Loss hit')
+        self.assertGreater(self.order_manager.get_order('TSLA')['highestMA'], 0)
+
+    def test_repeated_exit_signals_are_published_once(self):
+        self.monitor.auto_remove_on_exit = False
+        self.order_manager.update_order('AAPL', make_order('AAPL', initialSL='static', initialSLPct=-1000))
+        self.monitor.update_all_active_orders()
+        self.monitor.market_data.invalidate()
+        self.monitor.update_all_active_orders()
+
+        alerts, cursor, missed = self.monitor.alerts.since(0)
+        self.assertEqual([alert['symbol'] for alert in alerts], ['AAPL'])
+        self.assertEqual((cursor, missed), (1, False))
+        self.assertEqual([alert['symbol'] for alert in self.monitor.alerts.latest()], ['AAPL'])
+
+    def test_exit_signal_that_comes_back_is_published_again(self):
+        self.monitor.auto_remove_on_exit = False
+        # Left over from an earlier signal, which must not hide the first one of this monitor
+        self.order_manager.update_order('AAPL', make_order('AAPL', initialSL='static', initialSLPct=-1000,
+                                                           exitReason='Initial Static Stop Loss hit'))
+        self.monitor.update_all_active_orders()
+        self.order_manager.update_order('AAPL', {'initialSLPct': 100})
+        self.monitor.update_all_active_orders()
+        self.assertEqual(self.monitor.alerts.latest(), [])
+        self.order_manager.update_order('AAPL', {'initialSLPct': -1000})
+        self.monitor.update_all_active_orders()
+
+        alerts, _, _ = self.monitor.alerts.since(0)
+        self.assertEqual([alert['symbol'] for alert in alerts], ['AAPL', 'AAPL'])
+
+    def test_stream_gets_changed_fields_only(self):
+        subscription = self.monitor.events.subscribe()
+        self.order_manager.update_order('TSLA', make_order('TSLA'))
+        self.monitor.update_all_active_orders()
+        first = subscription.get(timeout=0)
+        self.assertIn(b'event: orders', first)
+        self.assertIn(b'"currentPrice"', first)
+
+        # Same bars again: nothing changed, nothing is pushed
+        self.monitor.update_all_active_orders()
+        self.assertIsNone(subscription.get(timeout=0))
+
+    def test_only_symbols_with_new_bars_are_evaluated(self):
+        self.order_manager.update_order('TSLA', make_order('TSLA'))
+        self.order_manager.update_order('AAPL', make_order('AAPL'))
+        self.monitor.update_all_active_orders()
+        # Pin the newest bars, so a minute rolling over mid-test does not count as new data
+        last_bars = {symbol: self.monitor.market_data.last_bar(symbol) for symbol in ('TSLA', 'AAPL')}
+        self.monitor.market_data.ttl = 0
+
+        with mock.patch.object(self.monitor.market_data, 'last_bar', side_effect=last_bars.get), \
+                mock.patch.object(self.monitor.indicators, 'current_ma', wraps=self.monitor.indicators.current_ma) as current_ma:
+            # Bars refetched but unchanged: nothing evaluated, nothing written
+            with mock.patch.object(self.order_manager.storage, 'update_many') as update_many:
+                self.monitor.update_all_active_orders()
+            self.assertEqual(current_ma.call_count, 0)
+            self.assertEqual(update_many.call_count, 0)
+
+            timestamp, close = last_bars['TSLA']
+            last_bars['TSLA'] = (timestamp + timedelta(minutes=1), close)
+            self.monitor.update_all_active_orders()
+            self.assertEqual([call.args[0] for call in current_ma.call_args_list], ['TSLA'])
+
+            # Edited rules get the order re-evaluated on the same bar
+            self.order_manager.update_order('AAPL', {'takeProfitPct': 5.0})
+            self.monitor.update_all_active_orders()
+            self.assertEqual([call.args[0] for call in current_ma.call_args_list], ['TSLA', 'AAPL'])
+
+    def test_skipped_orders_keep_their_alerts(self):
+        self.monitor.auto_remove_on_exit = False
+        self.order_manager.update_order('AAPL', make_order('AAPL', initialSL='static', initialSLPct=-1000))
+        self.monitor.update_all_active_orders()
+        self.assertEqual([alert['symbol'] for alert in self.monitor.update_all_active_orders()], ['AAPL'])
+        self.assertEqual([alert['symbol'] for alert in self.monitor.alerts.latest()], ['AAPL'])
+
+        self.order_manager.delete_order('AAPL')
+        self.assertEqual(self.monitor.update_all_active_orders(), [])
+        self.assertEqual(self.monitor.alerts.latest(), [])
+
+    def test_idles_while_market_is_closed(self):
+        calendar = mock.Mock()
+        calendar.seconds_until_open.return_value = 3600
+        monitor = OrderMonitor(self.order_manager, price_update_interval=0.01, data_source=self.source, calendar=calendar)
+        self.order_manager.update_order('TSLA', make_order('TSLA'))
+        monitor.alerts.publish([{'symbol': 'TSLA'}])
+        monitor.start()
+        time.sleep(0.05)
+        started = time.monotonic()
+        monitor.stop()
+        # stop() wakes the idle loop instead of waiting out the hour
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertEqual(self.source.calls, 0)
+        # Yesterday's alerts are not served as current overnight
+        self.assertEqual(monitor.alerts.latest(), [])
+
+    def test_failed_write_does_not_stop_the_monitor(self):
+        self.order_manager.update_order('TSLA', make_order('TSLA'))
+        errors = METRICS.counter('stage_errors_total', stage='tick')
+        errors_before = errors.value
+        update_orders = self.order_manager.update_orders
+        calls = []
+
+        def fail_once(*args, **kwargs):
+            calls.append(args)
+            if len(calls) == 1:
+                raise TimeoutError("lock timed out")
+            return update_orders(*args, **kwargs)
+
+        monitor = OrderMonitor(self.order_manager, price_update_interval=0.01, data_source=self.source, skip_unchanged=False)
+        with mock.patch.object(self.order_manager, 'update_orders', side_effect=fail_once):
+            monitor.start()
+            deadline = time.monotonic() + 5
+            while len(calls) < 2 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            self.assertTrue(monitor.price_update_thread.is_alive())
+            monitor.stop()
+        self.assertGreaterEqual(len(calls), 2)
+        self.assertEqual(errors.value, errors_before + 1)
+        self.assertGreater(self.order_manager.get_order('TSLA')['currentPrice'], 0)
+
+class EventStreamTestCase(unittest.TestCase):
+
+    def test_slow_client_is_told_to_resync(self):
+        stream = EventStream(max_queue=2)
+        fast, slow = stream.subscribe(), stream.subscribe()
+        for i in range(3):
+            stream.publish('orders', {'TSLA': {'profit': i}})
+            fast.get(timeout=0)
+        self.assertIn(b'event: resync', slow.get(timeout=0))
+        self.assertIsNone(slow.get(timeout=0))
+        self.assertEqual(slow.dropped, 2)
+
+        stream.unsubscribe(slow)
+        stream.publish('alert', {'symbol': 'TSLA'})
+        self.assertIn(b'id: 4\nevent: alert', fast.get(timeout=0))
+        self.assertIsNone(slow.get(timeout=0))
+
+class AlertBufferTestCase(unittest.TestCase):
+
+    def test_since_cursor_and_overflow(self):
+        buffer = AlertBuffer(capacity=3)
+        self.assertEqual(buffer.since(0), ([], 0, False))
+        buffer.publish([{'symbol': 'A'}, {'symbol': 'B'}])
+        alerts, cursor, missed = buffer.since(0)
+        self.assertEqual([(a['symbol'], a['seq']) for a in alerts], [('A', 1), ('B', 2)])
+        self.assertEqual(buffer.since(cursor), ([], 2, False))
+
+        buffer.publish([{'symbol': 'C'}, {'symbol': 'D'}], current=[{'symbol': 'C'}])
+        alerts, cursor, missed = buffer.since(0)
+        self.assertEqual([a['seq'] for a in alerts], [2, 3, 4])
+        self.assertTrue(missed)
+        self.assertEqual([a['symbol'] for a in buffer.since(3)[0]], ['D'])
+        self.assertEqual(buffer.latest(), [{'symbol': 'C'}])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import unittest
+import numpy as np
+from exit_rules import OrderBatch
+from order_record import Order, OrderValidationError, from_array, load_orders, to_array, validate_order
+from order_fixtures import make_order
+
+class ValidateOrderTestCase(unittest.TestCase):
+
+    def test_coerces_api_input(self):
+        order = validate_order(make_order('TSLA', period='14', initialSLPct='1.5', entryPrice=None))
+        self.assertEqual(order['period'], 14)
+        self.assertEqual(order['initialSLPct'], 1.5)
+        self.assertIsNone(order['entryPrice'])
+
+    def test_rejects_bad_input(self):
+        for fields, message in [
+            ({'maType': 'KAMA'}, "'maType'"),
+            ({'initialSL': 'sometimes'}, "'initialSL'"),
+            ({'period': 0}, "'period'"),
+            ({'takeProfitPct': 'lots'}, "'takeProfitPct'"),
+            ({'secondarySLPct': None}, "'secondarySLPct'"),
+            ({'symbol': ''}, "'symbol'"),
+        ]:
+            with self.subTest(fields=fields):
+                with self.assertRaisesRegex(OrderValidationError, message):
+                    validate_order({**make_order('TSLA'), **fields})
+        order = make_order('TSLA')
+        del order['period']
+        with self.assertRaisesRegex(OrderValidationError, "'period' is required"):
+            validate_order(order)
+        self.assertEqual(validate_order({'period': '9'}, partial=True), {'period': 9})
+
+class OrderTestCase(unittest.TestCase):
+
+    def test_round_trip_keeps_unknown_fields(self):
+        data = make_order('TSLA', note='keep me')
+        order = Order.from_dict(data)
+        restored = order.to_dict()
+        self.assertEqual({key: restored[key] for key in data}, data)
+        self.assertEqual((restored['profit'], restored['exitReason']), (0.0, None))
+        self.assertEqual(order['note'], 'keep me')
+        order.update({'profit': 2.5, 'exitReason': 'x'})
+        self.assertEqual((order.profit, order['exitReason']), (2.5, 'x'))
+        with self.assertRaises(AttributeError):
+            order.unknown = 1
+
+    def test_missing_computed_fields_default_to_zero(self):
+        data = make_order('TSLA', highestMA=None)
+        data.pop('profit', None)
+        order = Order.from_dict(data)
+        self.assertEqual((order.highestMA, order.profit, order.currentPrice), (0.0, 0.0, 0.0))
+
+    def test_load_orders_skips_orders_the_rules_cannot_run_on(self):
+        broken = make_order('BAD')
+        del broken['takeProfitPct']
+        orders = load_orders([make_order('TSLA'), broken, make_order('AAPL', period='x')])
+        self.assertEqual([order.symbol for order in orders], ['TSLA'])
+
+    def test_array_round_trip_and_batches(self):
+        orders = load_orders([make_order(f'SYM{i}', highestMA=i, initialSL='static' if i % 2 else 'trailing') for i in range(5)])
+        restored = from_array(to_array(orders))
+        for name in ('symbol', 'maType', 'period', 'initialSL', 'entryPrice', 'highestMA', 'initialSLPct'):
+            self.assertEqual([getattr(order, name) for order in restored], [getattr(order, name) for order in orders])
+
+        prices, mas = [101.0] * 5, [99.0] * 5
+        from_records = OrderBatch.from_records(restored, prices, mas)
+        from_dicts = OrderBatch.from_orders([order.to_dict() for order in orders], prices, mas)
+        for name in ('entry_price', 'take_profit_pct', 'secondary_sl_pct', 'initial_sl_pct', 'trailing', 'highest_ma'):
+            np.testing.assert_array_equal(getattr(from_records, name), getattr(from_dicts, name))
+
+if __name__ == '__main__':
+    unittest.main()
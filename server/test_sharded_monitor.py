@@ -0,0 +1,126 @@
+import multiprocessing
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest import mock
+from market_data import GATEWAY_RATE, FakeDataSource
+from order_manager import OrderManager
+from order_monitor import OrderMonitor
+from sharded_monitor import HashRing, ShardedOrderMonitor, shard_worker
+from order_fixtures import make_order
+
+SYMBOLS = [f'SYM{i}' for i in range(40)]
+SERVER_DIR = os.path.dirname(os.path.abspath(__file__))
+PYTHONPATH = os.pathsep.join(filter(None, (SERVER_DIR, os.environ.get('PYTHONPATH'))))
+# Set up like server.py: everything at module level, startup skipped in the workers
+MAIN_MODULE = """
+import sys
+from market_data import FakeDataSource
+from order_fixtures import make_order
+from sharded_monitor import ShardedOrderMonitor
+from strategy_registry import StrategyRegistry
+
+def create_monitor(order_manager, market_data, indicators):
+    return ShardedOrderMonitor(order_manager, price_update_interval=60, data_source=FakeDataSource(), workers=2)
+
+strategies = StrategyRegistry(base_dir=sys.argv[1] if len(sys.argv) > 1 else '.', monitor_factory=create_monitor)
+
+def start():
+    manager = strategies.add('Main')
+    manager.update_order('TSLA', make_order('TSLA'))
+    strategies.monitor('Main').start_workers()
+    strategies.monitor('Main').update_all_active_orders()
+    print(manager.get_order('TSLA').get('currentPrice', 0))
+    strategies.monitor('Main').stop_workers()
+
+if __name__ != '__mp_main__':
+    start()
+"""
+
+class HashRingTestCase(unittest.TestCase):
+
+    def test_assignment_is_stable_and_spread(self):
+        ring = HashRing(4)
+        assignment = {symbol: ring.shard_for(symbol) for symbol in SYMBOLS}
+        self.assertEqual(assignment, {symbol: HashRing(4).shard_for(symbol) for symbol in SYMBOLS})
+        self.assertEqual(set(assignment.values()), {0, 1, 2, 3})
+
+    def test_adding_a_shard_only_moves_symbols_to_it(self):
+        before, after = HashRing(4), HashRing(5)
+        for symbol in SYMBOLS:
+            with self.subTest(symbol=symbol):
+                self.assertIn(after.shard_for(symbol), (before.shard_for(symbol), 4))
+
+class ShardedOrderMonitorTestCase(unittest.TestCase):
+
+    def setUp(self):
+        base_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, base_dir)
+        self.order_manager = OrderManager('Test', base_dir=base_dir)
+        self.reference_manager = OrderManager('Reference', base_dir=base_dir)
+        for symbol in SYMBOLS[:12]:
+            order = make_order(symbol)
+            if symbol.endswith(('0', '2', '4')):
+                # Far above any synthetic price, so the static stop loss fires
+                order.update(entryPrice=1e6, initialSL='static', initialSLPct=0)
+            self.order_manager.update_order(symbol, order)
+            self.reference_manager.update_order(symbol, dict(order))
+
+    def test_matches_single_process_monitor(self):
+        monitor = ShardedOrderMonitor(self.order_manager, price_update_interval=60, data_source=FakeDataSource(), workers=3)
+        monitor.start_workers()
+        self.addCleanup(monitor.stop_workers)
+        reference = OrderMonitor(self.reference_manager, price_update_interval=60, data_source=FakeDataSource())
+
+        alerts = monitor.update_all_active_orders()
+        expected = reference.update_all_active_orders()
+        self.assertEqual([alert['symbol'] for alert in alerts], [alert['symbol'] for alert in expected])
+        self.assertTrue(alerts)
+        for symbol in SYMBOLS[:12]:
+            with self.subTest(symbol=symbol):
+                order, expected_order = self.order_manager.get_order(symbol), self.reference_manager.get_order(symbol)
+                for key in ('currentPrice', 'profit', 'highestMA'):
+                    self.assertAlmostEqual(order[key], expected_order[key], places=9)
+                self.assertEqual(order.get('exitReason'), expected_order.get('exitReason'))
+        # Orders were priced in the workers, not in the parent
+        self.assertEqual(monitor.market_data.stats()['symbols'], 0)
+
+    def test_workers_start_from_a_main_module_with_module_level_startup(self):
+        # Spawned workers re-import the main module, as they do with server.py
+        base_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, base_dir)
+        main = os.path.join(base_dir, 'main.py')
+        with open(main, 'w') as f:
+            f.write(MAIN_MODULE)
+        result = subprocess.run([sys.executable, main, base_dir], cwd=SERVER_DIR, env=dict(os.environ, PYTHONPATH=PYTHONPATH),
+                                capture_output=True, text=True, timeout=120)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertNotIn('died mid-tick', result.stderr)
+        self.assertGreater(float(result.stdout.split()[-1]), 0)
+
+    def test_server_does_not_start_in_spawned_workers(self):
+        script = ("import runpy, threading; server = runpy.run_path('server.py', run_name='__mp_main__'); "
+                  "print(len(server['strategies']), threading.active_count())")
+        result = subprocess.run([sys.executable, '-c', script], cwd=SERVER_DIR, env=dict(os.environ, PYTHONPATH=PYTHONPATH),
+                                capture_output=True, text=True, timeout=120)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        # No strategies loaded, and no monitor or market state threads besides the main one
+        self.assertEqual(result.stdout.split()[-2:], ['0', '1'])
+
+    def test_workers_split_the_upstream_rate(self):
+        monitor = ShardedOrderMonitor(self.order_manager, price_update_interval=60, workers=4)
+        with mock.patch.object(monitor._context, 'Process') as process:
+            monitor._start_worker(0)
+        monitor._conns[0].close()
+        conn, child_conn = multiprocessing.Pipe()
+        conn.send(None)
+        with mock.patch('sharded_monitor.MarketDataGateway') as gateway:
+            shard_worker(child_conn, *process.call_args.kwargs['args'][1:])
+        self.assertAlmostEqual(gateway.call_args.kwargs['rate'] * monitor.workers, GATEWAY_RATE)
+        conn.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import os
+import portalocker
+import shutil
+import tempfile
+import threading
+import unittest
+from market_data import FakeDataSource
+from order_monitor import MarketDataSnapshot, OrderMonitor
+from order_status import OrderStatus
+from strategy_registry import StrategyRegistry
+from order_fixtures import make_order
+
+def create_monitor(order_manager, market_data, indicators):
+    return OrderMonitor(order_manager, price_update_interval=60, market_data=market_data, indicators=indicators)
+
+class StrategyRegistryTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.base_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.base_dir)
+        self.source = FakeDataSource()
+        self.registry = StrategyRegistry(base_dir=self.base_dir, market_data=MarketDataSnapshot(ttl=60, data_source=self.source),
+                                         monitor_factory=create_monitor)
+        self.addCleanup(self.registry.close)
+
+    def test_strategies_are_partitioned(self):
+        momentum, swing = self.registry.add('Momentum'), self.registry.add('Swing')
+        self.assertIs(self.registry.add('Momentum'), momentum)
+        momentum.update_order('TSLA', make_order('TSLA'))
+        swing.update_order('TSLA', make_order('TSLA', entryPrice=50.0))
+        self.assertEqual(momentum.get_order('TSLA')['entryPrice'], 100.0)
+        self.assertEqual(swing.get_order('TSLA')['entryPrice'], 50.0)
+        self.assertTrue(os.path.exists(os.path.join(self.base_dir, 'TRADES_LOG_Swing.json')))
+
+        swing.delete_order('TSLA')
+        self.assertIsNotNone(momentum.get_order('TSLA'))
+
+    def test_rejects_unsafe_names(self):
+        for name in ('', '../etc', 'a b', 'x' * 65):
+            with self.subTest(name=name), self.assertRaises(ValueError):
+                self.registry.add(name)
+
+    def test_discovers_existing_trades_logs(self):
+        self.registry.add('Momentum')
+        self.registry.add('Swing')
+        open(os.path.join(self.base_dir, 'TRADES_LOG_Swing copy.json'), 'w').close()
+        reopened = StrategyRegistry(base_dir=self.base_dir)
+        self.addCleanup(reopened.close)
+        self.assertEqual(reopened.load(), ['Momentum', 'Swing'])
+        self.assertEqual(reopened.names(), ['Momentum', 'Swing'])
+
+    def test_monitors_share_market_data_and_indicators(self):
+        for name in ('Momentum', 'Swing', 'Scalp'):
+            self.registry.add(name).update_order('TSLA', make_order('TSLA'))
+        self.registry.get('Scalp').update_order('AAPL', make_order('AAPL'))
+        for monitor in self.registry.monitors():
+            monitor.update_all_active_orders()
+        self.assertEqual(self.source.symbols_fetched, 2)
+        self.assertEqual(len(self.registry.indicators), 2)
+        for name in self.registry.names():
+            self.assertGreater(self.registry.get(name).get_order('TSLA')['currentPrice'], 0)
+
+        # AAPL's MA goes once its only holder drops it, TSLA's stays while anyone holds it
+        scalp = self.registry.monitor('Scalp')
+        self.registry.get('Scalp').delete_order('AAPL')
+        self.registry.get('Scalp').delete_order('TSLA')
+        scalp.update_all_active_orders()
+        self.assertEqual(len(self.registry.indicators), 1)
+        self.registry.remove('Momentum')
+        self.registry.remove('Swing')
+        self.assertEqual(len(self.registry.indicators), 0)
+
+    def test_writes_to_one_strategy_do_not_block_another(self):
+        momentum, swing = self.registry.add('Momentum'), self.registry.add('Swing')
+        swing.update_order('AAPL', make_order('AAPL'))
+        # Hold Momentum's file lock for as long as the read of Swing takes
+        with portalocker.Lock(momentum.get_trades_file_path(), 'r+', timeout=1):
+            held = []
+            reader = threading.Thread(target=lambda: held.extend(swing.list_orders(OrderStatus.HOLDING)))
+            reader.start()
+            reader.join(timeout=5)
+            self.assertFalse(reader.is_alive())
+        # Asserted here: a failure inside the thread would not fail the test
+        self.assertEqual([order['symbol'] for order in held], ['AAPL'])
+
+if __name__ == '__main__':
+    unittest.main()